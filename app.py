@@ -1,112 +1,259 @@
+import gzip
+import hashlib
 import json
-import re
-import unicodedata
+import os
+import threading
+import traceback
+import uuid
+from pathlib import Path
+from urllib.parse import urlencode
 
 import pandas as pd
-import joblib
 import numpy as np
 
-from dash import Dash, dcc, html, Input, Output
+from dash import Dash, dcc, html, Input, Output, State
+from flask import Response, jsonify, request, stream_with_context
+from werkzeug.datastructures import MultiDict
 import plotly.express as px
+import plotly.graph_objects as go
+
+from src.alquilar_comprar import HORIZONTE_EQUILIBRIO, curvas_alquilar_comprar, punto_equilibrio
+from src.amortizacion import cuadro_variable, totales, totales_fijo
+from src.artefacto import ModeloLineal, ruta_artefacto
+from src.asequibilidad import (
+    ESFUERZO_OBJETIVO,
+    PCT_ENTRADA,
+    indicadores,
+    inversos,
+    simular_entrada,
+)
+from src.escenarios import (
+    COLUMNAS_BASE,
+    FORMATOS,
+    iterar_resultados,
+    leer_escenarios,
+)
+from src.etl import GEOJSON_PROVINCIAS, PROVINCIAS_CSV, cargar_provincias
+from src.exportar import FORMATOS_EXPORTACION, exportar, nombre_fichero, parquet_disponible
+from src.memoria import compactar, resumen_proceso
+from src.registro import (
+    Componente,
+    RegistroArtefactos,
+    cache_versionada,
+    cargar_caches,
+    estadisticas_caches,
+    version_ficheros,
+)
+from src.sesiones import AlmacenSesiones
+from src.sensibilidad import PUNTOS_REJILLA, SALIDAS_SENSIBILIDAD, VARIACION, mapa_calor, rejilla, tornado
+from src.series import (
+    SERIES_NPZ,
+    AlmacenSeries,
+    bandas_proyeccion,
+    factores_bootstrap,
+    pool_residuos_crecimiento,
+    proyectar_matriz,
+    reducir_puntos,
+    tasa_crecimiento,
+)
 
 # --------------------------------------------------
 # 1. CARGA DE DATOS Y MODELOS
 # --------------------------------------------------
 
-df = pd.read_csv("data/housing_final.csv", sep=";")
-df = df.drop(columns=["renta_es_proyeccion", "renta_neta_anual"])
-
-df["ccaa_mapa"] = df["ccaa"]
+MAX_PUNTOS_GRAFICO = 120  # puntos históricos máx. por serie en las gráficas
+MAX_PROVINCIAS_COMPARACION = 10  # provincias superpuestas en la comparación
+PERIODOS_POR_ANIO = {"anual": 1, "trimestral": 4, "mensual": 12}
+
+# Bandas de la proyección (nivel y horizonte máximo del slider)
+NIVEL_BANDAS = 0.90
+HORIZONTE_MAX = 10
+
+# Variables del mapa y del ranking:
+# variable -> (etiqueta, rango fijo de color, mayor es mejor)
+VARIABLES_MAPA = {
+    "esfuerzo_alquiler_pct": ("Esfuerzo alquiler (%)", (0, 60), False),
+    "esfuerzo_cuota_pct": ("Esfuerzo hipoteca (%)", (0, 60), False),
+    "anios_ahorrar_entrada": ("Años para entrada", (0, 15), False),
+    "renta_minima_cuota": ("Renta mínima por persona (€/mes)", (0, 4000), False),
+    "m2_maximos_cuota": ("m² asumibles", (0, 150), True),
+    "interes_maximo_cuota": ("Tipo máximo asumible (%)", (0, 10), True),
+    "anios_entrada_simulados": ("Años para entrada (con crecimiento)", (0, 15), False),
+    "coste_total_propiedad": ("Coste total: precio + intereses (€)", (0, 600000), False),
+    "anios_equilibrio_compra": ("Años para que comprar compense", (0, HORIZONTE_EQUILIBRIO), False),
+}
 
-with open("data/spain_provinces.geojson", encoding="utf-8-sig") as f:
-    geojson_provincias = json.load(f)
+# Parámetros del hogar en el análisis de sensibilidad
+ETIQUETAS_PARAMETROS = {
+    "renta_mensual_individual": "Renta por persona (€/mes)",
+    "interes_hipoteca": "Tipo de interés (%)",
+    "tamano_vivienda_m2": "Tamaño de la vivienda (m²)",
+    "n_salarios": "Nº salarios",
+    "pct_ahorro": "Ahorro (% ingresos)",
+    "plazo_anios": "Plazo (años)",
+}
 
-print("GeoJSON cargado. Nº de features:", len(geojson_provincias["features"]))
+# GeoJSON de provincias: se serializa compacto y comprimido una sola vez
+# y el navegador lo descarga de /geo/provincias.geojson (con caché). En
+# memoria solo quedan esos bytes, no el diccionario ya parseado, y las
+# figuras del mapa lo referencian por URL en lugar de llevarlo dentro.
+with open(GEOJSON_PROVINCIAS, encoding="utf-8-sig") as f:
+    _geojson = json.load(f)
+print("GeoJSON cargado. Nº de features:", len(_geojson["features"]))
+GEOJSON_GZ = gzip.compress(json.dumps(_geojson, separators=(",", ":"), ensure_ascii=False).encode(), 9)
+GEOJSON_ETAG = hashlib.sha1(GEOJSON_GZ).hexdigest()[:16]
+del _geojson
 
 # --------------------------------------------------
-# Función de normalización
+# Registro versionado de datos y modelos (src/registro.py)
+# Cada versión se construye entera y se publica de golpe; los callbacks
+# leen `registro.actual()` una vez al empezar y terminan con esa versión.
+# Con RECARGA_SEGUNDOS > 0 (Procfile / render.yaml), un hilo vigila los
+# ficheros y construye las versiones nuevas en segundo plano, sin
+# reiniciar los workers. Por defecto no: importar la app desde un script
+# no deja hilos en marcha.
 # --------------------------------------------------
-def normalize(s: str) -> str:
-    if s is None:
-        return ""
-    s = str(s)
-    # quitar tildes
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(c for c in s if not unicodedata.combining(c))
-    # minúsculas + quitar espacios, guiones, etc.
-    s = re.sub(r"[^a-z0-9]", "", s.lower())
-    return s
+DATA_CSV = Path("data/housing_final.csv")
+FUENTES_DATOS = [DATA_CSV, PROVINCIAS_CSV, SERIES_NPZ]
+FUENTES_MODELOS = [
+    ruta_artefacto("compra"), ruta_artefacto("alquiler"),
+    Path("models/model_compra.pkl"), Path("models/model_alquiler.pkl"),
+]
+RECARGA_SEGUNDOS = float(os.environ.get("RECARGA_SEGUNDOS", "0"))
 
-# --------------------------------------------------
-# 1) Tabla de provincias del GEOJSON
-# --------------------------------------------------
-geo_prov_norm_to_texto = {}
-geo_prov_texto_to_ccaa = {}
+COLUMNAS_CATEGORICAS = ["ccaa", "provincia"]
+COLUMNAS_MEDIDAS = ["precio_compra_m2", "precio_alquiler_m2", "renta_mensual_neta", "tipo_interes_hipoteca"]
 
-for feat in geojson_provincias["features"]:
-    nombre_prov = feat["properties"]["Texto"]          # p.ej. "La Coruña"
-    nombre_ccaa = feat["properties"]["CCAA"]           # p.ej. "Galicia"
-    key_norm = normalize(nombre_prov)
 
-    geo_prov_norm_to_texto[key_norm] = nombre_prov
-    geo_prov_texto_to_ccaa[nombre_prov] = nombre_ccaa
+class Datos:
+    """
+    Dataset de la app y todo lo que se deriva de él: tabla de provincias
+    (nombres del GeoJSON), series, tipos medios por año, bandas de la
+    proyección y rangos de los sliders. Una instancia por versión de los
+    ficheros.
+
+    `df` se guarda compacto (src/memoria.py): CCAA y provincia como
+    categóricas y las medidas en float32. Lo que depende de la provincia
+    y no del año (nombre en el GeoJSON, CCAA del GeoJSON) no se repite
+    por fila: se busca por `cod_ine` en `provincias`.
+    """
 
-# --------------------------------------------------
-# 2) Correcciones manuales para casos "raros"
-#    (se aplican sobre tu CSV)
-# --------------------------------------------------
-def normalize_prov_df(nombre: str) -> str:
-    base = normalize(nombre)
-    fixes = {
-        "acoruna": "lacoruna",                # "A Coruña" -> "La Coruña"
-        "baleares": "islasbaleares",          # "Baleares" -> "Islas Baleares"
-        "gipuzcoa": "guipuzcoa",              # "Gipúzcoa" -> "Guipúzcoa"
-        "girona": "gerona",                   # "Girona" -> "Gerona"
-        "lleida": "lleida",                   
-        "ourense": "orense",                  # "Ourense" -> "Orense"
-        "tenerife": "santacruzdetenerife",    # "Tenerife" -> "Santa Cruz de Tenerife"
-    }
-    return fixes.get(base, base)
+    def __init__(self, version):
+        self.version = version
 
-# --------------------------------------------------
-# 3) Crear columna de unión para el mapa
-# --------------------------------------------------
-def provincia_to_geo(nombre_prov: str):
-    key = normalize_prov_df(nombre_prov)
-    return geo_prov_norm_to_texto.get(key)
+        df = pd.read_csv(DATA_CSV, sep=";")
+        df = df.drop(columns=["renta_es_proyeccion", "renta_neta_anual"])
 
-df["provincia_mapa"] = df["provincia"].apply(provincia_to_geo)
+        # Unión con el GeoJSON por código INE de provincia
+        # (tabla de dimensión precalculada en dataset/build_provincias.py)
+        self.provincias = cargar_provincias().set_index("cod_ine")
 
-# (opcional) comprobar si alguna provincia no ha casado bien
-provincias_fallidas = df[df["provincia_mapa"].isna()]["provincia"].unique()
-print("Provincias sin match en el geojson:", provincias_fallidas)
+        # (opcional) comprobar si alguna provincia no ha casado bien
+        provincias_fallidas = df.loc[~df["cod_ine"].isin(self.provincias.index), "provincia"].unique()
+        print("Provincias sin match en el geojson:", provincias_fallidas)
 
-# --------------------------------------------------
-# 4) (Opcional) columna CCAA del geojson
-# --------------------------------------------------
-df["ccaa_geo"] = df["provincia_mapa"].map(geo_prov_texto_to_ccaa)
+        self.cod_por_provincia = {p: int(c) for p, c in zip(df["provincia"], df["cod_ine"])}
+
+        # Series mensuales (y agregados trimestral/anual) para la pestaña de evolución
+        self.series = AlmacenSeries.cargar(SERIES_NPZ) if SERIES_NPZ.exists() else None
+
+        # Tipo hipotecario medio de cada año (para las hipotecas a tipo variable)
+        self.tipos_por_anio = df.groupby("anio")["tipo_interes_hipoteca"].mean()
+
+        # Bandas de la proyección: bootstrap de los residuos del crecimiento
+        # anual de todas las provincias, para todo el horizonte del slider
+        # (en cada petición solo se multiplican)
+        self.factores_bandas = {
+            var: factores_bootstrap(
+                pool_residuos_crecimiento(df.pivot_table(index="cod_ine", columns="anio", values=var)),
+                HORIZONTE_MAX,
+                nivel=NIVEL_BANDAS,
+            )
+            for var in ("precio_compra_m2", "precio_alquiler_m2")
+        }
 
-# Modelos entrenados
-model_compra = joblib.load("models/model_compra.pkl")
-model_alquiler = joblib.load("models/model_alquiler.pkl")
+        # Rango de sliders
+        self.default_ccaa = sorted(df["ccaa"].unique())[0]
+        self.default_provincias = sorted(df[df["ccaa"] == self.default_ccaa]["provincia"].unique())
+        self.default_provincia = self.default_provincias[0]
 
-# Rango de sliders
-default_ccaa = sorted(df["ccaa"].unique())[0]
-default_provincias = sorted(df[df["ccaa"] == default_ccaa]["provincia"].unique())
-default_provincia = default_provincias[0]
+        self.anio_min = int(df["anio"].min())
+        self.anio_max = int(df["anio"].max())
 
-anio_min = int(df["anio"].min())
-anio_max = int(df["anio"].max())
+        self.renta_min = int(df["renta_mensual_neta"].min())
+        self.renta_max = int(df["renta_mensual_neta"].max())
+        self.renta_med = int(df["renta_mensual_neta"].median())
 
-renta_min = int(df["renta_mensual_neta"].min())
-renta_max = int(df["renta_mensual_neta"].max())
-renta_med = int(df["renta_mensual_neta"].median())
+        self.interes_min = float(df["tipo_interes_hipoteca"].min())
+        self.interes_max = float(df["tipo_interes_hipoteca"].max())
+        self.interes_med = float(df["tipo_interes_hipoteca"].median())
 
-interes_min = float(df["tipo_interes_hipoteca"].min())
-interes_max = float(df["tipo_interes_hipoteca"].max())
-interes_med = float(df["tipo_interes_hipoteca"].median())
+        # Todo lo anterior sale de los valores originales (float64); a
+        # partir de aquí solo se guarda la versión compacta
+        self.df = compactar(df, categoricas=COLUMNAS_CATEGORICAS, flotantes=COLUMNAS_MEDIDAS)
+
+    def estructuras(self) -> dict:
+        """Estructuras en memoria de esta versión (para el diagnóstico de memoria)."""
+        return {
+            "datos.df": self.df,
+            "datos.provincias": self.provincias,
+            "datos.series": self.series,
+            "datos.factores_bandas": self.factores_bandas,
+            "datos.tipos_por_anio": self.tipos_por_anio,
+        }
+
+
+# Modelos entrenados: artefacto portable (solo NumPy) si existe,
+# si no, el pipeline pickled de scikit-learn
+def cargar_modelo(nombre):
+    path = ruta_artefacto(nombre)
+    if path.exists():
+        return ModeloLineal.cargar(path)
+    import joblib  # solo en el fallback: arrastra scikit-learn
+
+    return joblib.load(f"models/model_{nombre}.pkl")
+
+
+def cargar_modelos(version):
+    return {"compra": cargar_modelo("compra"), "alquiler": cargar_modelo("alquiler")}
+
+
+registro = RegistroArtefactos([
+    Componente("datos", FUENTES_DATOS, Datos),
+    Componente("modelos", FUENTES_MODELOS, cargar_modelos),
+])
+if RECARGA_SEGUNDOS > 0:
+    registro.iniciar(RECARGA_SEGUNDOS)
+
+
+def datos_actuales() -> Datos:
+    return registro.actual()["datos"]
+
+
+# Últimas salidas de cada callback por sesión (src/sesiones.py): quien
+# vuelve a una provincia o a un valor de slider ya visto no recalcula
+SESIONES = AlmacenSesiones(
+    version=lambda: registro.actual().version,
+    por_callback=int(os.environ.get("SESIONES_POR_CALLBACK", "4")),
+    max_sesiones=int(os.environ.get("SESIONES_MAX", "500")),
+    max_mb=float(os.environ.get("SESIONES_MAX_MB", "64")),
+    inactividad=float(os.environ.get("SESIONES_INACTIVIDAD_SEGUNDOS", "1800")),
+)
+
+
+# Crecimiento anual de cada provincia (CAGR de los últimos 5 años, el de
+# la proyección) para las simulaciones; se calcula una vez por variable y
+# versión de los datos y se reutiliza en todas las peticiones
+@cache_versionada()
+def crecimiento_provincias(datos, variable, ventana=5):
+    m = datos.df.pivot_table(index="cod_ine", columns="anio", values=variable)
+    return pd.Series(tasa_crecimiento(m.to_numpy(dtype=float), ventana=ventana), index=m.index)
+
+
+def crecimiento_por_fila(datos, variable, cod_ines):
+    """CAGR alineado con una columna de cod_ine (0 si la provincia no tiene serie)."""
+    return crecimiento_provincias(datos, variable).reindex(cod_ines).fillna(0).to_numpy()
 
-PCT_ENTRADA = 0.20  # 20% de entrada
 
 # --------------------------------------------------
 # Estilos (solo cosmética)
@@ -143,12 +290,28 @@ def calcular_indicadores_provincias(
     n_salarios,
     pct_ahorro,
     plazo_anios,
+    esfuerzo_objetivo=ESFUERZO_OBJETIVO,
+    datos=None,
 ):
     """
     Devuelve un DataFrame con una fila por provincia en el año dado,
     con columnas de esfuerzo de alquiler, esfuerzo de hipoteca y años
     para ahorrar la entrada, usando los valores de los sliders.
+
+    Incluye también el problema inverso para la cuota: renta mínima por
+    persona, m² máximos y tipo máximo con los que la hipoteca no supera
+    `esfuerzo_objetivo` (% de los ingresos), y los años para la entrada
+    simulando que precio y renta siguen creciendo mientras se ahorra
+    (NaN si no se llega en 40 años), el coste total de la compra con
+    una hipoteca a tipo variable y los años a partir de los cuales
+    comprar sale más barato que alquilar (NaN si no ocurre en 30 años).
+
+    `datos` es la versión de los datos con la que trabaja el callback
+    (por defecto, la publicada).
     """
+    datos = datos or datos_actuales()
+    df = datos.df
+
     # 1) Filtrar año
     dff = df[df["anio"] == anio].copy()
     if dff.empty:
@@ -156,48 +319,86 @@ def calcular_indicadores_provincias(
         ultimo_anio = df["anio"].max()
         dff = df[df["anio"] == ultimo_anio].copy()
 
-    # 2) Ingresos y ahorro del hogar (constantes para todas las provincias)
-    ingresos_mensuales_hogar = renta_mensual_individual * n_salarios
-    ingresos_anuales_hogar = ingresos_mensuales_hogar * 12
-
-    tasa_ahorro = pct_ahorro / 100.0
-    ahorro_anual_posible = ingresos_anuales_hogar * tasa_ahorro
-
-    # 3) Vivienda tipo (compra y alquiler) para cada provincia
-    dff["precio_vivienda_tipo"] = dff["precio_compra_m2"] * tamano_vivienda_m2
-    dff["alquiler_vivienda_tipo_mensual"] = (
-        dff["precio_alquiler_m2"] * tamano_vivienda_m2
-    )
-
-    # 4) Esfuerzo alquiler (% ingreso)
-    dff["esfuerzo_alquiler_pct"] = (
-        dff["alquiler_vivienda_tipo_mensual"] / ingresos_mensuales_hogar * 100
+    # 2) Indicadores del hogar para todas las provincias a la vez
+    dff = dff.assign(**indicadores(
+        dff["precio_compra_m2"].to_numpy(dtype=float),
+        dff["precio_alquiler_m2"].to_numpy(dtype=float),
+        renta_mensual_individual=renta_mensual_individual,
+        interes_hipoteca=interes_hipoteca,
+        tamano_vivienda_m2=tamano_vivienda_m2,
+        n_salarios=n_salarios,
+        pct_ahorro=pct_ahorro,
+        plazo_anios=plazo_anios,
+        pct_entrada=PCT_ENTRADA,
+    ))
+
+    # 3) Problema inverso: qué renta, superficie o tipo dejan la cuota
+    #    justo en el esfuerzo objetivo
+    dff = dff.assign(**inversos(
+        dff["precio_compra_m2"].to_numpy(dtype=float),
+        renta_mensual_individual=renta_mensual_individual,
+        interes_hipoteca=interes_hipoteca,
+        tamano_vivienda_m2=tamano_vivienda_m2,
+        n_salarios=n_salarios,
+        plazo_anios=plazo_anios,
+        esfuerzo_objetivo=esfuerzo_objetivo,
+        pct_entrada=PCT_ENTRADA,
+    ))
+
+    # 4) Años para la entrada con precio y renta creciendo según la
+    #    proyección de cada provincia (todas las provincias a la vez)
+    anios_entrada = simular_entrada(
+        dff["precio_vivienda_tipo"].to_numpy(),
+        crecimiento_por_fila(datos, "precio_compra_m2", dff["cod_ine"]),
+        renta_mensual_individual * n_salarios * 12,
+        crecimiento_por_fila(datos, "renta_mensual_neta", dff["cod_ine"]),
+        pct_ahorro,
+        pct_entrada=PCT_ENTRADA,
     )
-
-    # 5) Entrada necesaria y años para ahorrar
-    dff["entrada_necesaria"] = dff["precio_vivienda_tipo"] * PCT_ENTRADA
-    dff["ahorro_anual_posible"] = ahorro_anual_posible
-    dff["anios_ahorrar_entrada"] = (
-        dff["entrada_necesaria"] / dff["ahorro_anual_posible"]
+    dff["anios_entrada_simulados"] = np.where(np.isinf(anios_entrada), np.nan, anios_entrada)
+
+    # 5) Coste total de la compra (precio + intereses) con la hipoteca a
+    #    tipo variable: tipos observados desde el año de compra y, después,
+    #    el del slider. Un cuadro de amortización por provincia, todos a la vez
+    tipos = np.append(datos.tipos_por_anio.loc[dff["anio"].iloc[0]:].to_numpy(), interes_hipoteca)
+    cuadro = cuadro_variable(dff["precio_vivienda_tipo"].to_numpy() * (1 - PCT_ENTRADA), tipos, plazo_anios)
+    dff["intereses_totales_hipoteca"] = totales(cuadro)["intereses_totales"]
+    dff["coste_total_propiedad"] = dff["precio_vivienda_tipo"] + dff["intereses_totales_hipoteca"]
+
+    # 6) Alquilar o comprar: año en que el coste neto de comprar baja del
+    #    de alquilar, con precio y alquiler creciendo según la proyección
+    _, coste_alquilar, coste_comprar = curvas_alquilar_comprar(
+        dff["precio_compra_m2"].to_numpy(dtype=float),
+        dff["precio_alquiler_m2"].to_numpy(dtype=float),
+        tamano_vivienda_m2,
+        interes_hipoteca,
+        plazo_anios,
+        crecimiento_por_fila(datos, "precio_compra_m2", dff["cod_ine"]),
+        crecimiento_por_fila(datos, "precio_alquiler_m2", dff["cod_ine"]),
     )
+    equilibrio = punto_equilibrio(coste_alquilar, coste_comprar)
+    dff["anios_equilibrio_compra"] = np.where(np.isinf(equilibrio), np.nan, equilibrio)
 
-    # 6) Cuota de hipoteca
-    principal = dff["precio_vivienda_tipo"] * (1 - PCT_ENTRADA)
-    r = interes_hipoteca / 100.0 / 12.0
-    n = plazo_anios * 12
+    return dff
 
-    if r == 0:
-        cuota_mensual = principal / n
-    else:
-        cuota_mensual = principal * (r * (1 + r) ** n) / ((1 + r) ** n - 1)
 
-    dff["cuota_hipoteca_mensual"] = cuota_mensual
-    dff["esfuerzo_cuota_pct"] = (
-        dff["cuota_hipoteca_mensual"] / ingresos_mensuales_hogar * 100
+# El mapa, el ranking y la API piden los mismos escenarios: se calculan
+# una vez por versión de los datos (no modificar el DataFrame devuelto)
+@cache_versionada(maxsize=256)
+def indicadores_escenario(datos, anio, renta, interes, tamano_vivienda, n_salarios, pct_ahorro, plazo_anios,
+                          esfuerzo_objetivo=ESFUERZO_OBJETIVO):
+    return calcular_indicadores_provincias(
+        anio=anio,
+        renta_mensual_individual=renta,
+        interes_hipoteca=interes,
+        tamano_vivienda_m2=tamano_vivienda,
+        n_salarios=n_salarios,
+        pct_ahorro=pct_ahorro,
+        plazo_anios=plazo_anios,
+        esfuerzo_objetivo=esfuerzo_objetivo,
+        datos=datos,
     )
 
-    return dff
-
 
 # --------------------------------------------------
 # 2. LAYOUT
@@ -212,252 +413,387 @@ DEFAULT_MORTGAGE_YEARS = 25
 app = Dash(__name__)
 server = app.server
 
-app.layout = html.Div(
-    style=APP_STYLE,
-    children=[
-        html.H1("Mercado de vivienda en España", style=HEADER_STYLE),
-
-        html.Div(
-            style={"display": "flex", "gap": "40px", "alignItems": "flex-start"},
-            children=[
-                # --------- PANEL IZQUIERDO: INPUTS ---------
-                html.Div(
-                    className="card left-panel",
-                    style=LEFT_PANEL_STYLE,
-                    children=[
-                        html.H3("Parámetros de entrada", className="card-title"),
-                        html.Label("Comunidad Autónoma"),
-                        dcc.Dropdown(
-                            id="ccaa-dropdown",
-                            options=[
-                                {"label": c, "value": c}
-                                for c in sorted(df["ccaa"].unique())
-                            ],
-                            value=default_ccaa,
-                            clearable=False,
-                        ),
-                        html.Br(),
-
-                        html.Label("Provincia"),
-                        dcc.Dropdown(
-                            id="provincia-dropdown",
-                            options=[{"label": p, "value": p} for p in default_provincias],
-                            value=default_provincia,
-                            clearable=False,
-                        ),
-                        html.Br(),
-
-                        html.Label("Año"),
-                        dcc.Slider(
-                            id="anio-slider",
-                            min=anio_min,
-                            max=anio_max,
-                            step=1,
-                            value=anio_max,
-                            marks={a: str(a) for a in range(anio_min, anio_max + 1)},
-                            tooltip={"placement": "bottom", "always_visible": True},
-                        ),
-                        html.Br(),
-
-                        html.Label("Renta mensual neta (€)"),
-                        dcc.Slider(
-                            id="renta-slider",
-                            min=renta_min,
-                            max=renta_max,
-                            step=50,
-                            value=renta_med,
-                            tooltip={"placement": "bottom", "always_visible": True},
-                        ),
-                        html.Div(id="renta-slider-label", className="slider-label", style=SLIDER_LABEL_STYLE),
-                        html.Br(),
-
-                        html.Label("Tipo interés hipoteca (%)"),
-                        dcc.Slider(
-                            id="interes-slider",
-                            min=round(interes_min, 2),
-                            max=round(interes_max, 2),
-                            step=0.1,
-                            value=round(interes_med, 2),
-                            tooltip={"placement": "bottom", "always_visible": True},
-                        ),
-                        html.Div(id="interes-slider-label", className="slider-label", style=SLIDER_LABEL_STYLE),
-                        html.Br(),
-
-                        html.Label("Tamaño de la vivienda (m²)"),
-                        dcc.Slider(
-                            id="house-size-slider",
-                            min=40,
-                            max=120,
-                            step=5,
-                            value=DEFAULT_HOUSE_SIZE,
-                            marks={m: str(m) for m in range(40, 125, 10)},
-                            tooltip={"placement": "bottom", "always_visible": True},
-                        ),
-                        html.Br(),
-
-                        html.Label("Nº salarios en el hogar"),
-                        dcc.Slider(
-                            id="n-salarios-slider",
-                            min=1.0,
-                            max=3.0,
-                            step=0.5,
-                            value=DEFAULT_N_SALARIES,
-                            marks={x: str(x) for x in [1.0, 1.5, 2.0, 2.5, 3.0]},
-                            tooltip={"placement": "bottom", "always_visible": True},
-                        ),
-                        html.Br(),
-
-                        html.Label("Porcentaje del ingreso que podéis ahorrar (%)"),
-                        dcc.Slider(
-                            id="savings-rate-slider",
-                            min=5,
-                            max=40,
-                            step=1,
-                            value=DEFAULT_SAVINGS_RATE,
-                            marks={p: f"{p}%" for p in range(5, 45, 5)},
-                            tooltip={"placement": "bottom", "always_visible": True},
-                        ),
-                        html.Br(),
-
-                        html.Label("Plazo de la hipoteca (años)"),
-                        dcc.Slider(
-                            id="mortgage-years-slider",
-                            min=10,
-                            max=35,
-                            step=1,
-                            value=DEFAULT_MORTGAGE_YEARS,
-                            marks={y: str(y) for y in range(10, 40, 5)},
-                            tooltip={"placement": "bottom", "always_visible": True},
-                        ),
-                        html.Br(),
-
-
-                    ],
-                ),
-
-                # --------- PANEL DERECHO: PREDICCIONES + TABS ---------
-                html.Div(
-                    style=RIGHT_PANEL_STYLE,
-                    children=[
-                        html.Div(
-                            style=CARD_STYLE,
-                            children=[
-                                        html.H4("Predicciones del modelo", className="card-title"),
-                                                        html.Div(id="predicciones-output", className="card-text"),
-                                            ],
-                                        ),
-
-                                                        html.Div(
-                                                            className="card",
-                                                            style=CARD_STYLE,
-                                                            children=[
-                                                dcc.Tabs(
-                                                    id="tabs-graficos",
-                                                    value="tab-evolucion",
-                                                    children=[
-                                dcc.Tab(
-                                    label="Evolución provincia",
-                                    value="tab-evolucion",
-                                    children=[
-                                        html.Div(
-                                            [
-                                                html.Label(
-                                                    "Horizonte de predicción (años)"
-                                                ),
-                                                dcc.Slider(
-                                                    id="horizonte-slider",
-                                                    min=0,
-                                                    max=10,
-                                                    step=1,
-                                                    value=0,
-                                                    marks={
-                                                        i: str(i) for i in range(0, 11)
+def construir_layout():
+    """
+    Layout de la página. Es una función para que cada carga de la página
+    tome los rangos de los sliders y las CCAA de la versión publicada de
+    los datos.
+    """
+    datos = datos_actuales()
+    return html.Div(
+        style=APP_STYLE,
+        children=[
+            html.H1("Mercado de vivienda en España", style=HEADER_STYLE),
+            # id de la sesión del navegador (estado por sesión en el servidor);
+            # en sessionStorage, así que sobrevive a recargar la pestaña
+            dcc.Store(id="sesion-id", storage_type="session", data=uuid.uuid4().hex),
+
+            html.Div(
+                style={"display": "flex", "gap": "40px", "alignItems": "flex-start"},
+                children=[
+                    # --------- PANEL IZQUIERDO: INPUTS ---------
+                    html.Div(
+                        className="card left-panel",
+                        style=LEFT_PANEL_STYLE,
+                        children=[
+                            html.H3("Parámetros de entrada", className="card-title"),
+                            html.Label("Comunidad Autónoma"),
+                            dcc.Dropdown(
+                                id="ccaa-dropdown",
+                                options=[
+                                    {"label": c, "value": c}
+                                    for c in sorted(datos.df["ccaa"].unique())
+                                ],
+                                value=datos.default_ccaa,
+                                clearable=False,
+                            ),
+                            html.Br(),
+
+                            html.Label("Provincia"),
+                            dcc.Dropdown(
+                                id="provincia-dropdown",
+                                options=[{"label": p, "value": p} for p in datos.default_provincias],
+                                value=datos.default_provincia,
+                                clearable=False,
+                            ),
+                            html.Br(),
+
+                            html.Label("Año"),
+                            dcc.Slider(
+                                id="anio-slider",
+                                min=datos.anio_min,
+                                max=datos.anio_max,
+                                step=1,
+                                value=datos.anio_max,
+                                marks={a: str(a) for a in range(datos.anio_min, datos.anio_max + 1)},
+                                tooltip={"placement": "bottom", "always_visible": True},
+                            ),
+                            html.Br(),
+
+                            html.Label("Renta mensual neta (€)"),
+                            dcc.Slider(
+                                id="renta-slider",
+                                min=datos.renta_min,
+                                max=datos.renta_max,
+                                step=50,
+                                value=datos.renta_med,
+                                tooltip={"placement": "bottom", "always_visible": True},
+                            ),
+                            html.Div(id="renta-slider-label", className="slider-label", style=SLIDER_LABEL_STYLE),
+                            html.Br(),
+
+                            html.Label("Tipo interés hipoteca (%)"),
+                            dcc.Slider(
+                                id="interes-slider",
+                                min=round(datos.interes_min, 2),
+                                max=round(datos.interes_max, 2),
+                                step=0.1,
+                                value=round(datos.interes_med, 2),
+                                tooltip={"placement": "bottom", "always_visible": True},
+                            ),
+                            html.Div(id="interes-slider-label", className="slider-label", style=SLIDER_LABEL_STYLE),
+                            html.Br(),
+
+                            html.Label("Tamaño de la vivienda (m²)"),
+                            dcc.Slider(
+                                id="house-size-slider",
+                                min=40,
+                                max=120,
+                                step=5,
+                                value=DEFAULT_HOUSE_SIZE,
+                                marks={m: str(m) for m in range(40, 125, 10)},
+                                tooltip={"placement": "bottom", "always_visible": True},
+                            ),
+                            html.Br(),
+
+                            html.Label("Nº salarios en el hogar"),
+                            dcc.Slider(
+                                id="n-salarios-slider",
+                                min=1.0,
+                                max=3.0,
+                                step=0.5,
+                                value=DEFAULT_N_SALARIES,
+                                marks={x: str(x) for x in [1.0, 1.5, 2.0, 2.5, 3.0]},
+                                tooltip={"placement": "bottom", "always_visible": True},
+                            ),
+                            html.Br(),
+
+                            html.Label("Porcentaje del ingreso que podéis ahorrar (%)"),
+                            dcc.Slider(
+                                id="savings-rate-slider",
+                                min=5,
+                                max=40,
+                                step=1,
+                                value=DEFAULT_SAVINGS_RATE,
+                                marks={p: f"{p}%" for p in range(5, 45, 5)},
+                                tooltip={"placement": "bottom", "always_visible": True},
+                            ),
+                            html.Br(),
+
+                            html.Label("Plazo de la hipoteca (años)"),
+                            dcc.Slider(
+                                id="mortgage-years-slider",
+                                min=10,
+                                max=35,
+                                step=1,
+                                value=DEFAULT_MORTGAGE_YEARS,
+                                marks={y: str(y) for y in range(10, 40, 5)},
+                                tooltip={"placement": "bottom", "always_visible": True},
+                            ),
+                            html.Br(),
+
+
+                        ],
+                    ),
+
+                    # --------- PANEL DERECHO: PREDICCIONES + TABS ---------
+                    html.Div(
+                        style=RIGHT_PANEL_STYLE,
+                        children=[
+                            html.Div(
+                                style=CARD_STYLE,
+                                children=[
+                                            html.H4("Predicciones del modelo", className="card-title"),
+                                                            html.Div(id="predicciones-output", className="card-text"),
+                                                ],
+                                            ),
+
+                                                            html.Div(
+                                                                className="card",
+                                                                style=CARD_STYLE,
+                                                                children=[
+                                                    dcc.Tabs(
+                                                        id="tabs-graficos",
+                                                        value="tab-evolucion",
+                                                        children=[
+                                    dcc.Tab(
+                                        label="Evolución provincia",
+                                        value="tab-evolucion",
+                                        children=[
+                                            html.Div(
+                                                [
+                                                    html.Label(
+                                                        "Horizonte de predicción (años)"
+                                                    ),
+                                                    dcc.Slider(
+                                                        id="horizonte-slider",
+                                                        min=0,
+                                                        max=HORIZONTE_MAX,
+                                                        step=1,
+                                                        value=0,
+                                                        marks={
+                                                            i: str(i) for i in range(0, HORIZONTE_MAX + 1)
+                                                        },
+                                                    ),
+                                                    html.Small(
+                                                        "0 = solo datos históricos · 1–10 = años adicionales desde el último año",
+                                                        style=SMALL_HELP,
+                                                    ),
+                                                    html.Br(),
+                                                    html.Br(),
+                                                    dcc.RadioItems(
+                                                        id="resolucion-radio",
+                                                        options=[
+                                                            {"label": "Anual", "value": "anual"},
+                                                            {"label": "Trimestral", "value": "trimestral", "disabled": datos.series is None},
+                                                            {"label": "Mensual", "value": "mensual", "disabled": datos.series is None},
+                                                        ],
+                                                        value="anual",
+                                                        inline=True,
+                                                        inputStyle={"marginRight": "4px", "marginLeft": "12px"},
+                                                    ),
+                                                    html.Br(),
+                                                    html.Label("Comparar con otras provincias"),
+                                                    dcc.Dropdown(
+                                                        id="comparar-provincias",
+                                                        options=[{"label": p, "value": p} for p in sorted(datos.cod_por_provincia)],
+                                                        multi=True,
+                                                        placeholder=f"Hasta {MAX_PROVINCIAS_COMPARACION} provincias",
+                                                    ),
+                                                    dcc.Checklist(
+                                                        id="comparar-ccaa",
+                                                        options=[{"label": " Todas las provincias de la CCAA", "value": "ccaa"}],
+                                                        value=[],
+                                                        inputStyle={"marginRight": "4px"},
+                                                    ),
+                                                    dcc.Graph(
+                                                        id="evolucion-compra-graph",
+                                                        style={"height": "300px"},
+                                                        config={"displayModeBar": False},
+                                                    ),
+                                                    dcc.Graph(
+                                                        id="evolucion-alquiler-graph",
+                                                        style={"height": "300px"},
+                                                        config={"displayModeBar": False},
+                                                    ),
+                                                    dcc.Graph(
+                                                        id="alquilar-comprar-graph",
+                                                        style={"height": "300px"},
+                                                        config={"displayModeBar": False},
+                                                    ),
+                                                ]
+                                            )
+                                        ],
+                                    ),
+                                    dcc.Tab(
+                                        label="Mapa por provincias",
+                                        value="tab-mapa",
+                                        children=[
+                                            html.Br(),
+                                            dcc.Dropdown(
+                                                id="mapa-variable",
+                                                options=[
+                                                    {
+                                                        "label": "Esfuerzo mensual en alquiler (% ingreso)",
+                                                        "value": "esfuerzo_alquiler_pct",
                                                     },
-                                                ),
-                                                html.Small(
-                                                    "0 = solo datos históricos · 1–10 = años adicionales desde el último año",
-                                                    style=SMALL_HELP,
-                                                ),
-                                                html.Br(),
-                                                html.Br(),
-                                                dcc.Graph(
-                                                    id="evolucion-compra-graph",
-                                                    style={"height": "300px"},
-                                                    config={"displayModeBar": False},
-                                                ),
-                                                dcc.Graph(
-                                                    id="evolucion-alquiler-graph",
-                                                    style={"height": "300px"},
-                                                    config={"displayModeBar": False},
-                                                ),
-                                            ]
-                                        )
-                                    ],
-                                ),
-                                dcc.Tab(
-                                    label="Mapa por provincias",
-                                    value="tab-mapa",
-                                    children=[
-                                        html.Br(),
-                                        dcc.Dropdown(
-                                            id="mapa-variable",
-                                            options=[
-                                                {
-                                                    "label": "Esfuerzo mensual en alquiler (% ingreso)",
-                                                    "value": "esfuerzo_alquiler_pct",
-                                                },
-                                                {
-                                                    "label": "Esfuerzo mensual en hipoteca (% ingreso)",
-                                                    "value": "esfuerzo_cuota_pct",
-                                                },
-                                                {
-                                                    "label": "Años para ahorrar la entrada",
-                                                    "value": "anios_ahorrar_entrada",
-                                                },
-                                            ],
-                                            value="esfuerzo_cuota_pct",
-                                            clearable=False,
-                                            style={"width": "60%", "marginBottom": "10px"},
-                                        ),
-                                        dcc.Graph(
-                                            id="mapa-ccaa",
-                                            style={"height": "500px"},
-                                        ),
-                                    ],
-                                ),
-                                dcc.Tab(
-                                    label="Ranking provincias",
-                                    value="tab-ranking",
-                                    children=[
-                                        dcc.Graph(
-                                            id="ranking-prov-graph",
-                                            style={"height": "500px"},
-                                        )
-                                    ],
-                                ),
-                                    ],
-                                ),
-                            ],
-                        ),
-                    ],
-                ),
-            ],
-        ),
-    ],
-)
+                                                    {
+                                                        "label": "Esfuerzo mensual en hipoteca (% ingreso)",
+                                                        "value": "esfuerzo_cuota_pct",
+                                                    },
+                                                    {
+                                                        "label": "Años para ahorrar la entrada",
+                                                        "value": "anios_ahorrar_entrada",
+                                                    },
+                                                    {
+                                                        "label": "Años para ahorrar la entrada (con precios y renta creciendo)",
+                                                        "value": "anios_entrada_simulados",
+                                                    },
+                                                    {
+                                                        "label": "Coste total de la compra: precio + intereses (tipo variable)",
+                                                        "value": "coste_total_propiedad",
+                                                    },
+                                                    {
+                                                        "label": "Años hasta que comprar sale más barato que alquilar",
+                                                        "value": "anios_equilibrio_compra",
+                                                    },
+                                                    {
+                                                        "label": "Renta mínima por persona para no pasar del esfuerzo objetivo",
+                                                        "value": "renta_minima_cuota",
+                                                    },
+                                                    {
+                                                        "label": "m² asumibles con el esfuerzo objetivo",
+                                                        "value": "m2_maximos_cuota",
+                                                    },
+                                                    {
+                                                        "label": "Tipo de interés máximo asumible (%)",
+                                                        "value": "interes_maximo_cuota",
+                                                    },
+                                                ],
+                                                value="esfuerzo_cuota_pct",
+                                                clearable=False,
+                                                style={"width": "60%", "marginBottom": "10px"},
+                                            ),
+                                            html.Label("Esfuerzo objetivo de la hipoteca (% de los ingresos)"),
+                                            dcc.Slider(
+                                                id="esfuerzo-objetivo-slider",
+                                                min=10,
+                                                max=50,
+                                                step=5,
+                                                value=ESFUERZO_OBJETIVO,
+                                                marks={i: f"{i}%" for i in range(10, 51, 10)},
+                                            ),
+                                            dcc.Graph(
+                                                id="mapa-ccaa",
+                                                style={"height": "500px"},
+                                            ),
+                                        ],
+                                    ),
+                                    dcc.Tab(
+                                        label="Ranking provincias",
+                                        value="tab-ranking",
+                                        children=[
+                                            dcc.Graph(
+                                                id="ranking-prov-graph",
+                                                style={"height": "500px"},
+                                            )
+                                        ],
+                                    ),
+                                    dcc.Tab(
+                                        label="Sensibilidad",
+                                        value="tab-sensibilidad",
+                                        children=[
+                                            html.Br(),
+                                            dcc.Dropdown(
+                                                id="sensibilidad-salida",
+                                                options=[
+                                                    {"label": VARIABLES_MAPA[v][0], "value": v}
+                                                    for v in SALIDAS_SENSIBILIDAD
+                                                ],
+                                                value=SALIDAS_SENSIBILIDAD[0],
+                                                clearable=False,
+                                                style={"width": "60%", "marginBottom": "10px"},
+                                            ),
+                                            dcc.Graph(
+                                                id="tornado-graph",
+                                                style={"height": "320px"},
+                                                config={"displayModeBar": False},
+                                            ),
+                                            html.Div(
+                                                style={"display": "flex", "gap": "10px"},
+                                                children=[
+                                                    dcc.Dropdown(
+                                                        id="sensibilidad-x",
+                                                        options=[{"label": e, "value": p} for p, e in ETIQUETAS_PARAMETROS.items()],
+                                                        value="renta_mensual_individual",
+                                                        clearable=False,
+                                                        style={"width": "50%"},
+                                                    ),
+                                                    dcc.Dropdown(
+                                                        id="sensibilidad-y",
+                                                        options=[{"label": e, "value": p} for p, e in ETIQUETAS_PARAMETROS.items()],
+                                                        value="interes_hipoteca",
+                                                        clearable=False,
+                                                        style={"width": "50%"},
+                                                    ),
+                                                ],
+                                            ),
+                                            dcc.Graph(
+                                                id="calor-sensibilidad-graph",
+                                                style={"height": "400px"},
+                                            ),
+                                            html.Small(
+                                                "Tornado: cada parámetro ±10% con el resto fijo · Mapa de calor: ±50% sobre los dos parámetros elegidos",
+                                                style=SMALL_HELP,
+                                            ),
+                                        ],
+                                    ),
+                                        ],
+                                    ),
+                                                    html.Div(id="descargas", style={**SMALL_HELP, "marginTop": "10px"}),
+                                ],
+                            ),
+                        ],
+                    ),
+                ],
+            ),
+        ],
+    )
+
+
+app.layout = construir_layout
+
 
 # --------------------------------------------------
 # 3. CALLBACKS
 # --------------------------------------------------
 
-def proyectar_serie_ultimos_anios(anios, valores, horizonte, ventana=5):
+def proyectar_serie_ultimos_anios(anios, valores, horizonte, ventana=5, periodos_por_anio=1,
+                                  factores=None):
     """
     Construye una serie con:
     - tramo histórico ("Histórico")
     - tramo proyectado ("Predicción") hasta `horizonte` años vista
 
-    La proyección usa el crecimiento medio anual (CAGR) calculado
-    sobre los últimos `ventana` años disponibles de la serie.
+    La proyección usa el crecimiento medio (CAGR) calculado sobre los
+    últimos `ventana` años disponibles de la serie.
+
+    Con `factores` (de `factores_bootstrap`, por año) el tramo proyectado
+    lleva además las columnas "inferior" y "superior" de la banda.
+
+    Con `periodos_por_anio` > 1 la serie es trimestral (4) o mensual (12):
+    `anios` son entonces fechas `datetime64[M]` y tanto la ventana como el
+    horizonte se convierten a periodos.
     """
     anios = np.array(anios)
     valores = np.array(valores, dtype=float)
@@ -468,27 +804,18 @@ def proyectar_serie_ultimos_anios(anios, valores, horizonte, ventana=5):
             {"anio": anios, "valor": valores, "tipo": "Histórico"}
         )
 
-    # Ventana de últimos años (máx. 'ventana' puntos)
-    n = min(ventana, len(anios))
-    anios_win = anios[-n:]
-    vals_win = valores[-n:]
-
-    first = vals_win[0]
-    last = vals_win[-1]
-
-    # CAGR sobre la ventana [primer año, último año]
-    if n > 1 and first > 0:
-        g = (last / first) ** (1 / (n - 1)) - 1
+    # Periodos futuros
+    pasos = np.arange(1, horizonte * periodos_por_anio + 1)
+    if periodos_por_anio == 1:
+        futuros_anios = anios.max() + pasos
     else:
-        g = 0.0  # sin variación si no hay info suficiente
-
-    # Años futuros
-    ultimo_anio = anios.max()
-    futuros_anios = np.arange(ultimo_anio + 1, ultimo_anio + 1 + horizonte)
+        futuros_anios = anios[-1] + pasos * np.timedelta64(12 // periodos_por_anio, "M")
 
-    # Valores futuros: crecimiento porcentual acumulado
-    futuros_vals = [last * (1 + g) ** k for k in range(1, horizonte + 1)]
-    futuros_vals = np.maximum(futuros_vals, 0)  # nunca negativos
+    # Valores futuros: CAGR por periodo sobre los últimos `ventana` años
+    # (nunca negativos)
+    futuros_vals = proyectar_matriz(
+        valores[None, :], len(pasos), ventana=ventana * periodos_por_anio
+    )[0]
 
     df_hist = pd.DataFrame(
         {"anio": anios, "valor": valores, "tipo": "Histórico"}
@@ -496,10 +823,144 @@ def proyectar_serie_ultimos_anios(anios, valores, horizonte, ventana=5):
     df_pred = pd.DataFrame(
         {"anio": futuros_anios, "valor": futuros_vals, "tipo": "Predicción"}
     )
+    if factores is not None:
+        inferior, superior = bandas_proyeccion(
+            futuros_vals[None, :], factores, pasos=pasos / periodos_por_anio
+        )
+        df_pred["inferior"] = inferior[0]
+        df_pred["superior"] = superior[0]
 
     return pd.concat([df_hist, df_pred], ignore_index=True)
 
 
+def serie_provincia(datos, provincia, variable, resolucion):
+    """
+    Devuelve (x, valores) de una provincia en la resolución pedida.
+    La anual sale del dataset principal; trimestral y mensual, del
+    almacén de series.
+    """
+    if resolucion == "anual" or datos.series is None:
+        df_prov = datos.df[datos.df["provincia"] == provincia].sort_values("anio")
+        return df_prov["anio"].values, df_prov[variable].values
+
+    return datos.series.serie(datos.cod_por_provincia.get(provincia, -1), variable, resolucion)
+
+
+def provincias_comparacion(datos, provincia, comparadas, ccaa=None, toda_ccaa=False):
+    """
+    Provincias a superponer, sin repetir y como mucho
+    MAX_PROVINCIAS_COMPARACION: la seleccionada, las elegidas para
+    comparar y, con `toda_ccaa`, todas las de la CCAA.
+    """
+    if isinstance(comparadas, str):
+        comparadas = [comparadas]
+    seleccion = [provincia, *(comparadas or [])]
+    if toda_ccaa and ccaa:
+        seleccion += sorted(datos.df.loc[datos.df["ccaa"] == ccaa, "provincia"].unique())
+    validas = [p for p in dict.fromkeys(seleccion) if p in datos.cod_por_provincia]
+    return validas[:MAX_PROVINCIAS_COMPARACION]
+
+
+def proyeccion_provincias(datos, cod_ines, variable, horizonte, resolucion):
+    """
+    Histórico y proyección CAGR de varias provincias a la vez: una sola
+    consulta a la matriz provincia × periodo y una proyección vectorizada.
+
+    Devuelve (x, historico, prediccion): un eje de periodos común (los de
+    la matriz más los del horizonte) y dos matrices provincias × periodos
+    con NaN donde no hay valor. La predicción empieza en el último dato
+    de cada provincia, para que la línea continúe la del histórico.
+    """
+    ppa = PERIODOS_POR_ANIO.get(resolucion, 1)
+    cods, periodos, m = matriz_resolucion(datos, variable, resolucion)
+    posicion = {int(c): i for i, c in enumerate(cods)}
+    filas = np.array([posicion.get(int(c), -1) for c in cod_ines], dtype=int)
+    m = np.where((filas >= 0)[:, None], m[np.maximum(filas, 0)], np.nan)
+
+    pasos = np.arange(1, horizonte * ppa + 1)
+    if ppa == 1:
+        x = np.concatenate([periodos, periodos[-1] + pasos])
+    else:
+        x = np.concatenate([periodos, periodos[-1] + pasos * np.timedelta64(12 // ppa, "M")])
+    historico = np.full((len(filas), len(x)), np.nan)
+    historico[:, :m.shape[1]] = m
+    prediccion = np.full_like(historico, np.nan)
+
+    ultimo = np.where(~np.isnan(m), np.arange(m.shape[1]), -1).max(axis=1)
+    con_datos = np.flatnonzero(ultimo >= 0)
+    if len(pasos) and len(con_datos):
+        futuros = proyectar_matriz(m[con_datos], len(pasos), ventana=5 * ppa)
+        columnas = ultimo[con_datos, None] + np.arange(len(pasos) + 1)
+        prediccion[con_datos[:, None], columnas] = np.column_stack([m[con_datos, ultimo[con_datos]], futuros])
+    return x, historico, prediccion
+
+
+def figura_comparacion(x, historico, prediccion, nombres, titulo, x_label):
+    """
+    Una traza por provincia (histórico continuo, proyección discontinua)
+    sobre el mismo eje x. Se devuelve como diccionario, sin pasar por la
+    validación de plotly, para que el coste no crezca con cada traza.
+    """
+    colores = px.colors.qualitative.Plotly
+    trazas = []
+    for i, nombre in enumerate(nombres):
+        color = colores[i % len(colores)]
+        trazas.append({
+            "type": "scatter", "mode": "lines", "x": x, "y": historico[i],
+            "name": nombre, "legendgroup": nombre, "line": {"color": color},
+        })
+        if not np.isnan(prediccion[i]).all():
+            trazas.append({
+                "type": "scatter", "mode": "lines", "x": x, "y": prediccion[i],
+                "name": f"{nombre} (predicción)", "legendgroup": nombre, "showlegend": False,
+                "line": {"color": color, "dash": "dash"},
+            })
+    return {
+        "data": trazas,
+        "layout": {
+            "title": {"text": titulo},
+            "xaxis": {"title": {"text": x_label}},
+            "yaxis": {"title": {"text": "€/m²"}},
+            "margin": dict(l=40, r=10, t=60, b=40),
+            "hovermode": "x unified",
+            "legend": dict(orientation="h", y=-0.2),
+        },
+    }
+
+
+def reducir_historico(serie):
+    """
+    Limita el tramo histórico a MAX_PUNTOS_GRAFICO puntos para que el
+    tamaño de la figura no dependa de la resolución elegida. La
+    proyección se calcula antes, sobre la serie completa.
+    """
+    hist = serie[serie["tipo"] == "Histórico"]
+    if len(hist) <= MAX_PUNTOS_GRAFICO:
+        return serie
+    x, y = reducir_puntos(hist["anio"].values, hist["valor"].values, MAX_PUNTOS_GRAFICO)
+    df_hist = pd.DataFrame({"anio": x, "valor": y, "tipo": "Histórico"})
+    return pd.concat([df_hist, serie[serie["tipo"] != "Histórico"]], ignore_index=True)
+
+
+def anadir_banda(fig, serie):
+    """Sombrea la banda de la proyección (si la serie la trae)."""
+    if "superior" not in serie:
+        return fig
+    pred = serie[serie["tipo"] == "Predicción"]
+    if pred.empty:
+        return fig
+    fig.add_trace(go.Scatter(
+        x=pred["anio"], y=pred["superior"], mode="lines",
+        line=dict(width=0), hoverinfo="skip", showlegend=False,
+    ))
+    fig.add_trace(go.Scatter(
+        x=pred["anio"], y=pred["inferior"], mode="lines",
+        line=dict(width=0), fill="tonexty", fillcolor="rgba(99, 110, 250, 0.18)",
+        name=f"Banda {NIVEL_BANDAS:.0%}",
+    ))
+    return fig
+
+
 # Provincias por CCAA
 @app.callback(
     Output("provincia-dropdown", "options"),
@@ -507,6 +968,7 @@ def proyectar_serie_ultimos_anios(anios, valores, horizonte, ventana=5):
     Input("ccaa-dropdown", "value"),
 )
 def actualizar_provincias(ccaa):
+    df = datos_actuales().df
     dff = df[df["ccaa"] == ccaa]
     provincias = sorted(dff["provincia"].unique())
     options = [{"label": p, "value": p} for p in provincias]
@@ -528,12 +990,16 @@ def actualizar_labels(renta, interes):
 
 
 # Predicciones
-def cuota_mensual(principal, interes_anual, plazo_anios):
-    r = interes_anual / 100 / 12
-    n = plazo_anios * 12
-    if r == 0:
-        return principal / n
-    return principal * (r * (1 + r) ** n) / ((1 + r) ** n - 1)
+def prediccion_con_intervalo(modelo, row):
+    """
+    Predicción del modelo y, si el artefacto trae incertidumbre, su
+    intervalo analítico (inferior, superior, nivel). El pipeline de
+    scikit-learn (fallback) no lo tiene: se devuelve None.
+    """
+    if getattr(modelo, "nivel", None) is None:
+        return modelo.predict(row)[0], None
+    pred, inferior, superior = modelo.intervalo(row)
+    return pred[0], (inferior[0], superior[0], modelo.nivel)
 
 
 @app.callback(
@@ -547,7 +1013,9 @@ def cuota_mensual(principal, interes_anual, plazo_anios):
     Input("n-salarios-slider", "value"),
     Input("savings-rate-slider", "value"),
     Input("mortgage-years-slider", "value"),
+    State("sesion-id", "data"),
 )
+@SESIONES.memoizar
 def actualizar_predicciones(
     ccaa,
     provincia,
@@ -575,51 +1043,50 @@ def actualizar_predicciones(
         ]
     )
 
-    pred_compra_m2 = model_compra.predict(row)[0]
-    pred_alquiler_m2 = model_alquiler.predict(row)[0]
-
-    # 2) Escenario del hogar según inputs del usuario
-    ingresos_hogar_mensuales = renta_mensual_individual * n_salarios
-    ingresos_hogar_anuales = ingresos_hogar_mensuales * 12
-
-    precio_vivienda = pred_compra_m2 * house_size_m2
-    alquiler_vivienda_mensual = pred_alquiler_m2 * house_size_m2
-
-    # --- parámetros "financieros" fijos ---
-    pct_entrada = 0.20     # 20% del precio
-    pct_hipoteca = 0.80    # 80% financiado
-    ahorro_rate = savings_rate_pct / 100.0
-
-    # 3) Indicador 1: esfuerzo de alquiler
-    esfuerzo_alquiler = (
-        alquiler_vivienda_mensual / ingresos_hogar_mensuales * 100
-        if ingresos_hogar_mensuales > 0
-        else None
-    )
-
-    # 4) Indicador 2: años para ahorrar la entrada
-    entrada = precio_vivienda * pct_entrada
-    ahorro_anual_posible = ingresos_hogar_anuales * ahorro_rate
-    anios_entrada = (
-        entrada / ahorro_anual_posible if ahorro_anual_posible > 0 else None
-    )
-
-    # 5) Indicador 3: esfuerzo de cuota hipotecaria
-    principal = precio_vivienda * pct_hipoteca
-    cuota_mensual_hipoteca = cuota_mensual(
-        principal, interes_hipoteca, mortgage_years
-    )
-    esfuerzo_cuota = (
-        cuota_mensual_hipoteca / ingresos_hogar_mensuales * 100
-        if ingresos_hogar_mensuales > 0
-        else None
-    )
+    modelos = registro.actual()["modelos"]
+    pred_compra_m2, rango_compra = prediccion_con_intervalo(modelos["compra"], row)
+    pred_alquiler_m2, rango_alquiler = prediccion_con_intervalo(modelos["alquiler"], row)
+
+    # 2) Indicadores del hogar con los precios predichos (mismas fórmulas
+    #    que el mapa, el ranking y la API: src/asequibilidad.py)
+    ind = {k: float(v) for k, v in indicadores(
+        pred_compra_m2,
+        pred_alquiler_m2,
+        renta_mensual_individual=renta_mensual_individual,
+        interes_hipoteca=interes_hipoteca,
+        tamano_vivienda_m2=house_size_m2,
+        n_salarios=n_salarios,
+        pct_ahorro=savings_rate_pct,
+        plazo_anios=mortgage_years,
+        pct_entrada=PCT_ENTRADA,
+    ).items()}
+    precio_vivienda = ind["precio_vivienda_tipo"]
+    alquiler_vivienda_mensual = ind["alquiler_vivienda_tipo_mensual"]
+    cuota_mensual_hipoteca = ind["cuota_hipoteca_mensual"]
+
+    # Con ingresos o ahorro nulos los cocientes no son finitos
+    esfuerzo_alquiler = ind["esfuerzo_alquiler_pct"] if np.isfinite(ind["esfuerzo_alquiler_pct"]) else None
+    anios_entrada = ind["anios_ahorrar_entrada"] if np.isfinite(ind["anios_ahorrar_entrada"]) else None
+    esfuerzo_cuota = ind["esfuerzo_cuota_pct"] if np.isfinite(ind["esfuerzo_cuota_pct"]) else None
+
+    principal = precio_vivienda * (1 - PCT_ENTRADA)
+    intereses_totales = totales_fijo(principal, interes_hipoteca, mortgage_years)["intereses_totales"]
 
     # 6) Construimos el bloque de texto
     return html.Div(
         [
-            html.P(f"Precio de compra estimado: {pred_compra_m2:,.0f} €/m²", style=CARD_TEXT_STYLE),
-            html.P(f"Precio de alquiler estimado: {pred_alquiler_m2:,.2f} €/m²", style=CARD_TEXT_STYLE),
+            html.P(
+                f"Precio de compra estimado: {pred_compra_m2:,.0f} €/m²"
+                + (f" (intervalo {rango_compra[2]:.0%}: {max(rango_compra[0], 0):,.0f} – "
+                   f"{rango_compra[1]:,.0f})" if rango_compra else ""),
+                style=CARD_TEXT_STYLE,
+            ),
+            html.P(
+                f"Precio de alquiler estimado: {pred_alquiler_m2:,.2f} €/m²"
+                + (f" (intervalo {rango_alquiler[2]:.0%}: {max(rango_alquiler[0], 0):,.2f} – "
+                   f"{rango_alquiler[1]:,.2f})" if rango_alquiler else ""),
+                style=CARD_TEXT_STYLE,
+            ),
             html.Hr(),
             html.P(
                 f"Para una vivienda de {house_size_m2:.0f} m² y un hogar con {n_salarios:.1f} salarios:",
@@ -633,7 +1100,7 @@ def actualizar_predicciones(
                         else "Alquiler: no se puede calcular (ingresos 0)."
                     ),
                     html.Li(
-                        f"Años necesarios para ahorrar la entrada (20%): {anios_entrada:,.1f} años"
+                        f"Años necesarios para ahorrar la entrada ({PCT_ENTRADA:.0%}): {anios_entrada:,.1f} años"
                         if anios_entrada is not None
                         else "Años para la entrada: no se puede calcular (ahorro 0)."
                     ),
@@ -643,6 +1110,10 @@ def actualizar_predicciones(
                         if esfuerzo_cuota is not None
                         else "Cuota hipotecaria: no se puede calcular (ingresos 0)."
                     ),
+                    html.Li(
+                        f"Intereses totales de la hipoteca: {intereses_totales:,.0f} € "
+                        f"(coste total {precio_vivienda + intereses_totales:,.0f} €)"
+                    ),
                 ],
                 style={"marginLeft": "18px"},
             ),
@@ -664,30 +1135,64 @@ def actualizar_predicciones(
     Output("evolucion-alquiler-graph", "figure"),
     Input("provincia-dropdown", "value"),
     Input("horizonte-slider", "value"),
+    Input("resolucion-radio", "value"),
+    Input("comparar-provincias", "value"),
+    Input("comparar-ccaa", "value"),
+    State("ccaa-dropdown", "value"),
+    State("sesion-id", "data"),
 )
-def update_evolucion_graphs(provincia, horizonte):
+@SESIONES.memoizar
+def update_evolucion_graphs(provincia, horizonte, resolucion="anual", comparadas=None, comparar_ccaa=None,
+                            ccaa=None):
+    datos = datos_actuales()
+
     # Por si acaso, si no hay provincia seleccionada usamos la primera del df
     if provincia is None:
-        provincia = df["provincia"].iloc[0]
+        provincia = datos.df["provincia"].iloc[0]
 
-    # Datos de la provincia
-    df_prov = df[df["provincia"] == provincia].sort_values("anio")
+    ppa = PERIODOS_POR_ANIO.get(resolucion, 1)
+
+    # Comparación: varias provincias superpuestas, una traza por provincia
+    if comparadas or comparar_ccaa:
+        provincias = provincias_comparacion(datos, provincia, comparadas, ccaa, toda_ccaa=bool(comparar_ccaa))
+        cod_ines = [datos.cod_por_provincia[p] for p in provincias]
+        x_label = "Año" if ppa == 1 else "Fecha"
+        figuras = []
+        for variable, nombre in (("precio_compra_m2", "compra"), ("precio_alquiler_m2", "alquiler")):
+            x, historico, prediccion = proyeccion_provincias(datos, cod_ines, variable, horizonte or 0, resolucion)
+            figuras.append(figura_comparacion(
+                x, historico, prediccion, provincias, f"Evolución del precio de {nombre}: comparación", x_label,
+            ))
+        return tuple(figuras)
+
+    return figuras_evolucion(datos, provincia, horizonte, resolucion)
+
+
+# Histórico y proyección de una provincia, una vez por versión de los datos
+@cache_versionada(maxsize=256)
+def figuras_evolucion(datos, provincia, horizonte, resolucion):
+    ppa = PERIODOS_POR_ANIO.get(resolucion, 1)
+
+    # Datos de la provincia (compra y alquiler pueden cubrir meses distintos)
+    anios_compra, valores_compra = serie_provincia(datos, provincia, "precio_compra_m2", resolucion)
+    anios_alquiler, valores_alquiler = serie_provincia(datos, provincia, "precio_alquiler_m2", resolucion)
 
     # Si por lo que sea no hay datos, devolvemos figuras vacías
-    if df_prov.empty:
+    if len(anios_compra) == 0 and len(anios_alquiler) == 0:
         fig_vacio = px.line(title="Sin datos para esta provincia")
         return fig_vacio, fig_vacio
 
-    # Vector de años
-    anios = df_prov["anio"].values
-
     # ===== 1) Serie de COMPRA: histórico + predicción usando SOLO los últimos 5 años =====
     serie_compra = proyectar_serie_ultimos_anios(
-        anios=anios,
-        valores=df_prov["precio_compra_m2"].values,
+        anios=anios_compra,
+        valores=valores_compra,
         horizonte=horizonte,
         ventana=5,   # <-- usamos los últimos 5 años para calcular el crecimiento
+        periodos_por_anio=ppa,
+        factores=datos.factores_bandas["precio_compra_m2"],
     )
+    serie_compra = reducir_historico(serie_compra)
+    x_label = "Año" if ppa == 1 else "Fecha"
 
     fig_compra = px.line(
         serie_compra,
@@ -696,9 +1201,10 @@ def update_evolucion_graphs(provincia, horizonte):
         color="tipo",
         line_dash="tipo",
         markers=True,
-        labels={"anio": "Año", "valor": "€/m²", "tipo": ""},
+        labels={"anio": x_label, "valor": "€/m²", "tipo": ""},
         title=f"Evolución del precio de compra en {provincia}",
     )
+    anadir_banda(fig_compra, serie_compra)
     fig_compra.update_layout(
         margin=dict(l=40, r=10, t=60, b=40),
         hovermode="x unified",
@@ -707,11 +1213,14 @@ def update_evolucion_graphs(provincia, horizonte):
 
     # ===== 2) Serie de ALQUILER: histórico + predicción usando SOLO los últimos 5 años =====
     serie_alquiler = proyectar_serie_ultimos_anios(
-        anios=anios,
-        valores=df_prov["precio_alquiler_m2"].values,
+        anios=anios_alquiler,
+        valores=valores_alquiler,
         horizonte=horizonte,
         ventana=5,
+        periodos_por_anio=ppa,
+        factores=datos.factores_bandas["precio_alquiler_m2"],
     )
+    serie_alquiler = reducir_historico(serie_alquiler)
 
     fig_alquiler = px.line(
         serie_alquiler,
@@ -720,9 +1229,10 @@ def update_evolucion_graphs(provincia, horizonte):
         color="tipo",
         line_dash="tipo",
         markers=True,
-        labels={"anio": "Año", "valor": "€/m²", "tipo": ""},
+        labels={"anio": x_label, "valor": "€/m²", "tipo": ""},
         title=f"Evolución del precio de alquiler en {provincia}",
     )
+    anadir_banda(fig_alquiler, serie_alquiler)
     fig_alquiler.update_layout(
         margin=dict(l=40, r=10, t=60, b=40),
         hovermode="x unified",
@@ -732,6 +1242,73 @@ def update_evolucion_graphs(provincia, horizonte):
     return fig_compra, fig_alquiler
 
 
+def fila_provincia(datos, provincia, anio):
+    """Fila de la provincia en el año dado (o en su último año); None si no hay datos."""
+    df = datos.df
+    fila = df[(df["provincia"] == provincia) & (df["anio"] == anio)]
+    if fila.empty:
+        fila = df[df["provincia"] == provincia].sort_values("anio").tail(1)
+    return None if fila.empty else fila.iloc[0]
+
+
+# Alquilar o comprar: coste neto acumulado de cada opción en la provincia
+@app.callback(
+    Output("alquilar-comprar-graph", "figure"),
+    Input("provincia-dropdown", "value"),
+    Input("anio-slider", "value"),
+    Input("interes-slider", "value"),
+    Input("house-size-slider", "value"),
+    Input("mortgage-years-slider", "value"),
+    State("sesion-id", "data"),
+)
+@SESIONES.memoizar
+def update_alquilar_comprar_graph(provincia, anio, interes, tamano_vivienda, plazo_anios):
+    datos = datos_actuales()
+    if provincia is None:
+        provincia = datos.df["provincia"].iloc[0]
+    fila = fila_provincia(datos, provincia, anio)
+    if fila is None:
+        return px.line(title="Sin datos para esta provincia")
+
+    anios, coste_alquilar, coste_comprar = curvas_alquilar_comprar(
+        fila["precio_compra_m2"],
+        fila["precio_alquiler_m2"],
+        tamano_vivienda,
+        interes,
+        plazo_anios,
+        crecimiento_por_fila(datos, "precio_compra_m2", [fila["cod_ine"]])[0],
+        crecimiento_por_fila(datos, "precio_alquiler_m2", [fila["cod_ine"]])[0],
+    )
+    equilibrio = float(punto_equilibrio(coste_alquilar, coste_comprar))
+
+    curvas = pd.DataFrame({
+        "anio": np.concatenate([anios, anios]),
+        "coste": np.concatenate([coste_alquilar, coste_comprar]),
+        "opcion": ["Alquilar"] * len(anios) + ["Comprar"] * len(anios),
+    })
+    titulo = (
+        f"Comprar compensa a partir del año {equilibrio:.1f} en {provincia}"
+        if np.isfinite(equilibrio)
+        else f"Comprar no compensa en {HORIZONTE_EQUILIBRIO} años en {provincia}"
+    )
+    fig = px.line(
+        curvas,
+        x="anio",
+        y="coste",
+        color="opcion",
+        labels={"anio": "Años desde la compra", "coste": "Coste neto acumulado (€)", "opcion": ""},
+        title=titulo,
+    )
+    if np.isfinite(equilibrio):
+        fig.add_vline(x=equilibrio, line_dash="dot", line_color="#5f6b7a")
+    fig.update_layout(
+        margin=dict(l=40, r=10, t=60, b=40),
+        hovermode="x unified",
+        legend=dict(orientation="h", y=-0.2),
+    )
+    return fig
+
+
 # --------------------------------------------------
 # Mapa por provincias
 # --------------------------------------------------
@@ -745,6 +1322,7 @@ def update_evolucion_graphs(provincia, horizonte):
     Input("n-salarios-slider", "value"),
     Input("savings-rate-slider", "value"),
     Input("mortgage-years-slider", "value"),
+    Input("esfuerzo-objetivo-slider", "value"),
 )
 def actualizar_mapa_esfuerzo(
     anio,
@@ -755,50 +1333,41 @@ def actualizar_mapa_esfuerzo(
     n_salarios,
     pct_ahorro,
     plazo_anios,
+    esfuerzo_objetivo=ESFUERZO_OBJETIVO,
 ):
-    # 1) Recalcular indicadores para TODAS las provincias
-    dff = calcular_indicadores_provincias(
-        anio=anio,
-        renta_mensual_individual=renta,
-        interes_hipoteca=interes,
-        tamano_vivienda_m2=tamano_vivienda,
-        n_salarios=n_salarios,
-        pct_ahorro=pct_ahorro,
-        plazo_anios=plazo_anios,
+    return figura_mapa(
+        datos_actuales(), anio, variable, renta, interes, tamano_vivienda, n_salarios, pct_ahorro, plazo_anios,
+        esfuerzo_objetivo,
     )
 
-    # 2) Nos quedamos solo con la columna que queremos pintar
-    df_map = dff[["provincia_mapa", variable]].copy()
 
-    # Título de la barra de color
-    colorbar_titles = {
-        "esfuerzo_alquiler_pct": "Esfuerzo alquiler (%)",
-        "esfuerzo_cuota_pct": "Esfuerzo hipoteca (%)",
-        "anios_ahorrar_entrada": "Años para entrada",
-    }
-    colorbar_title = colorbar_titles.get(variable, "")
+# Figura del mapa, una vez por versión de los datos y combinación de sliders
+@cache_versionada(maxsize=256)
+def figura_mapa(datos, anio, variable, *escenario):
+    # 1) Indicadores para TODAS las provincias
+    dff = indicadores_escenario(datos, anio, *escenario)
 
-    # --- Rango fijo para que los sliders cambien realmente el color del mapa ---
-    if variable in ("esfuerzo_alquiler_pct", "esfuerzo_cuota_pct"):
-        vmin, vmax = 0, 60     # 0–60 % del ingreso del hogar
-    elif variable == "anios_ahorrar_entrada":
-        vmin, vmax = 0, 15     # 0–15 años para ahorrar la entrada
-    else:
-        vmin, vmax = None, None
+    # 2) Nos quedamos solo con la columna que queremos pintar, con el
+    #    nombre de cada provincia en el GeoJSON (tabla de provincias)
+    df_map = pd.DataFrame({
+        "provincia_mapa": datos.provincias["Texto"].reindex(dff["cod_ine"]).to_numpy(),
+        variable: dff[variable].to_numpy(),
+    })
+
+    # Título de la barra de color y rango fijo (para que los sliders
+    # cambien realmente el color del mapa)
+    colorbar_title, (vmin, vmax), mayor_es_mejor = VARIABLES_MAPA.get(variable, ("", (None, None), False))
 
     fig = px.choropleth(
         df_map,
-        geojson=geojson_provincias,
+        geojson=app.get_relative_path("/geo/provincias.geojson"),
         locations="provincia_mapa",
         featureidkey="properties.Texto",
         color=variable,
-        color_continuous_scale="RdYlGn_r",  # verde = menos esfuerzo, rojo = más
+        # verde = más asequible, rojo = menos
+        color_continuous_scale="RdYlGn" if mayor_es_mejor else "RdYlGn_r",
         range_color=(vmin, vmax) if vmin is not None else None,
-        labels={
-            "esfuerzo_alquiler_pct": "Esfuerzo alquiler (%)",
-            "esfuerzo_cuota_pct": "Esfuerzo hipoteca (%)",
-            "anios_ahorrar_entrada": "Años para entrada",
-        },
+        labels={v: etiqueta for v, (etiqueta, _, _) in VARIABLES_MAPA.items()},
     )
 
     fig.update_geos(fitbounds="locations", visible=False)
@@ -823,6 +1392,7 @@ def actualizar_mapa_esfuerzo(
     Input("n-salarios-slider", "value"),
     Input("savings-rate-slider", "value"),
     Input("mortgage-years-slider", "value"),
+    Input("esfuerzo-objetivo-slider", "value"),
 )
 def actualizar_ranking(
     ccaa,
@@ -834,36 +1404,29 @@ def actualizar_ranking(
     n_salarios,
     pct_ahorro,
     plazo_anios,
+    esfuerzo_objetivo=ESFUERZO_OBJETIVO,
 ):
     if ccaa is None:
         return px.bar(title="Selecciona una CCAA para ver el ranking.")
-
-    # Recalculamos los indicadores para TODAS las provincias
-    dff = calcular_indicadores_provincias(
-        anio=anio,
-        renta_mensual_individual=renta,
-        interes_hipoteca=interes,
-        tamano_vivienda_m2=tamano_vivienda,
-        n_salarios=n_salarios,
-        pct_ahorro=pct_ahorro,
-        plazo_anios=plazo_anios,
+    return figura_ranking(
+        datos_actuales(), ccaa, anio, variable, renta, interes, tamano_vivienda, n_salarios, pct_ahorro,
+        plazo_anios, esfuerzo_objetivo,
     )
 
+
+@cache_versionada(maxsize=256)
+def figura_ranking(datos, ccaa, anio, variable, *escenario):
+    # Indicadores de TODAS las provincias (los mismos que el mapa)
+    dff = indicadores_escenario(datos, anio, *escenario)
+
     # Nos quedamos solo con la CCAA seleccionada
     dff = dff[dff["ccaa"] == ccaa].copy()
     if dff.empty:
         return px.bar(title="Sin datos para esa combinación.")
 
-    # Ordenamos por el indicador elegido (de más esfuerzo a menos)
-    dff = dff.sort_values(variable, ascending=False)
-
-    # Etiquetas bonitas según el indicador
-    y_labels = {
-        "esfuerzo_alquiler_pct": "Esfuerzo alquiler (%)",
-        "esfuerzo_cuota_pct": "Esfuerzo hipoteca (%)",
-        "anios_ahorrar_entrada": "Años para entrada",
-    }
-    titulo_indicador = y_labels.get(variable, variable)
+    # Ordenamos por el indicador elegido (de menos asequible a más)
+    titulo_indicador, _, mayor_es_mejor = VARIABLES_MAPA.get(variable, (variable, None, False))
+    dff = dff.sort_values(variable, ascending=mayor_es_mejor)
 
     fig = px.bar(
         dff,
@@ -882,6 +1445,736 @@ def actualizar_ranking(
     return fig
 
 
+# --------------------------------------------------
+# Sensibilidad: tornado y mapa de calor de la provincia seleccionada
+# --------------------------------------------------
+@app.callback(
+    Output("tornado-graph", "figure"),
+    Output("calor-sensibilidad-graph", "figure"),
+    Input("provincia-dropdown", "value"),
+    Input("anio-slider", "value"),
+    Input("renta-slider", "value"),
+    Input("interes-slider", "value"),
+    Input("house-size-slider", "value"),
+    Input("n-salarios-slider", "value"),
+    Input("savings-rate-slider", "value"),
+    Input("mortgage-years-slider", "value"),
+    Input("sensibilidad-salida", "value"),
+    Input("sensibilidad-x", "value"),
+    Input("sensibilidad-y", "value"),
+    State("sesion-id", "data"),
+)
+@SESIONES.memoizar
+def actualizar_sensibilidad(
+    provincia, anio, renta, interes, tamano_vivienda, n_salarios, pct_ahorro, plazo_anios,
+    salida, parametro_x, parametro_y,
+):
+    fila = fila_provincia(datos_actuales(), provincia, anio) if provincia is not None else None
+    if fila is None:
+        vacio = px.bar(title="Selecciona una provincia para ver la sensibilidad.")
+        return vacio, vacio
+
+    base = {
+        "renta_mensual_individual": renta,
+        "interes_hipoteca": interes,
+        "tamano_vivienda_m2": tamano_vivienda,
+        "n_salarios": n_salarios,
+        "pct_ahorro": pct_ahorro,
+        "plazo_anios": plazo_anios,
+    }
+    etiqueta_salida = VARIABLES_MAPA[salida][0]
+
+    # 1) Tornado: todos los escenarios perturbados en un único cálculo
+    tabla = tornado(fila["precio_compra_m2"], fila["precio_alquiler_m2"], base, salidas=(salida,))
+    tabla = tabla.iloc[::-1]  # el de mayor rango arriba
+    etiquetas = tabla["parametro"].map(ETIQUETAS_PARAMETROS)
+    valor_base = tabla["base"].iloc[0]
+    fig_tornado = go.Figure([
+        go.Bar(y=etiquetas, x=tabla["bajo"] - valor_base, base=valor_base, orientation="h",
+               name="Parámetro −10%", marker_color="#2a9d8f"),
+        go.Bar(y=etiquetas, x=tabla["alto"] - valor_base, base=valor_base, orientation="h",
+               name="Parámetro +10%", marker_color="#e76f51"),
+    ])
+    fig_tornado.update_layout(
+        barmode="overlay",
+        title=f"{etiqueta_salida} en {provincia}: qué parámetro pesa más",
+        xaxis_title=etiqueta_salida,
+        margin=dict(l=40, r=10, t=60, b=40),
+        legend=dict(orientation="h", y=-0.2),
+    )
+    fig_tornado.add_vline(x=valor_base, line_color="#5f6b7a")
+
+    # 2) Mapa de calor sobre dos parámetros
+    if parametro_x == parametro_y:
+        return fig_tornado, px.imshow([[np.nan]], title="Elige dos parámetros distintos")
+    valores_x = rejilla(parametro_x, base, puntos=PUNTOS_REJILLA)
+    valores_y = rejilla(parametro_y, base, puntos=PUNTOS_REJILLA)
+    calor = mapa_calor(
+        fila["precio_compra_m2"], fila["precio_alquiler_m2"], base,
+        parametro_x, valores_x, parametro_y, valores_y, salida=salida,
+    )
+    rango = VARIABLES_MAPA[salida][1]
+    fig_calor = px.imshow(
+        calor,
+        x=np.round(valores_x, 2),
+        y=np.round(valores_y, 2),
+        origin="lower",
+        aspect="auto",
+        color_continuous_scale="RdYlGn_r",
+        range_color=rango,
+        labels={"x": ETIQUETAS_PARAMETROS[parametro_x], "y": ETIQUETAS_PARAMETROS[parametro_y],
+                "color": etiqueta_salida},
+        title=f"{etiqueta_salida} según {ETIQUETAS_PARAMETROS[parametro_x].lower()} y {ETIQUETAS_PARAMETROS[parametro_y].lower()}",
+    )
+    fig_calor.update_layout(margin=dict(l=40, r=10, t=60, b=40))
+    return fig_tornado, fig_calor
+
+
+# Enlaces de descarga de la vista actual
+@app.callback(
+    Output("descargas", "children"),
+    Input("ccaa-dropdown", "value"),
+    Input("provincia-dropdown", "value"),
+    Input("anio-slider", "value"),
+    Input("renta-slider", "value"),
+    Input("interes-slider", "value"),
+    Input("house-size-slider", "value"),
+    Input("n-salarios-slider", "value"),
+    Input("savings-rate-slider", "value"),
+    Input("mortgage-years-slider", "value"),
+    Input("horizonte-slider", "value"),
+    Input("resolucion-radio", "value"),
+    Input("esfuerzo-objetivo-slider", "value"),
+)
+def actualizar_descargas(
+    ccaa, provincia, anio, renta, interes, tamano_vivienda, n_salarios, pct_ahorro, plazo_anios,
+    horizonte, resolucion, esfuerzo_objetivo=ESFUERZO_OBJETIVO,
+):
+    escenario = {
+        "renta": renta, "interes": interes, "tamano": tamano_vivienda,
+        "n_salarios": n_salarios, "ahorro": pct_ahorro, "plazo": plazo_anios,
+    }
+    formatos = ["csv", "parquet"] if parquet_disponible() else ["csv"]
+
+    def enlaces(texto, ruta, params):
+        return html.Span([
+            f"{texto}: ",
+            *[
+                html.A(fmt.upper(), href=f"/exportar/{ruta}.{fmt}?{urlencode(params)}",
+                       style={"marginRight": "6px"})
+                for fmt in formatos
+            ],
+        ], style={"marginRight": "14px"})
+
+    return [
+        "Descargar datos · ",
+        enlaces("Tabla provincias", "provincias", {"anio": anio, **escenario, "objetivo": esfuerzo_objetivo}),
+        enlaces("Cubo años × provincias", "provincias",
+                {"anio": "todos", **escenario, "objetivo": esfuerzo_objetivo}),
+        enlaces("Proyección", "proyeccion",
+                {"provincia": provincia, "horizonte": horizonte or HORIZONTE_MAX, "resolucion": resolucion}),
+        enlaces("Predicciones del escenario", "escenario", escenario),
+    ]
+
+
+# --------------------------------------------------
+# 4. ENDPOINTS HTTP (servidor Flask de Dash)
+# --------------------------------------------------
+
+MAX_ESCENARIOS_API = 20000
+# Procesos por petición de /api/escenarios: 1 por defecto; los hilos de
+# gunicorn ya atienden peticiones a la vez y cada pool de procesos
+# competiría con ellos por los mismos núcleos
+N_JOBS_API = int(os.environ.get("ESCENARIOS_N_JOBS", "1"))
+
+
+@server.route("/geo/provincias.geojson")
+def geojson_provincias():
+    """GeoJSON de provincias, ya serializado y comprimido al arrancar."""
+    if request.if_none_match.contains(GEOJSON_ETAG):
+        return Response(status=304)
+    cabeceras = {"ETag": f'"{GEOJSON_ETAG}"', "Cache-Control": "public, max-age=86400", "Vary": "Accept-Encoding"}
+    if "gzip" in request.accept_encodings:
+        return Response(GEOJSON_GZ, mimetype="application/geo+json", headers={**cabeceras, "Content-Encoding": "gzip"})
+    return Response(gzip.decompress(GEOJSON_GZ), mimetype="application/geo+json", headers=cabeceras)
+
+
+@server.route("/diagnostico/memoria")
+def diagnostico_memoria():
+    """
+    Memoria del worker que atiende la petición: RSS del proceso y bytes
+    de cada estructura (datos y modelos publicados, GeoJSON, cachés).
+    Cada worker tiene su copia; el `pid` dice cuál ha respondido.
+    """
+    version = registro.actual()
+    estructuras = {
+        **version["datos"].estructuras(),
+        "modelos": version["modelos"],
+        "geojson_gz": GEOJSON_GZ,
+        "cache.crecimiento_provincias": crecimiento_provincias.entradas,
+        "cache.indicadores_escenario": indicadores_escenario.entradas,
+        "cache.figuras": [figura_mapa.entradas, figura_ranking.entradas, figuras_evolucion.entradas],
+        "cache.api": cuerpo_api.entradas,
+    }
+    return jsonify(version=version.version, **resumen_proceso(estructuras))
+
+
+@server.route("/api/escenarios", methods=["POST"])
+def api_escenarios():
+    """
+    Evalúa un lote de escenarios de hogar contra todas las provincias y
+    años (ver src/escenarios.py) y devuelve los resultados en streaming.
+
+    Cuerpo: CSV o JSON, directamente o como fichero `escenarios` en un
+    formulario multipart. Parámetros: `formato` (csv | ndjson),
+    `anio` (repetible, para limitar años) y `sep` (separador del CSV).
+    """
+    fichero = request.files.get("escenarios")
+    if fichero is not None:
+        datos, nombre = fichero.read(), (fichero.filename or "").lower()
+    else:
+        datos, nombre = request.get_data(), ""
+    formato_entrada = "json" if request.is_json or nombre.endswith(".json") else "csv"
+    formato = request.args.get("formato", "csv")
+    if formato not in FORMATOS:
+        return jsonify(error=f"Formato no soportado: {formato}"), 400
+
+    try:
+        anios = [numero_desde_query({"anio": v}, "anio", None, tipo=int) for v in request.args.getlist("anio")]
+        escenarios = leer_escenarios(datos, formato=formato_entrada, sep=request.args.get("sep", ","))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    if len(escenarios) > MAX_ESCENARIOS_API:
+        return jsonify(error=f"Máximo {MAX_ESCENARIOS_API} escenarios por petición"), 413
+
+    version = registro.actual()
+    resultados = iterar_resultados(
+        version["datos"].df[COLUMNAS_BASE],
+        escenarios,
+        version["modelos"],
+        anios=anios or None,
+        formato=formato,
+        n_jobs=N_JOBS_API,
+    )
+    return Response(
+        stream_with_context(resultados),
+        mimetype=FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="escenarios.{formato}"'},
+    )
+
+
+@server.route("/api/sensibilidad")
+def api_sensibilidad():
+    """
+    Tornado (y, con `x` e `y`, mapa de calor) de una provincia para el
+    hogar de la URL. Parámetros: `provincia`, `anio`, `salida`,
+    `variacion` y los del hogar (ver escenario_desde_query).
+    """
+    datos = datos_actuales()
+    try:
+        anio = numero_desde_query(request.args, "anio", datos.anio_max, tipo=int)
+        base = escenario_desde_query(request.args, datos)
+        variacion = numero_desde_query(request.args, "variacion", VARIACION)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    if not 0 < variacion < 1:
+        return jsonify(error=f"`variacion` debe estar entre 0 y 1 (sin incluirlos): {variacion}"), 400
+    # Con renta, salarios o plazo <= 0 los indicadores dividen por cero
+    for nombre, parametro in (("renta", "renta_mensual_individual"), ("n_salarios", "n_salarios"),
+                              ("plazo", "plazo_anios")):
+        if base[parametro] <= 0:
+            return jsonify(error=f"`{nombre}` debe ser positivo: {base[parametro]}"), 400
+    provincia = request.args.get("provincia", datos.df["provincia"].iloc[0])
+    fila = fila_provincia(datos, provincia, anio)
+    if fila is None:
+        return jsonify(error=f"Provincia desconocida: {provincia}"), 404
+    salida = request.args.get("salida", SALIDAS_SENSIBILIDAD[0])
+    if salida not in SALIDAS_SENSIBILIDAD:
+        return jsonify(error=f"Salida no soportada: {salida}"), 400
+
+    datos_tornado = tornado(
+        fila["precio_compra_m2"], fila["precio_alquiler_m2"], base, variacion=variacion, salidas=(salida,),
+    )
+    respuesta = {
+        "provincia": provincia,
+        "anio": int(fila["anio"]),
+        "salida": salida,
+        "base": base,
+        # Lo no finito (p. ej. años de ahorro sin ahorro) va como null, igual que en el mapa de calor
+        "tornado": [
+            {k: None if isinstance(v, float) and not np.isfinite(v) else v for k, v in r.items()}
+            for r in datos_tornado.drop(columns="salida").to_dict(orient="records")
+        ],
+    }
+
+    parametro_x, parametro_y = request.args.get("x"), request.args.get("y")
+    if parametro_x or parametro_y:
+        if parametro_x not in base or parametro_y not in base:
+            return jsonify(error="`x` e `y` deben ser parámetros del hogar"), 400
+        valores_x, valores_y = rejilla(parametro_x, base), rejilla(parametro_y, base)
+        try:
+            calor = mapa_calor(
+                fila["precio_compra_m2"], fila["precio_alquiler_m2"], base,
+                parametro_x, valores_x, parametro_y, valores_y, salida=salida,
+            )
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+        respuesta["mapa_calor"] = {
+            "x": parametro_x, "valores_x": valores_x.round(4).tolist(),
+            "y": parametro_y, "valores_y": valores_y.round(4).tolist(),
+            "z": np.where(np.isfinite(calor), calor.round(4), None).tolist(),
+        }
+    return jsonify(respuesta)
+
+
+# --------------------------------------------------
+# Exportación en streaming (CSV / Parquet, ?gzip=1)
+# Los bloques salen de los arrays en memoria y se codifican según se
+# envían; la descarga ocupa un hilo del worker, no un worker completo
+# (Procfile: gunicorn con --threads).
+# --------------------------------------------------
+
+COLUMNAS_TABLA_PROVINCIAS = [
+    "cod_ine", "ccaa", "provincia", "anio", "precio_compra_m2", "precio_alquiler_m2",
+    "renta_mensual_neta", "tipo_interes_hipoteca", "precio_vivienda_tipo",
+    "alquiler_vivienda_tipo_mensual", "esfuerzo_alquiler_pct", "entrada_necesaria",
+    "ahorro_anual_posible", "anios_ahorrar_entrada", "cuota_hipoteca_mensual", "esfuerzo_cuota_pct",
+    "renta_minima_cuota", "m2_maximos_cuota", "interes_maximo_cuota", "anios_entrada_simulados",
+    "intereses_totales_hipoteca", "coste_total_propiedad", "anios_equilibrio_compra",
+]
+
+PROVINCIAS_POR_BLOQUE = 8
+
+
+def numero_desde_query(args, nombre, defecto, tipo=float):
+    """
+    Parámetro numérico de la URL (`defecto` si no viene). ValueError si
+    no es un número finito: un valor mal escrito no debe convertirse en
+    silencio en el valor por defecto.
+    """
+    if nombre not in args:
+        return defecto
+    try:
+        valor = tipo(args[nombre])
+    except ValueError:
+        raise ValueError(f"Parámetro no válido: {nombre}={args[nombre]!r}") from None
+    if not np.isfinite(valor):
+        raise ValueError(f"Parámetro no válido: {nombre}={args[nombre]!r}")
+    return valor
+
+
+def escenario_desde_query(args, datos=None):
+    """
+    Parámetros del hogar de la URL (por defecto, los de los sliders).
+    ValueError si alguno no es un número.
+    """
+    datos = datos or datos_actuales()
+    return {
+        "renta_mensual_individual": numero_desde_query(args, "renta", datos.renta_med),
+        "interes_hipoteca": numero_desde_query(args, "interes", datos.interes_med),
+        "tamano_vivienda_m2": numero_desde_query(args, "tamano", DEFAULT_HOUSE_SIZE),
+        "n_salarios": numero_desde_query(args, "n_salarios", DEFAULT_N_SALARIES),
+        "pct_ahorro": numero_desde_query(args, "ahorro", DEFAULT_SAVINGS_RATE),
+        "plazo_anios": numero_desde_query(args, "plazo", DEFAULT_MORTGAGE_YEARS),
+    }
+
+
+def bloques_tabla_provincias(datos, anios, escenario, ccaa=None, esfuerzo_objetivo=ESFUERZO_OBJETIVO):
+    """Indicadores por provincia, un bloque por año."""
+    for anio in anios:
+        dff = indicadores_escenario(
+            datos,
+            anio,
+            escenario["renta_mensual_individual"],
+            escenario["interes_hipoteca"],
+            escenario["tamano_vivienda_m2"],
+            escenario["n_salarios"],
+            escenario["pct_ahorro"],
+            escenario["plazo_anios"],
+            esfuerzo_objetivo,
+        )
+        if ccaa:
+            dff = dff[dff["ccaa"] == ccaa]
+        yield dff[COLUMNAS_TABLA_PROVINCIAS]
+
+
+@cache_versionada()
+def matriz_resolucion(datos, variable, resolucion):
+    """
+    (cod_ine, periodos, matriz provincia × periodo) de una variable; una
+    vez por versión de los datos (no modificar los arrays devueltos).
+    """
+    series = datos.series
+    if resolucion == "anual" or series is None:
+        m = datos.df.pivot_table(index="cod_ine", columns="anio", values=variable)
+        return m.index.to_numpy(), m.columns.to_numpy(), m.to_numpy(dtype=float)
+    return series.cod_ine, series.fechas[resolucion], series.valores[(variable, resolucion)].astype(float)
+
+
+# Columnas y tipos de bloques_proyeccion (para exportar sin filas)
+ESQUEMA_PROYECCION = {
+    "cod_ine": "int64", "provincia": "str", "variable": "str", "periodo": "str", "tipo": "str",
+    "valor": "float64", "inferior": "float64", "superior": "float64",
+}
+
+
+def bloques_proyeccion(datos, cod_ines, horizonte, resolucion):
+    """
+    Histórico + proyección CAGR con su banda para varias provincias a la
+    vez (misma lógica que la pestaña de evolución), en bloques de
+    PROVINCIAS_POR_BLOQUE provincias.
+    """
+    ppa = PERIODOS_POR_ANIO.get(resolucion, 1)
+    pasos = np.arange(1, horizonte * ppa + 1)
+    nombres = dict(zip(datos.df["cod_ine"], datos.df["provincia"]))
+
+    for variable in ("precio_compra_m2", "precio_alquiler_m2"):
+        cods, periodos, m = matriz_resolucion(datos, variable, resolucion)
+        sel = np.isin(cods, cod_ines)
+        cods, m = cods[sel], m[sel]
+
+        futuros = proyectar_matriz(m, len(pasos), ventana=5 * ppa)
+        inferior, superior = bandas_proyeccion(futuros, datos.factores_bandas[variable], pasos=pasos / ppa)
+        ultimo = np.where(~np.isnan(m), np.arange(m.shape[1]), -1).max(axis=1)
+        if ppa == 1:
+            etiqueta = lambda x: np.asarray(x).astype(int).astype(str)
+        else:
+            etiqueta = lambda x: np.datetime_as_string(np.asarray(x), unit="M")
+
+        for i in range(0, len(cods), PROVINCIAS_POR_BLOQUE):
+            partes = []
+            for j in range(i, min(i + PROVINCIAS_POR_BLOQUE, len(cods))):
+                if ultimo[j] < 0:
+                    continue
+                hist = ~np.isnan(m[j])
+                ultimo_periodo = periodos[ultimo[j]]
+                if ppa == 1:
+                    periodos_fut = ultimo_periodo + pasos
+                else:
+                    periodos_fut = ultimo_periodo + pasos * np.timedelta64(12 // ppa, "M")
+                partes.append(pd.DataFrame({
+                    "cod_ine": int(cods[j]),
+                    "provincia": nombres.get(int(cods[j]), ""),
+                    "variable": variable,
+                    "periodo": np.concatenate([etiqueta(periodos[hist]), etiqueta(periodos_fut)]),
+                    "tipo": ["Histórico"] * int(hist.sum()) + ["Predicción"] * len(pasos),
+                    "valor": np.concatenate([m[j, hist], futuros[j]]),
+                    "inferior": np.concatenate([np.full(hist.sum(), np.nan), inferior[j]]),
+                    "superior": np.concatenate([np.full(hist.sum(), np.nan), superior[j]]),
+                }))
+            if partes:
+                # 4 decimales, los del CSV (el histórico anual viene de float32)
+                yield pd.concat(partes, ignore_index=True).round({"valor": 4, "inferior": 4, "superior": 4})
+
+
+def respuesta_exportacion(bloques, nombre, formato, vacio=None):
+    """
+    Respuesta Flask en streaming (o 400 si el formato no es válido).
+    `vacio`: DataFrame sin filas que se exporta si no llega ningún bloque.
+    """
+    gzip = request.args.get("gzip", "0") in ("1", "true", "si")
+    try:
+        trozos = exportar(bloques, formato, gzip=gzip, vacio=vacio)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return Response(
+        stream_with_context(trozos),
+        mimetype="application/gzip" if gzip else FORMATOS_EXPORTACION[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nombre_fichero(nombre, formato, gzip)}"'},
+    )
+
+
+@server.route("/exportar/provincias.<formato>")
+def exportar_provincias(formato):
+    """
+    Tabla de provincias de la vista (mapa / ranking) para un año, o el
+    cubo completo años × provincias con `anio=todos`. Filtro `ccaa` opcional.
+    """
+    datos = datos_actuales()
+    anio = request.args.get("anio", str(datos.anio_max))
+    if anio == "todos":
+        anios = list(range(datos.anio_min, datos.anio_max + 1))
+    elif anio.isdigit():
+        anios = [int(anio)]
+    else:
+        return jsonify(error=f"Año no válido: {anio}"), 400
+    try:
+        escenario = escenario_desde_query(request.args, datos)
+        objetivo = numero_desde_query(request.args, "objetivo", ESFUERZO_OBJETIVO)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    bloques = bloques_tabla_provincias(
+        datos, anios, escenario, ccaa=request.args.get("ccaa"), esfuerzo_objetivo=objetivo,
+    )
+    return respuesta_exportacion(bloques, f"provincias_{anio}", formato)
+
+
+@server.route("/exportar/proyeccion.<formato>")
+def exportar_proyeccion(formato):
+    """
+    Series histórica y proyectada (CAGR + banda) de compra y alquiler.
+    Sin `provincia`, todas las provincias.
+    """
+    datos = datos_actuales()
+    provincia = request.args.get("provincia")
+    if provincia:
+        if provincia not in datos.cod_por_provincia:
+            return jsonify(error=f"Provincia desconocida: {provincia}"), 400
+        cod_ines = [datos.cod_por_provincia[provincia]]
+    else:
+        cod_ines = datos.df["cod_ine"].unique()
+    try:
+        horizonte = min(max(numero_desde_query(request.args, "horizonte", HORIZONTE_MAX, tipo=int), 0), HORIZONTE_MAX)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    resolucion = request.args.get("resolucion", "anual")
+    if resolucion not in PERIODOS_POR_ANIO:
+        return jsonify(error=f"Resolución no válida: {resolucion}"), 400
+    bloques = bloques_proyeccion(datos, cod_ines, horizonte, resolucion)
+    vacio = pd.DataFrame({c: pd.Series(dtype=t) for c, t in ESQUEMA_PROYECCION.items()})
+    return respuesta_exportacion(bloques, f"proyeccion_{resolucion}", formato, vacio=vacio)
+
+
+@server.route("/exportar/escenario.<formato>")
+def exportar_escenario(formato):
+    """Precios predichos e indicadores del escenario actual, años × provincias."""
+    version = registro.actual()
+    try:
+        escenario = pd.DataFrame([{"escenario": 0, **escenario_desde_query(request.args, version["datos"])}])
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    bloques = iterar_resultados(version["datos"].df[COLUMNAS_BASE], escenario, version["modelos"])
+    return respuesta_exportacion(bloques, "escenario", formato)
+
+
+# --------------------------------------------------
+# API de solo lectura: /api/v1/...
+# Cortes del cubo provincia × año (datos, indicadores de un escenario,
+# proyecciones) en JSON. La respuesta de cada consulta se serializa una
+# vez por versión de los datos y se guarda ya en bytes (y comprimida);
+# el ETag sale de la versión publicada (datos y modelos), de la del
+# código y de la consulta normalizada, así que un `If-None-Match` se
+# contesta con 304 sin calcular nada y un despliegue nuevo lo invalida.
+# --------------------------------------------------
+
+API_MAX_AGE = int(os.environ.get("API_MAX_AGE", "300"))  # segundos de caché en clientes y proxies
+API_PRECALENTAR = os.environ.get("API_PRECALENTAR", "0") != "0"  # opt-in: Procfile / render.yaml
+# Versión del código: VERSION_CODIGO o huella de app.py y src/*.py
+CODIGO_APP = os.environ.get("VERSION_CODIGO") or version_ficheros(
+    [Path(__file__), *sorted(Path(__file__).with_name("src").glob("*.py"))]
+)
+COLUMNAS_CUBO = [
+    "cod_ine", "ccaa", "provincia", "anio", "precio_compra_m2", "precio_alquiler_m2",
+    "renta_mensual_neta", "tipo_interes_hipoteca",
+]
+
+
+def filtrar_cubo(df, provincia=(), ccaa=None, desde=None, hasta=None):
+    """Filas del cubo para las provincias, la CCAA y el rango de años pedidos."""
+    mascara = np.ones(len(df), dtype=bool)
+    if provincia:
+        mascara &= df["provincia"].isin(provincia).to_numpy()
+    if ccaa:
+        mascara &= (df["ccaa"] == ccaa).to_numpy()
+    if desde is not None:
+        mascara &= (df["anio"] >= desde).to_numpy()
+    if hasta is not None:
+        mascara &= (df["anio"] <= hasta).to_numpy()
+    return df[mascara]
+
+
+def api_provincias(datos):
+    tabla = datos.df[["cod_ine", "ccaa", "provincia"]].drop_duplicates().sort_values("cod_ine")
+    return tabla.assign(nombre_geojson=datos.provincias["Texto"].reindex(tabla["cod_ine"]).to_numpy())
+
+
+def api_datos(datos, provincia=(), ccaa=None, desde=None, hasta=None):
+    return filtrar_cubo(datos.df, provincia, ccaa, desde, hasta)[COLUMNAS_CUBO].sort_values(["cod_ine", "anio"])
+
+
+def api_indicadores(datos, provincia=(), ccaa=None, desde=None, hasta=None, objetivo=ESFUERZO_OBJETIVO,
+                    **escenario):
+    anios = range(max(desde or datos.anio_min, datos.anio_min), min(hasta or datos.anio_max, datos.anio_max) + 1)
+    bloques = bloques_tabla_provincias(datos, anios, escenario, ccaa=ccaa, esfuerzo_objetivo=objetivo)
+    tabla = pd.concat(list(bloques), ignore_index=True) if len(anios) else pd.DataFrame(columns=COLUMNAS_TABLA_PROVINCIAS)
+    return filtrar_cubo(tabla, provincia).sort_values(["cod_ine", "anio"])
+
+
+def api_proyeccion(datos, provincia=(), ccaa=None, horizonte=HORIZONTE_MAX, resolucion="anual"):
+    cod_ines = filtrar_cubo(datos.df, provincia, ccaa)["cod_ine"].unique()
+    bloques = list(bloques_proyeccion(datos, cod_ines, horizonte, resolucion))
+    return pd.concat(bloques, ignore_index=True) if bloques else pd.DataFrame()
+
+
+# recurso -> (función, parámetros admitidos: nombre -> tipo)
+FILTROS_API = {"provincia": list, "ccaa": str, "desde": int, "hasta": int}
+ESCENARIO_API = {
+    "renta": ("renta_mensual_individual", float), "interes": ("interes_hipoteca", float),
+    "tamano": ("tamano_vivienda_m2", float), "n_salarios": ("n_salarios", float),
+    "ahorro": ("pct_ahorro", float), "plazo": ("plazo_anios", float),
+}
+RECURSOS_API = {
+    "provincias": (api_provincias, {}),
+    "datos": (api_datos, FILTROS_API),
+    "indicadores": (api_indicadores, {**FILTROS_API, "objetivo": float}),
+    "proyeccion": (api_proyeccion, {"provincia": list, "ccaa": str, "horizonte": int, "resolucion": str}),
+}
+
+
+def consulta_api(recurso, args, datos) -> tuple:
+    """
+    Parámetros de la URL normalizados y con los valores por defecto
+    rellenos, como tupla ordenada: dos URLs que piden lo mismo dan la
+    misma consulta (y el mismo ETag). ValueError si alguno no es válido.
+    """
+    _, admitidos = RECURSOS_API[recurso]
+    consulta = {}
+    for nombre, tipo in admitidos.items():
+        if tipo is list:
+            valores = args.getlist(nombre)
+            if valores:
+                consulta[nombre] = tuple(sorted(set(valores)))
+        elif nombre in args:
+            try:
+                consulta[nombre] = tipo(args[nombre])
+            except ValueError:
+                raise ValueError(f"Parámetro no válido: {nombre}={args[nombre]!r}") from None
+    if recurso == "indicadores":
+        escenario = escenario_desde_query(args, datos)
+        # mismo tipo venga o no en la URL (?ahorro=20 y sin ahorro: misma clave y mismo ETag)
+        consulta.update({clave: tipo(escenario[clave]) for clave, tipo in ESCENARIO_API.values()})
+        consulta.setdefault("objetivo", float(ESFUERZO_OBJETIVO))
+    if recurso == "proyeccion":
+        consulta["horizonte"] = min(max(consulta.get("horizonte", HORIZONTE_MAX), 0), HORIZONTE_MAX)
+        consulta.setdefault("resolucion", "anual")
+        if consulta["resolucion"] not in PERIODOS_POR_ANIO:
+            raise ValueError(f"Resolución no válida: {consulta['resolucion']}")
+    return tuple(sorted(consulta.items()))
+
+
+def etag_api(version, recurso, consulta) -> str:
+    """ETag de una consulta: versión publicada (datos y modelos), código y consulta."""
+    return hashlib.sha1(repr((version.version, CODIGO_APP, recurso, consulta)).encode()).hexdigest()[:20]
+
+
+@cache_versionada(maxsize=512)
+def cuerpo_api(datos, recurso, consulta):
+    """(JSON, JSON comprimido) de una consulta, serializados una vez por versión."""
+    funcion, _ = RECURSOS_API[recurso]
+    tabla = funcion(datos, **dict(consulta))
+    # 4 decimales; las medidas en float32 se pasan antes a float64 para
+    # que el redondeo quite también el ruido de la conversión
+    tabla = tabla.astype({c: "float64" for c in tabla.select_dtypes("float32").columns}).round(4)
+    filas = tabla.to_json(orient="records", force_ascii=False) if len(tabla) else "[]"
+    cabecera = json.dumps({
+        "version": datos.version, "recurso": recurso, "parametros": dict(consulta), "n": len(tabla),
+    }, ensure_ascii=False)
+    cuerpo = f'{cabecera[:-1]},"filas":{filas}}}'.encode()
+    return cuerpo, gzip.compress(cuerpo, 6)
+
+
+@server.route("/api/v1/version")
+def api_version():
+    version = registro.actual()
+    return jsonify(version=version.version, versiones=version.versiones, recursos=sorted(RECURSOS_API))
+
+
+@server.route("/api/v1/<recurso>")
+def api_v1(recurso):
+    """
+    Cortes del cubo en JSON: `provincias`, `datos`, `indicadores` y
+    `proyeccion`. Filtros: `provincia` (repetible), `ccaa`, `desde` y
+    `hasta` (años); `indicadores` admite además los parámetros del hogar
+    (`renta`, `interes`, `tamano`, `n_salarios`, `ahorro`, `plazo`) y
+    `objetivo`; `proyeccion`, `horizonte` y `resolucion`.
+    """
+    if recurso not in RECURSOS_API:
+        return jsonify(error=f"Recurso desconocido: {recurso}", recursos=sorted(RECURSOS_API)), 404
+    version = registro.actual()
+    datos = version["datos"]
+    try:
+        consulta = consulta_api(recurso, request.args, datos)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    etag = etag_api(version, recurso, consulta)
+    cabeceras = {
+        "ETag": f'"{etag}"',
+        "Cache-Control": f"public, max-age={API_MAX_AGE}",
+        "Vary": "Accept-Encoding",
+        "X-Version-Datos": datos.version,
+    }
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=cabeceras)
+
+    cuerpo, comprimido = cuerpo_api(datos, recurso, consulta)
+    if "gzip" in request.accept_encodings:
+        return Response(comprimido, mimetype="application/json", headers={**cabeceras, "Content-Encoding": "gzip"})
+    return Response(cuerpo, mimetype="application/json", headers=cabeceras)
+
+
+# Consultas frecuentes que se serializan al arrancar y con cada versión nueva
+CONSULTAS_COMUNES = [
+    ("provincias", {}),
+    ("datos", {}),
+    ("indicadores", {}),
+    ("proyeccion", {}),
+]
+
+
+def precalentar_api(instantanea):
+    datos = instantanea["datos"]
+    consultas = CONSULTAS_COMUNES + [("datos", {"ccaa": c}) for c in sorted(datos.df["ccaa"].unique())]
+    consultas += [("indicadores", {"desde": a, "hasta": a}) for a in range(datos.anio_min, datos.anio_max + 1)]
+    for recurso, args in consultas:
+        cuerpo_api(datos, recurso, consulta_api(recurso, MultiDict(args), datos))
+
+
+if API_PRECALENTAR:
+    registro.suscribir(precalentar_api)
+
+
+# --------------------------------------------------
+# Cachés en disco: arranque en caliente
+# Cada worker vuelca periódicamente (y al salir) las entradas más pedidas
+# de las cachés por versión a CACHES_FICHERO, y al arrancar, antes de
+# atender peticiones, recupera las de las versiones de datos y modelos
+# que está sirviendo; las de otras versiones se descartan. Las versiones
+# son huellas del contenido de los ficheros, así que sirven de un
+# despliegue a otro si los datos no han cambiado; el volcado lleva además
+# la versión del código (VERSION_CODIGO o huella de app.py y src/*.py) y
+# con otro código se descarta entero.
+# Solo se activa con CACHES_FICHERO (Procfile / render.yaml): importar la
+# app desde un script (src.estatico, src.carga…) no escribe nada.
+# --------------------------------------------------
+CACHES_FICHERO = os.environ.get("CACHES_FICHERO", "")
+CACHES_VOLCADO_SEGUNDOS = float(os.environ.get("CACHES_VOLCADO_SEGUNDOS", "300"))
+CACHES_MAX_MB = float(os.environ.get("CACHES_MAX_MB", "64"))
+
+if CACHES_FICHERO:
+    try:
+        n = cargar_caches(CACHES_FICHERO, CODIGO_APP, registro.versiones_vigentes())
+        print(f"Cachés: {n} entradas recuperadas de {CACHES_FICHERO}")
+    except Exception:
+        # volcado corrupto o de otra versión del código: se arranca en frío
+        print(f"Cachés: no se ha podido leer {CACHES_FICHERO}")
+        traceback.print_exc()
+    if CACHES_VOLCADO_SEGUNDOS > 0:
+        registro.iniciar_volcado(CACHES_FICHERO, CODIGO_APP, CACHES_VOLCADO_SEGUNDOS, CACHES_MAX_MB)
+
+# después de recuperar las cachés: solo se calcula lo que no estaba
+if API_PRECALENTAR:
+    threading.Thread(target=precalentar_api, args=(registro.actual(),), name="precalentar-api", daemon=True).start()
+
+
+@server.route("/diagnostico/caches")
+def diagnostico_caches():
+    """Entradas y tasa de acierto de cada caché y del estado por sesión en el worker que responde."""
+    return jsonify(
+        pid=os.getpid(), version=registro.actual().version, caches=estadisticas_caches(),
+        sesiones=SESIONES.estadisticas(),
+    )
+
 
 # --------------------------------------------------
 # MAIN
@@ -0,0 +1,107 @@
+"""
+Compara la lectura actual de los CSV de entrada
+(`sep=None, engine="python"`) con `src.etl.leer_csv` (formato detectado
+de una muestra + motor C / pyarrow), sobre los ficheros reales y sobre
+una exportación sintética grande al estilo del INE. También mide el modo
+por bloques (`chunksize`) y la memoria máxima de cada variante.
+
+    python dataset/bench_lectura_csv.py [--filas 500000]
+"""
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.etl import detectar_formato, leer_csv, pyarrow_disponible
+
+FICHEROS = [
+    Path("data/housing_precios_provincia.csv"),
+    Path("data/renta_provincia_2015_2025.csv"),
+    Path("Dataset/tipo_interes_hipotecas.csv"),
+    Path("Dataset/renta_ccaa.csv"),
+]
+
+
+def medir(funcion, repeticiones=3):
+    """(mejor tiempo en s, memoria máxima en MB) de `funcion()`."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - t0)
+    tracemalloc.start()
+    funcion()
+    pico = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return mejor, pico
+
+
+# ficheros que se repiten para simular exportaciones grandes: con separador
+# de miles (motor C) y sin él (pyarrow, si está instalado)
+SINTETICOS = [Path("Dataset/renta_ccaa.csv"), Path("data/renta_provincia_2015_2025.csv")]
+
+
+def exportacion_sintetica(origen: Path, destino: Path, filas: int) -> Path:
+    """Repite las filas de `origen` (con su cabecera y BOM) hasta `filas` filas."""
+    base = origen.read_text(encoding="utf-8-sig").splitlines()
+    cabecera, cuerpo = base[0], base[1:]
+    veces = -(-filas // len(cuerpo))
+    with open(destino, "w", encoding="utf-8-sig") as f:
+        f.write(cabecera + "\n")
+        for _ in range(veces):
+            f.write("\n".join(cuerpo) + "\n")
+    return destino
+
+
+def consumir_bloques(path, chunksize):
+    total = 0
+    for bloque in leer_csv(path, chunksize=chunksize):
+        total += bloque.iloc[:, -1].sum()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--filas", type=int, default=500_000)
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    args = parser.parse_args()
+
+    print(f"pyarrow disponible: {pyarrow_disponible()}\n")
+    filas = []
+    with tempfile.TemporaryDirectory() as tmp:
+        grandes = [
+            exportacion_sintetica(origen, Path(tmp) / f"{origen.stem}_x{args.filas}.csv", args.filas)
+            for origen in SINTETICOS
+        ]
+        for path in FICHEROS + grandes:
+            grande = path in grandes
+            rep = 1 if grande else 5
+            actual = medir(lambda: pd.read_csv(path, sep=None, engine="python", encoding="utf-8-sig"), rep)
+            nuevo = medir(lambda: leer_csv(path), rep)
+            fila = {
+                "fichero": path.name,
+                "formato": detectar_formato(path),
+                "python_s": actual[0], "python_mb": actual[1],
+                "leer_csv_s": nuevo[0], "leer_csv_mb": nuevo[1],
+                "x": actual[0] / nuevo[0],
+            }
+            if grande:
+                bloques = medir(lambda: consumir_bloques(path, args.chunksize), 1)
+                fila.update(bloques_s=bloques[0], bloques_mb=bloques[1])
+            filas.append(fila)
+
+    tabla = pd.DataFrame(filas).set_index("fichero")
+    print(tabla.drop(columns="formato").round(3).to_string())
+    print()
+    for fichero, formato in tabla["formato"].items():
+        print(f"{fichero}: {formato}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
+import sys
 from pathlib import Path
-import unicodedata
 import pandas as pd
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.etl import anadir_cod_ine, cargar_provincias, leer_csv
+
 # --- RUTAS DE ENTRADA / SALIDA ---
 
 PRECIOS_CSV   = Path("data/housing_precios_provincia.csv")
@@ -13,13 +17,6 @@ OUTPUT_CSV    = Path("data/housing_final.csv")
 
 # --- FUNCIONES AUXILIARES ---
 
-def normalize_name(s: str) -> str:
-    s = str(s).strip().lower()
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
-    return " ".join(s.split())
-
-
 def standardize_geo_cols(df: pd.DataFrame, origen: str) -> pd.DataFrame:
     df.columns = [c.strip() for c in df.columns]
     lower_map = {c.lower(): c for c in df.columns}
@@ -56,15 +53,15 @@ def standardize_geo_cols(df: pd.DataFrame, origen: str) -> pd.DataFrame:
 
 def main():
     # 1) Precios por provincia  (auto-detectar , o ;)
-    df_pre = pd.read_csv(PRECIOS_CSV, sep=None, engine="python", encoding="utf-8-sig")
+    df_pre = leer_csv(PRECIOS_CSV, dtype={"ccaa": str, "provincia": str, "anio": int})
     df_pre = standardize_geo_cols(df_pre, "housing_precios_provincia.csv")
 
     # 2) Renta por provincia  (auto-detectar , o ;)
-    df_renta = pd.read_csv(RENTA_CSV, sep=None, engine="python", encoding="utf-8-sig")
+    df_renta = leer_csv(RENTA_CSV, dtype={"ccaa": str, "provincia": str, "anio": int, "is_projection": bool})
     df_renta = standardize_geo_cols(df_renta, "renta_provincia_2015_2025.csv")
 
-    # 3) Tipos de interés anuales  (ya lo teníamos con sep=None)
-    df_int = pd.read_csv(TIPO_INT_CSV, sep=None, engine="python", encoding="utf-8-sig")
+    # 3) Tipos de interés anuales
+    df_int = leer_csv(TIPO_INT_CSV, dtype={"anio": int, "tipo_interes_hipoteca": float})
     df_int = df_int.rename(columns={
         "anio": "anio",
         "tipo_interes_hipoteca": "tipo_interes_hipoteca"
@@ -72,17 +69,18 @@ def main():
     df_int["anio"] = df_int["anio"].astype(int)
     df_int["tipo_interes_hipoteca"] = df_int["tipo_interes_hipoteca"].astype(float)
 
-    # 4) Normalizar nombres y tipos
+    # 4) Código INE de provincia (tabla de dimensión de build_provincias.py)
+    provincias = cargar_provincias()
+    df_pre = anadir_cod_ine(df_pre, provincias)
+    df_renta = anadir_cod_ine(df_renta, provincias)
     for df in (df_pre, df_renta):
-        df["ccaa_norm"] = df["ccaa"].apply(normalize_name)
-        df["prov_norm"] = df["provincia"].apply(normalize_name)
         df["anio"] = df["anio"].astype(int)
 
-    # 5) Merge precios + renta
+    # 5) Merge precios + renta (por código de provincia, no por nombre)
     df_merge = df_pre.merge(
-        df_renta[["ccaa_norm", "prov_norm", "anio",
+        df_renta[["cod_ine", "anio",
                   "renta_neta_anual", "renta_mensual_neta", "is_projection"]],
-        on=["ccaa_norm", "prov_norm", "anio"],
+        on=["cod_ine", "anio"],
         how="left",
         suffixes=("", "_renta")
     )
@@ -95,12 +93,9 @@ def main():
         how="left",
     )
 
-    # 7) Limpiar columnas auxiliares
-    df_full = df_full.drop(columns=["ccaa_norm", "prov_norm"])
-
-    # 8) Ordenar columnas
+    # 7) Ordenar columnas
     cols_order = [
-        "ccaa", "provincia", "anio",
+        "cod_ine", "ccaa", "provincia", "anio",
         "precio_compra_m2", "precio_alquiler_m2",
         "renta_neta_anual", "renta_mensual_neta", "renta_es_proyeccion",
         "tipo_interes_hipoteca",
@@ -108,9 +103,9 @@ def main():
     cols_order = [c for c in cols_order if c in df_full.columns]
     df_full = df_full[cols_order]
 
-    # 9) Guardar
+    # 8) Guardar (con ';', que es como lo lee app.py)
     OUTPUT_CSV.parent.mkdir(parents=True, exist_ok=True)
-    df_full.to_csv(OUTPUT_CSV, index=False, float_format="%.4f", encoding="utf-8-sig")
+    df_full.to_csv(OUTPUT_CSV, sep=";", index=False, float_format="%.4f", encoding="utf-8-sig")
 
     print(f"✅ Dataset final generado: {OUTPUT_CSV}")
     print(df_full.head(10))
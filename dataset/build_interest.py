@@ -1,20 +1,19 @@
+import sys
 from pathlib import Path
 import pandas as pd
 
-RAW_INTEREST = Path("Dataset/tipo_interes_hipotecas.csv")               # tu CSV del INE
-OUT_INTEREST = Path("Dataset/tipo_interes_hipotecas_final.csv")
+sys.path.append(str(Path(__file__).resolve().parents[1]))
 
+from src.etl import leer_csv
 
-def to_float_percent(x):
-    # '3,16' -> 3.16
-    s = str(x).strip().replace(".", "").replace(",", ".")
-    # en este caso no hay miles, pero por si acaso
-    return float(s)
+RAW_INTEREST = Path("Dataset/tipo_interes_hipotecas.csv")               # tu CSV del INE
+OUT_INTEREST = Path("Dataset/tipo_interes_hipotecas_final.csv")
+OUT_INTEREST_MENSUAL = Path("Dataset/tipo_interes_hipotecas_mensual.csv")
 
 
 def main():
-    # sep=None = que pandas detecte ; o , automáticamente
-    df = pd.read_csv(RAW_INTEREST, sep=None, engine="python", encoding="utf-8-sig")
+    # separador, BOM y coma decimal ('3,16') se detectan de una muestra
+    df = leer_csv(RAW_INTEREST, dtype={"Periodo": str, "Total": float})
 
     # Ajusta estos nombres si tus columnas son un pelín distintas
     df = df.rename(columns={
@@ -22,11 +21,18 @@ def main():
         "Total": "tipo"
     })
 
-    # Convertimos a float
-    df["tipo"] = df["tipo"].apply(to_float_percent)
-
     # Año = primeros 4 caracteres del periodo (2025M09 -> 2025)
     df["anio"] = df["periodo"].astype(str).str.slice(0, 4).astype(int)
+    df["mes"] = df["periodo"].astype(str).str.slice(5, 7).astype(int)
+
+    # Media mensual (mismo criterio que la anual: todas las filas del
+    # periodo). La usa dataset/build_series.py
+    df_mes = (
+        df.assign(fecha=pd.to_datetime(dict(year=df["anio"], month=df["mes"], day=1)))
+          .groupby("fecha", as_index=False)["tipo"]
+          .mean()
+          .rename(columns={"tipo": "tipo_interes_hipoteca"})
+    )
 
     # Media anual del tipo de interés
     df_year = (
@@ -41,6 +47,10 @@ def main():
     print(f"Serie anual generada: {OUT_INTEREST}")
     print(df_year.head())
 
+    df_mes.to_csv(OUT_INTEREST_MENSUAL, index=False, float_format="%.4f",
+                  date_format="%Y-%m", encoding="utf-8-sig")
+    print(f"Serie mensual generada: {OUT_INTEREST_MENSUAL}")
+
 
 if __name__ == "__main__":
     main()
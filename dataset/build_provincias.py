@@ -0,0 +1,35 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.etl import PROVINCIAS_CSV, anadir_cod_ine, construir_tabla_provincias, leer_csv
+
+# Ficheros cuyos nombres de provincia deben casar con la tabla
+# (el separador y la codificación se detectan al leer)
+FUENTES = [
+    Path("data/housing_precios_provincia.csv"),
+    Path("data/renta_provincia_2015_2025.csv"),
+]
+
+
+def main():
+    provincias = construir_tabla_provincias()
+
+    # Comprobamos que todas las fuentes casan antes de guardar
+    for path in FUENTES:
+        if not path.exists():
+            continue
+        df = leer_csv(path, usecols=["provincia"])
+        anadir_cod_ine(df, provincias)
+        print(f"OK: {path} ({df['provincia'].nunique()} provincias)")
+
+    PROVINCIAS_CSV.parent.mkdir(parents=True, exist_ok=True)
+    provincias.to_csv(PROVINCIAS_CSV, sep=";", index=False, encoding="utf-8-sig")
+
+    print(f"Tabla de provincias generada: {PROVINCIAS_CSV}")
+    print(provincias.head())
+
+
+if __name__ == "__main__":
+    main()
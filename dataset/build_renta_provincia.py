@@ -1,7 +1,11 @@
+import sys
 from pathlib import Path
 import numpy as np
 import pandas as pd
-import re
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.etl import leer_csv
 
 RENTA_RAW = Path("Dataset/renta_ccaa.csv")           # tu fichero limpio
 RENTA_OUT = Path("data/renta_provincia_2015_2025.csv")
@@ -9,22 +13,9 @@ RENTA_OUT = Path("data/renta_provincia_2015_2025.csv")
 MAX_YEAR_TARGET = 2025
 N_YEARS_GROWTH = 3   # años recientes para la tasa media
 
-
-def to_float_euros(x):
-    """
-    Convierte '11,543' o '11.543' o '11 543' -> 11543.0
-
-    Como ya no hay nulls y todas son 5 cifras, simplemente
-    nos quedamos con los dígitos.
-    """
-    s = str(x)
-
-    # extraemos solo dígitos
-    digits = re.sub(r"[^\d]", "", s)
-    if digits == "":
-        return np.nan
-
-    return float(digits)
+COLUMNAS_SALIDA = [
+    "ccaa", "provincia", "anio", "renta_neta_anual", "is_projection", "renta_mensual_neta",
+]
 
 
 def load_renta(path: Path) -> pd.DataFrame:
@@ -35,8 +26,13 @@ def load_renta(path: Path) -> pd.DataFrame:
       - 'Periodo'
       - 'Total'
     """
-    # sep=None deja que pandas detecte si el separador es ; o ,
-    df = pd.read_csv(path, sep=None, engine="python", encoding="utf-8-sig")
+    # separador, BOM y separador de miles ('11,543') se detectan de una
+    # muestra; '..' es como marca el INE los valores sin dato
+    df = leer_csv(
+        path,
+        dtype={"Comunidades": str, "Provincias": str, "Periodo": int, "Total": float},
+        na_values=[".."],
+    )
 
     df = df.rename(columns={
         "Comunidades": "ccaa",
@@ -47,9 +43,6 @@ def load_renta(path: Path) -> pd.DataFrame:
 
     df = df[["ccaa", "provincia", "anio", "renta_neta_anual"]].copy()
 
-    df["anio"] = df["anio"].astype(int)
-    df["renta_neta_anual"] = df["renta_neta_anual"].apply(to_float_euros)
-
     # por si quedara alguna fila rara
     df = df.dropna(subset=["renta_neta_anual"])
 
@@ -58,50 +51,79 @@ def load_renta(path: Path) -> pd.DataFrame:
 
 def project_renta(df_renta: pd.DataFrame) -> pd.DataFrame:
     """
-    Proyecta renta_neta_anual a 2024 y 2025 por provincia
+    Proyecta renta_neta_anual hasta MAX_YEAR_TARGET por provincia
     usando la tasa media de crecimiento de los últimos N_YEARS_GROWTH años.
+
+    En lugar de recorrer las provincias una a una, pivota la renta a una
+    matriz provincia × año y calcula crecimientos, tasa media y años
+    proyectados para todas las series a la vez (escala a miles de series,
+    p.ej. datos municipales del INE).
     """
-    filas = []
-
-    for (ccaa, provincia), grp in df_renta.groupby(["ccaa", "provincia"]):
-        g = grp.sort_values("anio").reset_index(drop=True)
-
-        # crecimientos interanuales
-        g["growth"] = g["renta_neta_anual"].pct_change()
-
-        growth_recent = g["growth"].dropna().tail(N_YEARS_GROWTH)
-        if len(growth_recent) == 0:
-            g_med = 0.0
-        else:
-            g_med = growth_recent.mean()
-
-        last_year = g["anio"].max()
-        last_value = g.loc[g["anio"].idxmax(), "renta_neta_anual"]
-
-        projections = []
-        current_year = last_year
-        current_value = last_value
-
-        while current_year < MAX_YEAR_TARGET:
-            next_year = current_year + 1
-            current_value = current_value * (1 + g_med)
-            projections.append({
-                "ccaa": ccaa,
-                "provincia": provincia,
-                "anio": next_year,
-                "renta_neta_anual": current_value,
-                "is_projection": True,
-            })
-            current_year = next_year
-
-        g["is_projection"] = False
-        filas.append(g[["ccaa", "provincia", "anio",
-                        "renta_neta_anual", "is_projection"]])
-        if projections:
-            filas.append(pd.DataFrame(projections))
-
-    df_full = pd.concat(filas, ignore_index=True)
-    df_full = df_full.sort_values(["ccaa", "provincia", "anio"]).reset_index(drop=True)
+    claves = ["ccaa", "provincia"]
+
+    # 1) Matriz provincia × año (NaN donde no hay dato). Si una provincia
+    #    trae varias filas para el mismo año (p.ej. islas), se promedian.
+    matriz = df_renta.pivot_table(
+        index=claves, columns="anio", values="renta_neta_anual", aggfunc="mean"
+    ).sort_index(axis=1)
+    if matriz.empty:
+        # sin ninguna renta observada no hay nada que proyectar
+        return pd.DataFrame(columns=COLUMNAS_SALIDA)
+    anios = matriz.columns.to_numpy(dtype=int)
+    valores = matriz.to_numpy(dtype=float)
+    observado = ~np.isnan(valores)
+
+    # 2) Crecimientos interanuales entre observaciones consecutivas de cada
+    #    serie (equivale a pct_change sobre la serie ordenada sin huecos)
+    pos = np.arange(valores.shape[1])
+    ultimo_obs = np.maximum.accumulate(np.where(observado, pos, -1), axis=1)
+    previo_obs = np.full_like(ultimo_obs, -1)
+    previo_obs[:, 1:] = ultimo_obs[:, :-1]
+    filas = np.arange(valores.shape[0])[:, None]
+    valor_previo = np.where(
+        previo_obs >= 0, valores[filas, np.maximum(previo_obs, 0)], np.nan
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.where(observado, valores / valor_previo - 1, np.nan)
+
+    # 3) Media de los últimos N_YEARS_GROWTH crecimientos válidos por fila
+    valido = ~np.isnan(growth)
+    orden_desde_final = np.cumsum(valido[:, ::-1], axis=1)[:, ::-1]
+    recientes = valido & (orden_desde_final <= N_YEARS_GROWTH)
+    n_recientes = recientes.sum(axis=1)
+    suma = np.where(recientes, growth, 0.0).sum(axis=1)
+    g_med = np.divide(
+        suma, n_recientes, out=np.zeros_like(suma), where=n_recientes > 0
+    )
+
+    # 4) Último año/valor observado de cada serie
+    idx_ultimo = ultimo_obs[:, -1]
+    last_year = anios[idx_ultimo]
+    last_value = valores[filas[:, 0], idx_ultimo]
+
+    # 5) Todos los años proyectados en un único paso vectorizado
+    pasos = np.arange(1, max(MAX_YEAR_TARGET - int(last_year.min()), 0) + 1)
+    proj_anio = last_year[:, None] + pasos[None, :]
+    proj_valor = last_value[:, None] * (1 + g_med[:, None]) ** pasos[None, :]
+    mascara = proj_anio <= MAX_YEAR_TARGET
+    fila_proj = np.broadcast_to(filas, proj_anio.shape)[mascara]
+
+    geo = matriz.index.to_frame(index=False)
+    df_proj = geo.iloc[fila_proj].reset_index(drop=True)
+    df_proj["anio"] = proj_anio[mascara]
+    df_proj["renta_neta_anual"] = proj_valor[mascara]
+    df_proj["is_projection"] = True
+
+    df_hist = (
+        matriz.stack()
+        .dropna()
+        .rename("renta_neta_anual")
+        .reset_index()
+    )
+    df_hist["is_projection"] = False
+
+    df_full = pd.concat([df_hist, df_proj], ignore_index=True)
+    df_full = df_full.sort_values(claves + ["anio"]).reset_index(drop=True)
 
     # renta mensual
     df_full["renta_mensual_neta"] = df_full["renta_neta_anual"] / 12.0
@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.etl import anadir_cod_ine, cargar_provincias
+from src.series import SERIES_NPZ, AlmacenSeries
+
+# Salidas mensuales de build_from_xlsx y build_interest.py
+PRECIOS_MENSUAL_CSV = Path("data/housing_precios_mensual.csv")
+TIPO_INT_MENSUAL_CSV = Path("Dataset/tipo_interes_hipotecas_mensual.csv")
+
+
+def main():
+    df_precios = pd.read_csv(PRECIOS_MENSUAL_CSV, parse_dates=["fecha"])
+    df_precios = anadir_cod_ine(df_precios, cargar_provincias())
+
+    df_int = pd.read_csv(TIPO_INT_MENSUAL_CSV, parse_dates=["fecha"],
+                         encoding="utf-8-sig")
+
+    almacen = AlmacenSeries.desde_dataframes(df_precios, df_int)
+    almacen.guardar(SERIES_NPZ)
+
+    fechas = almacen.fechas["mensual"]
+    print(f"Almacén de series generado: {SERIES_NPZ}")
+    print(f"  {len(almacen.cod_ine)} provincias × {len(fechas)} meses "
+          f"({fechas[0]} – {fechas[-1]})")
+
+
+if __name__ == "__main__":
+    main()
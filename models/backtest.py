@@ -0,0 +1,198 @@
+# backtest.py
+#
+# Backtest temporal (origen móvil) de los modelos de precio y de la
+# proyección CAGR de la pestaña de evolución.
+#
+# Para cada año de corte c:
+#   - se reentrenan los modelos con los datos de años <= c y se predicen
+#     los años c+1..c+H (con la renta y el tipo reales de esos años)
+#   - se reproyecta cada serie provincial con los datos <= c, para cada
+#     método (cagr / naive / lineal) y cada `ventana`
+# y se calcula el error porcentual por provincia y horizonte h = 1..H.
+#
+# Los cortes se evalúan en paralelo (procesos, joblib) y cada corte se
+# cachea en disco (models/.cache) por contenido de datos, configuración y
+# código de los modelos y las proyecciones (version_codigo), así que
+# repetir el backtest sin cambios es inmediato.
+#
+# Salidas:
+#   models/backtest_errores.npz  matriz compacta de errores con sus ejes
+#   models/backtest_resumen.csv  MAPE/RMSE por objetivo, método, ventana y h
+#
+# Uso (desde la raíz del proyecto):
+#   python models/backtest.py [--horizonte 10] [--ventanas 2 3 4 5] [--n-jobs -1]
+
+import argparse
+import hashlib
+import inspect
+import sys
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from joblib import Memory, Parallel, delayed
+from sklearn.base import clone
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import Pipeline
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import src.model
+import src.series
+from src.model import (
+    FEATURES,
+    MODELS_DIR,
+    TARGETS,
+    TendenciaProvincia,
+    cargar_datos,
+    construir_preprocesador,
+)
+from src.series import METODOS_PROYECCION, proyectar_matriz
+
+CACHE_DIR = MODELS_DIR / ".cache"
+ERRORES_NPZ = MODELS_DIR / "backtest_errores.npz"
+RESUMEN_CSV = MODELS_DIR / "backtest_resumen.csv"
+
+memory = Memory(CACHE_DIR, verbose=0)
+
+
+def modelos_backtest():
+    """Modelos de precio que se reentrenan en cada corte."""
+    return {
+        "modelo_lineal": Pipeline(
+            steps=[("preprocess", construir_preprocesador()), ("regressor", LinearRegression())]
+        ),
+        "modelo_tendencia": TendenciaProvincia(alpha=0.1),
+    }
+
+
+def version_codigo():
+    """
+    Huella del código del que dependen los errores y que joblib no mira
+    (solo invalida si cambia el cuerpo de evaluar_corte): src/model.py,
+    src/series.py y los modelos del backtest.
+    """
+    h = hashlib.sha1()
+    for fuente in (inspect.getsource(src.model), inspect.getsource(src.series), inspect.getsource(modelos_backtest)):
+        h.update(fuente.encode())
+    return h.hexdigest()[:12]
+
+
+@memory.cache
+def evaluar_corte(df, corte, horizonte, ventanas, codigo=None):
+    """
+    Errores de un corte: dict (objetivo, metodo, ventana) -> matriz
+    provincia × horizonte con el error porcentual (NaN si no hay dato real).
+    Los modelos no usan ventana (se guardan con ventana 0). `codigo`
+    (version_codigo) solo entra en la clave de la caché.
+    """
+    warnings.filterwarnings("ignore", message="Found unknown categories")
+    provincias = np.sort(df["cod_ine"].unique())
+    anios = np.arange(df["anio"].min(), df["anio"].max() + 1)
+    futuros = corte + np.arange(1, horizonte + 1)
+    pasado = anios[anios <= corte]
+
+    resultado = {}
+    for objetivo, col in TARGETS.items():
+        matriz = (
+            df.pivot_table(index="cod_ine", columns="anio", values=col)
+              .reindex(index=provincias, columns=anios)
+        )
+        real = matriz.reindex(columns=futuros).to_numpy(dtype=float)
+        historia = matriz[pasado].to_numpy(dtype=float)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for metodo in METODOS_PROYECCION:
+                for ventana in ventanas:
+                    pred = proyectar_matriz(historia, horizonte, ventana=ventana, metodo=metodo)
+                    resultado[(objetivo, metodo, ventana)] = (pred - real) / real * 100
+
+            train = df[df["anio"] <= corte]
+            test = df[df["anio"].isin(futuros)]
+            for nombre, estimador in modelos_backtest().items():
+                modelo = clone(estimador).fit(train[FEATURES], train[col])
+                pred_test = pd.Series(modelo.predict(test[FEATURES]), index=test.index)
+                pred = (
+                    test.assign(pred=pred_test)
+                        .pivot_table(index="cod_ine", columns="anio", values="pred")
+                        .reindex(index=provincias, columns=futuros)
+                        .to_numpy(dtype=float)
+                )
+                resultado[(objetivo, nombre, 0)] = (pred - real) / real * 100
+
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--horizonte", type=int, default=10)
+    parser.add_argument("--ventanas", type=int, nargs="+", default=[2, 3, 4, 5])
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    args = parser.parse_args()
+
+    df = cargar_datos()
+    anios = np.sort(df["anio"].unique())
+    # hace falta al menos un año de historia y uno por delante
+    cortes = anios[:-1][1:] if len(anios) > 2 else anios[:-1]
+    ventanas = tuple(sorted(args.ventanas))
+    codigo = version_codigo()
+
+    # solo se lanzan procesos para los cortes que no están en la caché
+    pendientes = [
+        int(c) for c in cortes
+        if not evaluar_corte.check_call_in_cache(df, int(c), args.horizonte, ventanas, codigo)
+    ]
+    if pendientes:
+        Parallel(n_jobs=args.n_jobs)(
+            delayed(evaluar_corte)(df, c, args.horizonte, ventanas, codigo) for c in pendientes
+        )
+    por_corte = [evaluar_corte(df, int(c), args.horizonte, ventanas, codigo) for c in cortes]
+
+    # Matriz compacta: [serie, corte, provincia, horizonte]
+    claves = sorted(por_corte[0].keys(), key=lambda k: (k[0], k[1], k[2]))
+    errores = np.stack([
+        np.stack([res[k] for res in por_corte]) for k in claves
+    ]).astype(np.float32)
+
+    np.savez_compressed(
+        ERRORES_NPZ,
+        errores=errores,
+        objetivo=np.array([k[0] for k in claves]),
+        metodo=np.array([k[1] for k in claves]),
+        ventana=np.array([k[2] for k in claves]),
+        corte=np.asarray(cortes),
+        cod_ine=np.sort(df["cod_ine"].unique()),
+        horizonte=np.arange(1, args.horizonte + 1),
+    )
+
+    # Resumen: MAPE y RMSE (en %) por serie y horizonte, sobre cortes y provincias
+    filas = []
+    for i, (objetivo, metodo, ventana) in enumerate(claves):
+        e = errores[i]
+        for h in range(args.horizonte):
+            eh = e[:, :, h]
+            n = int(np.sum(~np.isnan(eh)))
+            if n == 0:
+                continue
+            filas.append({
+                "objetivo": objetivo, "metodo": metodo, "ventana": ventana, "horizonte": h + 1,
+                "n": n,
+                "mape": float(np.nanmean(np.abs(eh))),
+                "rmspe": float(np.sqrt(np.nanmean(eh ** 2))),
+                "sesgo": float(np.nanmean(eh)),
+            })
+    resumen = pd.DataFrame(filas)
+    resumen.to_csv(RESUMEN_CSV, index=False, float_format="%.4f")
+
+    print(f"{len(cortes)} cortes ({cortes[0]}–{cortes[-1]}), errores en {ERRORES_NPZ}")
+    for objetivo in TARGETS:
+        tabla = resumen[resumen["objetivo"] == objetivo].pivot_table(
+            index=["metodo", "ventana"], columns="horizonte", values="mape"
+        )
+        print(f"\nMAPE (%) {objetivo}:")
+        print(tabla.round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# export_models.py
+#
+# Exporta los modelos entrenados (models/model_<objetivo>.pkl) al formato
+# portable de src/artefacto.py (models/model_<objetivo>.json), que la app
+# carga solo con NumPy. Antes de guardar comprueba que el artefacto
+# predice lo mismo que el pipeline original sobre todo el dataset, y le
+# añade el bloque de incertidumbre (intervalos de predicción analíticos
+# al 90%, con la varianza residual y el diseño de todo el dataset).
+#
+# Uso (desde la raíz del proyecto, después de train_models.py):
+#   python models/export_models.py
+
+import sys
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.artefacto import (
+    ModeloLineal,
+    anadir_incertidumbre,
+    exportar_modelo,
+    guardar_artefacto,
+    ruta_artefacto,
+)
+from src.model import FEATURES, TARGETS, cargar_datos, ruta_modelo
+
+TOLERANCIA = 1e-6
+NIVEL_INTERVALO = 0.90
+
+
+def artefacto_comprobado(modelo, nombre, X, y):
+    """
+    Artefacto de `modelo` con el bloque de incertidumbre, comprobado contra
+    las predicciones del modelo sobre X. Devuelve (cuerpo, error, cobertura).
+    También lo usa train_models.py --zoo --guardar.
+    """
+    cuerpo = exportar_modelo(modelo, nombre)
+    portable = ModeloLineal(cuerpo)
+
+    esperado = modelo.predict(X)
+    obtenido = portable.predict(X)
+    error = float(np.max(np.abs(esperado - obtenido) / np.maximum(np.abs(esperado), 1.0)))
+    if error > TOLERANCIA:
+        raise ValueError(f"El artefacto de {nombre} no reproduce el modelo (error {error:.2e})")
+
+    cuerpo = anadir_incertidumbre(cuerpo, X, y, nivel=NIVEL_INTERVALO)
+    cobertura = ModeloLineal(cuerpo).intervalo(X)
+    dentro = float(np.mean((y >= cobertura[1]) & (y <= cobertura[2])))
+    return cuerpo, error, dentro
+
+
+def main():
+    df = cargar_datos()
+    X = df[FEATURES]
+
+    for nombre, col in TARGETS.items():
+        modelo = joblib.load(ruta_modelo(nombre))
+        cuerpo, error, dentro = artefacto_comprobado(modelo, nombre, X, df[col])
+
+        path = ruta_artefacto(nombre)
+        guardar_artefacto(cuerpo, path)
+        print(f"{nombre}: {path} ({path.stat().st_size} bytes, {cuerpo['checksum'][:19]}…, "
+              f"error máx. {error:.1e}, cobertura {NIVEL_INTERVALO:.0%}: {dentro:.1%})")
+
+if __name__ == "__main__":
+    main()
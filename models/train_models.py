@@ -1,76 +1,397 @@
-# train_models.py  (por ejemplo en la raíz del proyecto)
+# train_models.py
+#
+# Entrena los modelos de compra y alquiler en una sola pasada:
+#   - un único preprocesado (one-hot) ajustado una vez y compartido
+#   - la matriz de diseño se cachea en disco (models/.cache) por contenido
+#     de X y por la huella del código del preprocesado (src/model.py)
+#   - el ajuste hold-out y los K folds de CV de ambos objetivos se
+#     reparten entre todos los núcleos con joblib
+#   - escribe models/model_<objetivo>.pkl y models/metrics.json
+#
+# Con --zoo, en lugar del modelo lineal evalúa una rejilla de candidatos
+# (ridge/lasso, gradient boosting, efectos aleatorios por provincia y
+# tendencia por provincia) con CV temporal o por grupos, mide latencia
+# de predicción (1 fila y lote) y tamaño, y elige según un compromiso
+# precisión/latencia configurable (actualizar_predicciones va en el
+# camino interactivo de la app). La latencia y el tamaño de las familias
+# exportables son los del artefacto JSON que sirve la app (src/artefacto.py);
+# --guardar elige solo entre esas familias y escribe también
+# models/model_<objetivo>.json, para que la app no siga con el anterior.
+#
+# Uso (desde la raíz del proyecto):
+#   python models/train_models.py [--cv 5] [--n-jobs -1]
+#   python models/train_models.py --zoo [--cv-modo temporal|grupos]
+#       [--max-latencia-ms 2] [--tolerancia 0.05] [--guardar]
 
-import os
-import pandas as pd
-from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import OneHotEncoder
-from sklearn.pipeline import Pipeline
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.metrics import r2_score, mean_squared_error
+import argparse
+import hashlib
+import inspect
+import json
+import pickle
+import sys
+import time
+import warnings
 from math import sqrt
-import joblib
+from pathlib import Path
 
-# Cargar datos
-df = pd.read_csv("data/housing_final.csv", sep=";")
-df = df.drop(columns=["renta_es_proyeccion", "renta_neta_anual"])
+import joblib
+import numpy as np
+from joblib import Memory, Parallel, delayed
+import pandas as pd
+from sklearn.base import clone
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.linear_model import Lasso, LinearRegression, Ridge
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import GroupKFold, KFold, train_test_split
+from sklearn.pipeline import Pipeline
 
-numeric_features = ["anio", "renta_mensual_neta", "tipo_interes_hipoteca"]
-categorical_features = ["ccaa", "provincia"]
+sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-preprocessor = ColumnTransformer(
-    transformers=[
-        ("num", "passthrough", numeric_features),
-        ("cat", OneHotEncoder(drop="first", handle_unknown="ignore"), categorical_features),
-    ]
+import src.model
+from export_models import artefacto_comprobado
+from src.artefacto import ModeloLineal, guardar_artefacto, ruta_artefacto
+from src.model import (
+    FEATURES,
+    MODELS_DIR,
+    TARGETS,
+    EfectosAleatoriosProvincia,
+    TendenciaProvincia,
+    cargar_datos,
+    construir_preprocesador,
+    ruta_modelo,
 )
 
-os.makedirs("models", exist_ok=True)
+CACHE_DIR = MODELS_DIR / ".cache"
+METRICS_JSON = MODELS_DIR / "metrics.json"
+ZOO_CSV = MODELS_DIR / "zoo_report.csv"
+ZOO_JSON = MODELS_DIR / "zoo_seleccion.json"
 
-# ===== Modelo compra =====
-X_compra = df[numeric_features + categorical_features]
-y_compra = df["precio_compra_m2"]
+memory = Memory(CACHE_DIR, verbose=0)
 
-model_compra = Pipeline(
-    steps=[("preprocess", preprocessor), ("regressor", LinearRegression())]
-)
 
-Xc_train, Xc_test, yc_train, yc_test = train_test_split(
-    X_compra, y_compra, test_size=0.2, random_state=42
-)
+def version_preprocesador():
+    """
+    Huella de src/model.py, donde vive construir_preprocesador: joblib solo
+    invalida si cambia el cuerpo de matriz_diseno, no el del preprocesado.
+    """
+    return hashlib.sha1(inspect.getsource(src.model).encode()).hexdigest()[:12]
 
-model_compra.fit(Xc_train, yc_train)
 
-yc_pred = model_compra.predict(Xc_test)
-print("Compra – R2:", r2_score(yc_test, yc_pred))
-print("Compra – RMSE:", sqrt(mean_squared_error(yc_test, yc_pred)))
+@memory.cache
+def matriz_diseno(X, codigo=None):
+    """
+    Ajusta el preprocesado sobre X y devuelve (preprocesador, matriz).
+    `codigo` (version_preprocesador()) solo entra en la clave de la caché.
+    """
+    preprocesador = construir_preprocesador()
+    X_design = preprocesador.fit_transform(X)
+    return preprocesador, X_design
 
-cv_compra = cross_val_score(model_compra, X_compra, y_compra, cv=5, scoring="r2")
-print("Compra – R2 CV:", cv_compra.mean(), "±", cv_compra.std())
 
-joblib.dump(model_compra, "models/model_compra.pkl")
+def ajustar_y_evaluar(estimador, X_design, y, idx_train, idx_test):
+    """Ajusta un clon del estimador en idx_train y lo evalúa en idx_test."""
+    modelo = clone(estimador)
+    t0 = time.perf_counter()
+    modelo.fit(X_design[idx_train], y[idx_train])
+    fit_time = time.perf_counter() - t0
 
-# ===== Modelo alquiler =====
-X_alquiler = df[numeric_features + categorical_features]
-y_alquiler = df["precio_alquiler_m2"]
+    y_pred = modelo.predict(X_design[idx_test])
+    return modelo, {
+        "r2": float(r2_score(y[idx_test], y_pred)),
+        "rmse": float(sqrt(mean_squared_error(y[idx_test], y_pred))),
+        "fit_time_s": fit_time,
+    }
 
-model_alquiler = Pipeline(
-    steps=[("preprocess", preprocessor), ("regressor", LinearRegression())]
-)
 
-Xa_train, Xa_test, ya_train, ya_test = train_test_split(
-    X_alquiler, y_alquiler, test_size=0.2, random_state=42
-)
+def entrenar(args):
+    df = cargar_datos()
+    X = df[FEATURES]
 
-model_alquiler.fit(Xa_train, ya_train)
+    # Preprocesado único para ambos objetivos (el one-hot solo depende de X)
+    preprocesador, X_design = matriz_diseno(X, version_preprocesador())
+    estimador = LinearRegression()
 
-ya_pred = model_alquiler.predict(Xa_test)
-print("Alquiler – R2:", r2_score(ya_test, ya_pred))
-print("Alquiler – RMSE:", sqrt(mean_squared_error(ya_test, ya_pred)))
+    # Mismas particiones que los scripts anteriores: hold-out 80/20 con
+    # random_state=42 y KFold sin barajar (lo que usa cross_val_score)
+    idx = np.arange(len(df))
+    idx_train, idx_test = train_test_split(idx, test_size=0.2, random_state=42)
+    folds = list(KFold(n_splits=args.cv).split(idx))
+
+    tareas = []
+    for nombre, col in TARGETS.items():
+        y = df[col].to_numpy()
+        tareas.append((nombre, "holdout", y, idx_train, idx_test))
+        for i, (tr, te) in enumerate(folds):
+            tareas.append((nombre, f"cv{i}", y, tr, te))
+
+    t0 = time.perf_counter()
+    resultados = Parallel(n_jobs=args.n_jobs)(
+        delayed(ajustar_y_evaluar)(estimador, X_design, y, tr, te)
+        for _, _, y, tr, te in tareas
+    )
+    tiempo_total = time.perf_counter() - t0
+
+    # Informe de métricas + guardado de modelos
+    MODELS_DIR.mkdir(parents=True, exist_ok=True)
+    informe = {"n_filas": len(df), "cv": args.cv, "tiempo_total_s": tiempo_total, "modelos": {}}
+
+    for nombre in TARGETS:
+        res = {
+            split: (modelo, m)
+            for (n, split, *_), (modelo, m) in zip(tareas, resultados)
+            if n == nombre
+        }
+        modelo_holdout, m_holdout = res["holdout"]
+        cv = [m for split, (_, m) in res.items() if split.startswith("cv")]
+        r2_cv = np.array([m["r2"] for m in cv])
+
+        informe["modelos"][nombre] = {
+            "holdout": m_holdout,
+            "cv": {
+                "r2_mean": float(r2_cv.mean()),
+                "r2_std": float(r2_cv.std()),
+                "rmse_mean": float(np.mean([m["rmse"] for m in cv])),
+                "fit_time_s_mean": float(np.mean([m["fit_time_s"] for m in cv])),
+                "folds": cv,
+            },
+        }
+
+        etiqueta = nombre.capitalize()
+        print(f"{etiqueta} – R2:", m_holdout["r2"])
+        print(f"{etiqueta} – RMSE:", m_holdout["rmse"])
+        print(f"{etiqueta} – R2 CV:", r2_cv.mean(), "±", r2_cv.std())
+
+        # El preprocesado ya está ajustado: el pipeline solo lo reutiliza
+        pipeline = Pipeline(
+            steps=[("preprocess", preprocesador), ("regressor", modelo_holdout)]
+        )
+        joblib.dump(pipeline, ruta_modelo(nombre))
+
+    with open(METRICS_JSON, "w", encoding="utf-8") as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+
+    print(f"Métricas guardadas en {METRICS_JSON} ({tiempo_total:.2f} s)")
+
+
+# --------------------------------------------------
+# Modo --zoo: búsqueda de modelos con selección por precisión/latencia
+# --------------------------------------------------
+
+def _lineal(regresor, denso=False):
+    return Pipeline(
+        steps=[("preprocess", construir_preprocesador(denso=denso)), ("regressor", regresor)]
+    )
+
+
+def candidatos():
+    """familia -> lista de (hiperparámetros, estimador sin ajustar)."""
+    return {
+        "lineal": [({}, _lineal(LinearRegression()))],
+        "ridge": [
+            ({"alpha": a}, _lineal(Ridge(alpha=a))) for a in (0.1, 1.0, 10.0, 100.0)
+        ],
+        "lasso": [
+            ({"alpha": a}, _lineal(Lasso(alpha=a, max_iter=50_000))) for a in (0.01, 0.1, 1.0)
+        ],
+        "gbt": [
+            (
+                {"learning_rate": lr, "max_depth": d},
+                _lineal(
+                    HistGradientBoostingRegressor(learning_rate=lr, max_depth=d, random_state=42),
+                    denso=True,
+                ),
+            )
+            for lr in (0.05, 0.1) for d in (3, None)
+        ],
+        "efectos_aleatorios": [
+            ({"lam": lam}, EfectosAleatoriosProvincia(lam=lam)) for lam in (1.0, 5.0, 20.0)
+        ],
+        "tendencia_provincia": [
+            ({"alpha": a}, TendenciaProvincia(alpha=a)) for a in (0.1, 1.0, 10.0)
+        ],
+    }
+
+
+# Familias que exportar_modelo sabe convertir al artefacto de la app
+EXPORTABLES = {"lineal", "ridge", "lasso", "efectos_aleatorios", "tendencia_provincia"}
+
+
+def particiones(df, modo, n):
+    """
+    - temporal: origen móvil, se entrena con los años < t y se evalúa en t
+      para los últimos `n` años (no filtra información del futuro)
+    - grupos: GroupKFold por provincia (evalúa provincias no vistas)
+    """
+    if modo == "temporal":
+        anios = np.sort(df["anio"].unique())
+        cortes = anios[-min(n, len(anios) - 1):]
+        return [
+            (np.flatnonzero(df["anio"] < t), np.flatnonzero(df["anio"] == t))
+            for t in cortes
+        ]
+    return list(GroupKFold(n_splits=n).split(df, groups=df["provincia"]))
+
+
+def evaluar_fold(estimador, X, y, idx_train, idx_test):
+    # Con CV por grupos las provincias de test no se han visto al ajustar
+    warnings.filterwarnings("ignore", message="Found unknown categories")
+    modelo = clone(estimador)
+    t0 = time.perf_counter()
+    modelo.fit(X.iloc[idx_train], y[idx_train])
+    fit_time = time.perf_counter() - t0
+    y_pred = modelo.predict(X.iloc[idx_test])
+    return {
+        "rmse": float(sqrt(mean_squared_error(y[idx_test], y_pred))),
+        "r2": float(r2_score(y[idx_test], y_pred)),
+        "fit_time_s": fit_time,
+    }
+
+
+def medir_latencia(predecir, X, tamano_bytes, repeticiones=200):
+    """
+    Mediana (ms) de `predecir` sobre 1 fila y sobre el lote completo; el
+    tamaño (bytes de lo que se sirve) se pasa tal cual al informe.
+    """
+    fila = X.iloc[[0]]
+    t_fila = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        predecir(fila)
+        t_fila.append(time.perf_counter() - t0)
+    t_lote = []
+    for _ in range(max(repeticiones // 20, 5)):
+        t0 = time.perf_counter()
+        predecir(X)
+        t_lote.append(time.perf_counter() - t0)
+    return {
+        "latencia_fila_ms": float(np.median(t_fila) * 1000),
+        "latencia_lote_ms": float(np.median(t_lote) * 1000),
+        "tamano_bytes": tamano_bytes,
+    }
+
+
+def medir_servido(modelo, familia, nombre, X, y):
+    """
+    Latencia y tamaño de lo que serviría la app: el artefacto JSON (con
+    intervalo) para las familias exportables y el pickle para el resto.
+    Devuelve (métricas, artefacto o None).
+    """
+    if familia not in EXPORTABLES:
+        return {**medir_latencia(modelo.predict, X, len(pickle.dumps(modelo))), "servido": "pickle"}, None
+    cuerpo, _, _ = artefacto_comprobado(modelo, nombre, X, y)
+    tamano = len(json.dumps(cuerpo, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    metricas = medir_latencia(ModeloLineal(cuerpo).intervalo, X, tamano)
+    return {**metricas, "servido": "artefacto"}, cuerpo
+
+
+def seleccionar(filas, max_latencia_ms, tolerancia):
+    """
+    Entre los candidatos que cumplen el presupuesto de latencia (1 fila),
+    se queda con el más rápido cuyo RMSE no supere en más de `tolerancia`
+    (relativa) al mejor RMSE. tolerancia=0 => el más preciso.
+    """
+    validos = [f for f in filas if max_latencia_ms is None or f["latencia_fila_ms"] <= max_latencia_ms]
+    if not validos:
+        validos = filas  # nadie cumple: nos quedamos con el mejor disponible
+    mejor_rmse = min(f["rmse_cv"] for f in validos)
+    aceptables = [f for f in validos if f["rmse_cv"] <= mejor_rmse * (1 + tolerancia)]
+    return min(aceptables, key=lambda f: (f["latencia_fila_ms"], f["rmse_cv"]))
+
+
+def buscar_modelos(args):
+    df = cargar_datos()
+    X = df[FEATURES]
+    zoo = candidatos()
+    splits = particiones(df, args.cv_modo, args.cv)
+
+    tareas = [
+        (nombre, familia, i, fold)
+        for nombre in TARGETS
+        for familia, rejilla in zoo.items()
+        for i in range(len(rejilla))
+        for fold in range(len(splits))
+    ]
+    t0 = time.perf_counter()
+    resultados = Parallel(n_jobs=args.n_jobs)(
+        delayed(evaluar_fold)(
+            zoo[familia][i][1], X, df[TARGETS[nombre]].to_numpy(), *splits[fold]
+        )
+        for nombre, familia, i, fold in tareas
+    )
+    print(f"{len(tareas)} ajustes de CV ({args.cv_modo}) en {time.perf_counter() - t0:.1f} s")
+
+    cv = pd.DataFrame([
+        {"objetivo": n, "familia": f, "config": i, **m}
+        for (n, f, i, _), m in zip(tareas, resultados)
+    ])
+    resumen = (
+        cv.groupby(["objetivo", "familia", "config"], as_index=False)
+          .agg(rmse_cv=("rmse", "mean"), r2_cv=("r2", "mean"), fit_time_s=("fit_time_s", "mean"))
+    )
+    resumen["params"] = [json.dumps(zoo[f][i][0]) for f, i in zip(resumen["familia"], resumen["config"])]
+
+    # Latencia y tamaño: solo para la mejor configuración de cada familia,
+    # ajustada con todos los datos (medido en serie para no falsear tiempos)
+    mejores = resumen.loc[resumen.groupby(["objetivo", "familia"])["rmse_cv"].idxmin()]
+    informe = {"cv_modo": args.cv_modo, "max_latencia_ms": args.max_latencia_ms,
+               "tolerancia": args.tolerancia, "seleccion": {}}
+    filas = []
+    for fila in mejores.to_dict("records"):
+        y = df[TARGETS[fila["objetivo"]]]
+        modelo = clone(zoo[fila["familia"]][fila["config"]][1]).fit(X, y.to_numpy())
+        metricas, fila["_artefacto"] = medir_servido(modelo, fila["familia"], fila["objetivo"], X, y)
+        fila.update(metricas)
+        fila["_modelo"] = modelo
+        filas.append(fila)
+
+    privadas = {"_modelo", "_artefacto"}
+    for nombre in TARGETS:
+        # Con --guardar solo valen familias que la app puede cargar como artefacto
+        opciones = [
+            f for f in filas
+            if f["objetivo"] == nombre and (not args.guardar or f["familia"] in EXPORTABLES)
+        ]
+        elegido = seleccionar(opciones, args.max_latencia_ms, args.tolerancia)
+        informe["seleccion"][nombre] = {k: v for k, v in elegido.items() if k not in privadas}
+        print(
+            f"{nombre.capitalize()} – elegido: {elegido['familia']} {elegido['params']} "
+            f"(RMSE CV {elegido['rmse_cv']:.3f}, {elegido['latencia_fila_ms']:.2f} ms/fila)"
+        )
+        if args.guardar:
+            joblib.dump(elegido["_modelo"], ruta_modelo(nombre))
+            guardar_artefacto(elegido["_artefacto"], ruta_artefacto(nombre))
+
+    lat = pd.DataFrame([{k: v for k, v in f.items() if k not in privadas} for f in filas])
+    resumen = resumen.merge(
+        lat[["objetivo", "familia", "config", "latencia_fila_ms", "latencia_lote_ms", "tamano_bytes", "servido"]],
+        on=["objetivo", "familia", "config"], how="left",
+    ).sort_values(["objetivo", "rmse_cv"])
+    resumen.to_csv(ZOO_CSV, index=False, float_format="%.6g")
+    with open(ZOO_JSON, "w", encoding="utf-8") as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+    print(f"Informe del zoo en {ZOO_CSV} y {ZOO_JSON}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cv", type=int, default=5, help="nº de folds de validación cruzada")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="procesos en paralelo (-1 = todos)")
+    parser.add_argument("--zoo", action="store_true", help="evaluar la rejilla de candidatos")
+    parser.add_argument("--cv-modo", choices=["temporal", "grupos"], default="temporal")
+    parser.add_argument("--max-latencia-ms", type=float, default=None,
+                        help="presupuesto de latencia para predecir 1 fila")
+    parser.add_argument("--tolerancia", type=float, default=0.05,
+                        help="pérdida relativa de RMSE aceptable a cambio de latencia")
+    parser.add_argument("--guardar", action="store_true",
+                        help="(con --zoo) elegir entre familias exportables y sobrescribir "
+                             "models/model_<objetivo>.pkl y .json con el elegido")
+    args = parser.parse_args()
+
+    if args.zoo:
+        buscar_modelos(args)
+    else:
+        entrenar(args)
 
-cv_alquiler = cross_val_score(
-    model_alquiler, X_alquiler, y_alquiler, cv=5, scoring="r2"
-)
-print("Alquiler – R2 CV:", cv_alquiler.mean(), "±", cv_alquiler.std())
 
-joblib.dump(model_alquiler, "models/model_alquiler.pkl")
+if __name__ == "__main__":
+    main()
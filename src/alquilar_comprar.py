@@ -0,0 +1,98 @@
+"""
+Alquilar o comprar: coste neto acumulado de cada opción y año de
+equilibrio, vectorizado sobre provincias (u otros ejes) × años.
+
+Para cada año t = 0..horizonte:
+
+  alquilar(t) = Σ alquiler anual, creciendo al ritmo del alquiler
+
+  comprar(t)  = gastos de compra + entrada + Σ cuotas + Σ gastos anuales
+                + rentabilidad perdida de lo pagado al contado
+                − patrimonio neto (valor de la vivienda − gastos de venta
+                  − saldo pendiente)
+
+El valor de la vivienda crece al ritmo de la proyección de precios y el
+saldo sale del cuadro de amortización a tipo fijo. En t = 0 comprar
+cuesta los gastos de compra y de venta; el año de equilibrio es cuando la
+curva de comprar cae por debajo de la de alquilar (interpolado dentro
+del año), o inf si no ocurre en el horizonte.
+"""
+import numpy as np
+
+from src.amortizacion import cuadro_fijo
+from src.asequibilidad import PCT_ENTRADA, RENTABILIDAD_AHORRO
+
+GASTOS_COMPRA = 0.10  # impuestos, notaría y registro (% del precio)
+GASTOS_VENTA = 0.03  # comisión y plusvalía municipal (% del valor al vender)
+GASTO_ANUAL_PROPIEDAD = 0.01  # IBI, comunidad y mantenimiento (% del valor)
+HORIZONTE_EQUILIBRIO = 30  # años
+
+
+def curvas_alquilar_comprar(
+    precio_compra_m2,
+    precio_alquiler_m2,
+    tamano_vivienda_m2,
+    interes_hipoteca,
+    plazo_anios,
+    crec_precio,
+    crec_alquiler,
+    horizonte=HORIZONTE_EQUILIBRIO,
+    pct_entrada=PCT_ENTRADA,
+    gastos_compra=GASTOS_COMPRA,
+    gastos_venta=GASTOS_VENTA,
+    gasto_anual=GASTO_ANUAL_PROPIEDAD,
+    rentabilidad=RENTABILIDAD_AHORRO,
+):
+    """
+    Devuelve (anios, coste_alquilar, coste_comprar): `anios` = 0..horizonte
+    y las dos curvas con los años en el último eje.
+    """
+    t = np.arange(horizonte + 1)
+    precio = (np.asarray(precio_compra_m2, dtype=float) * tamano_vivienda_m2)[..., None]
+    alquiler_anual = (np.asarray(precio_alquiler_m2, dtype=float) * tamano_vivienda_m2 * 12)[..., None]
+    g_precio = np.asarray(crec_precio, dtype=float)[..., None]
+    g_alquiler = np.asarray(crec_alquiler, dtype=float)[..., None]
+
+    # Alquilar: suma de los alquileres de los años 1..t
+    alquileres = alquiler_anual * (1 + g_alquiler) ** (t[1:] - 1)
+    coste_alquilar = np.concatenate([np.zeros(alquileres.shape[:-1] + (1,)), np.cumsum(alquileres, axis=-1)], axis=-1)
+
+    # Comprar: cuotas y saldo del cuadro de amortización, muestreados a fin de año
+    cuadro = cuadro_fijo(precio[..., 0] * (1 - pct_entrada), interes_hipoteca, plazo_anios)
+    meses = 12 * horizonte
+    relleno = [(0, 0)] * (cuadro["cuota"].ndim - 1) + [(0, max(0, meses - cuadro["cuota"].shape[-1]))]
+    pagado = np.cumsum(np.pad(cuadro["cuota"], relleno), axis=-1)[..., 11:meses:12]
+    saldo = np.pad(cuadro["saldo"], relleno)[..., 11:meses:12]
+    principal = precio * (1 - pct_entrada)
+    pagado = np.concatenate([np.zeros(pagado.shape[:-1] + (1,)), pagado], axis=-1)
+    saldo = np.concatenate([np.broadcast_to(principal, saldo.shape[:-1] + (1,)), saldo], axis=-1)
+
+    valor = precio * (1 + g_precio) ** t
+    gastos_anuales = np.concatenate(
+        [np.zeros(valor.shape[:-1] + (1,)), np.cumsum(gasto_anual * valor[..., :-1], axis=-1)], axis=-1
+    )
+    contado = precio * (pct_entrada + gastos_compra)
+    oportunidad = contado * ((1 + rentabilidad) ** t - 1)
+
+    coste_comprar = (
+        precio * gastos_compra + precio * pct_entrada + pagado + gastos_anuales + oportunidad
+        - (valor * (1 - gastos_venta) - saldo)
+    )
+    return t, coste_alquilar, coste_comprar
+
+
+def punto_equilibrio(coste_alquilar, coste_comprar):
+    """
+    Primer año (con fracción) en que comprar sale igual o más barato que
+    alquilar; inf si no ocurre en el horizonte de las curvas.
+    """
+    diferencia = coste_comprar - coste_alquilar
+    cruza = diferencia <= 0
+    alcanzado = cruza.any(axis=-1)
+    i = np.argmax(cruza, axis=-1)
+    antes = np.take_along_axis(diferencia, np.maximum(i - 1, 0)[..., None], axis=-1)[..., 0]
+    despues = np.take_along_axis(diferencia, i[..., None], axis=-1)[..., 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraccion = np.where(antes > despues, antes / (antes - despues), 1.0)
+    anios = np.where(i > 0, i - 1 + fraccion, 0.0)
+    return np.where(alcanzado, anios, np.inf)
@@ -0,0 +1,141 @@
+"""
+Cuadros de amortización de hipotecas (sistema francés), vectorizados.
+
+Un cuadro es un diccionario de arrays con los meses en el último eje:
+"cuota", "intereses", "capital" (incluye amortizaciones anticipadas) y
+"saldo" (pendiente al final de cada mes). Los ejes anteriores son los
+que salgan del broadcasting de las entradas, así que el mismo código
+genera el cuadro de una hipoteca o el de todas las provincias a la vez.
+
+- Tipo fijo: todo el cuadro sale en forma cerrada, sin bucles.
+- Tipo variable y amortizaciones anticipadas: la cuota depende del
+  saldo que queda, así que se avanza mes a mes, pero cada paso opera
+  sobre todas las hipotecas del lote a la vez.
+"""
+import numpy as np
+
+from src.asequibilidad import cuota_mensual, factor_anualidad
+
+COLUMNAS = ("cuota", "intereses", "capital", "saldo")
+
+
+def _meses(plazo_anios) -> np.ndarray:
+    return np.rint(np.asarray(plazo_anios, dtype=float) * 12)
+
+
+# --------------------------------------------------
+# Tipo fijo (forma cerrada)
+# --------------------------------------------------
+
+def totales_fijo(principal, interes_anual, plazo_anios) -> dict:
+    """Cuota, total pagado e intereses totales sin construir el cuadro."""
+    principal = np.asarray(principal, dtype=float)
+    cuota = cuota_mensual(principal, interes_anual, plazo_anios)
+    total = cuota * _meses(plazo_anios)
+    return {"cuota": cuota, "total_pagado": total, "intereses_totales": total - principal}
+
+
+def cuadro_fijo(principal, interes_anual, plazo_anios) -> dict:
+    """
+    Cuadro completo a tipo fijo. El saldo tras k cuotas es
+
+        S_k = P·(1+r)^k − C·((1+r)^k − 1)/r      (S_k = P − C·k si r = 0)
+
+    y de ahí intereses y capital de cada mes. Con plazos distintos en el
+    lote, los meses posteriores a cada plazo quedan a 0.
+    """
+    P = np.asarray(principal, dtype=float)[..., None]
+    r = (np.asarray(interes_anual, dtype=float) / 100 / 12)[..., None]
+    n = _meses(plazo_anios)[..., None]
+    C = cuota_mensual(P, r * 1200, n / 12)
+    k = np.arange(1, int(np.max(n)) + 1)
+
+    crec = (1 + r) ** k
+    with np.errstate(divide="ignore", invalid="ignore"):
+        saldo = np.where(r == 0, P - C * k, P * crec - C * (crec - 1) / np.where(r == 0, 1, r))
+    vivo = k <= n
+    saldo = np.where(vivo, np.maximum(saldo, 0.0), 0.0)
+    saldo_previo = np.concatenate([np.broadcast_to(P, saldo.shape[:-1] + (1,)), saldo[..., :-1]], axis=-1)
+    intereses = np.where(vivo, saldo_previo * r, 0.0)
+    capital = np.where(vivo, saldo_previo - saldo, 0.0)
+    return {"cuota": intereses + capital, "intereses": intereses, "capital": capital, "saldo": saldo}
+
+
+# --------------------------------------------------
+# Tipo variable y amortizaciones anticipadas
+# --------------------------------------------------
+
+def cuadro_variable(principal, tipos_anuales, plazo_anios, amortizaciones=None,
+                    reducir: str = "cuota") -> dict:
+    """
+    Cuadro con revisión anual del tipo.
+
+    - `tipos_anuales`: tipo (%) de cada año del préstamo en el último eje;
+      si es más corto que el plazo, se mantiene el último. Al inicio de
+      cada año se recalcula la cuota con el saldo y los meses restantes.
+    - `amortizaciones`: pagos extra (…, meses) al final de cada mes.
+    - `reducir`: tras una amortización anticipada, "cuota" mantiene el
+      plazo y baja la cuota; "plazo" mantiene la cuota y acorta el plazo.
+    """
+    if reducir not in ("cuota", "plazo"):
+        raise ValueError(f"`reducir` debe ser 'cuota' o 'plazo', no {reducir!r}")
+
+    tipos = np.atleast_1d(np.asarray(tipos_anuales, dtype=float))
+    n = _meses(plazo_anios)
+    forma = np.broadcast_shapes(np.shape(principal), tipos.shape[:-1], n.shape)
+    meses = int(np.max(n))
+
+    saldo = np.broadcast_to(np.asarray(principal, dtype=float), forma).copy()
+    restantes = np.broadcast_to(n, forma).astype(float)
+    extra = None
+    if amortizaciones is not None:
+        extra = np.asarray(amortizaciones, dtype=float)
+        extra = np.pad(extra, [(0, 0)] * (extra.ndim - 1) + [(0, max(0, meses - extra.shape[-1]))])
+
+    salida = {c: np.zeros(forma + (meses,)) for c in COLUMNAS}
+    cuota = np.zeros(forma)
+    for m in range(meses):
+        r = np.broadcast_to(tipos[..., min(m // 12, tipos.shape[-1] - 1)] / 1200, forma)
+        if m % 12 == 0:
+            cuota = saldo * factor_anualidad(r * 1200, np.maximum(restantes, 1) / 12)
+
+        intereses = saldo * r
+        capital = np.clip(cuota - intereses, 0, saldo)
+        saldo = saldo - capital
+
+        if extra is not None:
+            pago = np.minimum(np.broadcast_to(extra[..., m], forma), saldo)
+            saldo = saldo - pago
+            capital = capital + pago
+            amortizado = pago > 0
+            if amortizado.any():
+                if reducir == "cuota":
+                    nueva = saldo * factor_anualidad(r * 1200, np.maximum(restantes - 1, 1) / 12)
+                    cuota = np.where(amortizado, nueva, cuota)
+                else:
+                    # meses que faltan con la misma cuota: n = −log(1 − S·r/C) / log(1+r)
+                    with np.errstate(divide="ignore", invalid="ignore"):
+                        nper = np.where(
+                            r > 0,
+                            -np.log1p(-saldo * r / np.where(cuota > 0, cuota, np.inf)) / np.log1p(r),
+                            saldo / np.where(cuota > 0, cuota, np.inf),
+                        )
+                    restantes = np.where(amortizado, nper + 1, restantes)
+
+        restantes = restantes - 1
+        salida["cuota"][..., m] = intereses + capital - (pago if extra is not None else 0)
+        salida["intereses"][..., m] = intereses
+        salida["capital"][..., m] = capital
+        salida["saldo"][..., m] = saldo
+
+    return salida
+
+
+def totales(cuadro: dict) -> dict:
+    """Totales de un cuadro: intereses, capital y meses hasta cancelar."""
+    pagos = cuadro["intereses"] + cuadro["capital"]
+    return {
+        "intereses_totales": cuadro["intereses"].sum(axis=-1),
+        "total_pagado": pagos.sum(axis=-1),
+        "meses": (pagos > 1e-9).sum(axis=-1),
+    }
@@ -0,0 +1,319 @@
+"""
+Formato portable para los modelos de precio.
+
+Todos los modelos que servimos son lineales en sus variables: numéricas
+con coeficiente, un peso por categoría (CCAA, provincia) y, como mucho,
+una pendiente por categoría sobre una numérica (la tendencia por
+provincia). Este módulo los guarda como un JSON pequeño y versionado con
+vocabularios, arrays de coeficientes y una suma de comprobación, y los
+evalúa solo con NumPy: la app no necesita importar scikit-learn ni
+depender de la versión con la que se hizo el pickle.
+
+El exportador no importa scikit-learn: lee los atributos ajustados de
+los objetos que recibe.
+
+Opcionalmente el artefacto incluye un bloque "incertidumbre" (varianza
+residual, grados de libertad y un factor de (DᵀD)⁺ sobre la matriz de
+diseño de los datos de ajuste) con el que el runtime calcula intervalos
+de predicción analíticos, también solo con NumPy.
+"""
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+
+FORMATO = "vivienda-modelo-lineal"
+VERSION = 1
+
+
+# --------------------------------------------------
+# Exportación (en el entorno de entrenamiento)
+# --------------------------------------------------
+
+def _pesos_onehot(encoder, coefs):
+    """
+    Reparte los coeficientes del one-hot por variable: un peso por
+    categoría del vocabulario (0 para la categoría eliminada con drop).
+    """
+    salida = []
+    pos = 0
+    for j, cats in enumerate(encoder.categories_):
+        cats = [str(c) for c in cats]
+        pesos = np.zeros(len(cats))
+        drop = None
+        if getattr(encoder, "drop_idx_", None) is not None and encoder.drop_idx_[j] is not None:
+            drop = int(encoder.drop_idx_[j])
+        for k in range(len(cats)):
+            if k == drop:
+                continue
+            pesos[k] = coefs[pos]
+            pos += 1
+        salida.append((cats, pesos))
+    return salida, pos
+
+
+def exportar_modelo(modelo, nombre: str) -> dict:
+    """
+    Convierte un modelo ajustado en el diccionario del artefacto.
+
+    Soporta:
+      - Pipeline(ColumnTransformer[num passthrough + OneHotEncoder], regresor
+        lineal con coef_/intercept_)  (LinearRegression, Ridge, Lasso)
+      - EfectosAleatoriosProvincia y TendenciaProvincia (src/model.py)
+    """
+    tipo = type(modelo).__name__
+    categoricas = []
+    pendientes = []
+
+    if tipo == "EfectosAleatoriosProvincia":
+        from src.model import NUMERIC_FEATURES
+
+        intercepto = float(modelo.coef_[0])
+        numericas = (list(NUMERIC_FEATURES), np.asarray(modelo.coef_[1:], dtype=float))
+        vocab = sorted(modelo.efectos_)
+        categoricas.append(("provincia", vocab, np.array([modelo.efectos_[p] for p in vocab])))
+
+    elif tipo == "TendenciaProvincia":
+        from src.model import NUMERIC_FEATURES
+
+        coef = np.asarray(modelo.ridge_.coef_, dtype=float)
+        n_num = len(NUMERIC_FEATURES)
+        n_prov = len(modelo.provincias_)
+        vocab = [str(p) for p in modelo.provincias_]
+        intercepto = float(modelo.ridge_.intercept_)
+        numericas = (list(NUMERIC_FEATURES), coef[:n_num])
+        categoricas.append(("provincia", vocab, coef[n_num:n_num + n_prov]))
+        pendientes.append(("provincia", "anio", float(modelo.anio_ref_), vocab,
+                           coef[n_num + n_prov:]))
+
+    elif hasattr(modelo, "named_steps"):
+        pre = modelo.named_steps["preprocess"]
+        reg = modelo.named_steps["regressor"]
+        if not hasattr(reg, "coef_"):
+            raise ValueError(f"Regresor no lineal, no exportable: {type(reg).__name__}")
+
+        coef = np.ravel(reg.coef_).astype(float)
+        intercepto = float(np.ravel([reg.intercept_])[0])
+        pos = 0
+        num_nombres = []
+        num_coef = []
+        for nombre_t, trans, cols in pre.transformers_:
+            if nombre_t == "remainder" or trans == "drop":
+                continue
+            if trans == "passthrough":
+                num_nombres += list(cols)
+                num_coef += list(coef[pos:pos + len(cols)])
+                pos += len(cols)
+            elif type(trans).__name__ == "OneHotEncoder":
+                repartidos, usados = _pesos_onehot(trans, coef[pos:])
+                for col, (cats, pesos) in zip(cols, repartidos):
+                    categoricas.append((col, cats, pesos))
+                pos += usados
+            else:
+                raise ValueError(f"Transformación no soportada: {type(trans).__name__}")
+        if pos != len(coef):
+            raise ValueError("El número de coeficientes no cuadra con el preprocesado")
+        numericas = (num_nombres, np.array(num_coef))
+
+    else:
+        raise ValueError(f"Modelo no soportado para exportar: {tipo}")
+
+    cuerpo = {
+        "formato": FORMATO,
+        "version": VERSION,
+        "nombre": nombre,
+        "origen": tipo if not hasattr(modelo, "named_steps")
+        else type(modelo.named_steps["regressor"]).__name__,
+        "intercepto": intercepto,
+        "numericas": {"nombres": numericas[0], "coef": [float(c) for c in numericas[1]]},
+        "categoricas": [
+            {"variable": v, "vocabulario": list(voc), "pesos": [float(p) for p in pesos]}
+            for v, voc, pesos in categoricas
+        ],
+        "pendientes": [
+            {"variable": v, "numerica": num, "referencia": ref,
+             "vocabulario": list(voc), "pesos": [float(p) for p in pesos]}
+            for v, num, ref, voc, pesos in pendientes
+        ],
+    }
+    cuerpo["checksum"] = _checksum(cuerpo)
+    return cuerpo
+
+
+def anadir_incertidumbre(cuerpo: dict, X, y, nivel: float = 0.90) -> dict:
+    """
+    Añade al artefacto lo necesario para intervalos de predicción
+    analíticos de un modelo lineal:
+
+        ŷ ± t(gl) · sqrt(s² · (1 + dᵀ (DᵀD)⁺ d))
+
+    con D la matriz de diseño del artefacto sobre (X, y). Se guarda un
+    factor L tal que (DᵀD)⁺ = L Lᵀ, de modo que dᵀ(DᵀD)⁺d = ‖dᵀL‖².
+    El valor crítico se calcula aquí (scipy) para no necesitarlo en la app.
+    """
+    from scipy import stats
+
+    modelo = ModeloLineal(cuerpo)
+    D = modelo._diseno(X)
+    resid = np.asarray(y, dtype=float) - modelo.predict(X)
+
+    # SVD de D (más estable que invertir DᵀD): (DᵀD)⁺ = V S⁻² Vᵀ
+    _, s, vt = np.linalg.svd(D, full_matrices=False)
+    utiles = s > s.max() * max(D.shape) * np.finfo(float).eps
+    factor = vt[utiles].T / s[utiles]
+    gl = len(D) - int(utiles.sum())
+    if gl <= 0:
+        raise ValueError("No hay grados de libertad para estimar la varianza residual")
+
+    cuerpo = {k: v for k, v in cuerpo.items() if k != "checksum"}
+    cuerpo["incertidumbre"] = {
+        "nivel": nivel,
+        "critico": float(stats.t.ppf(0.5 + nivel / 2, gl)),
+        "sigma2": float(resid @ resid / gl),
+        "gl": gl,
+        "factor": [[float(f"{v:.7g}") for v in fila] for fila in factor],
+    }
+    cuerpo["checksum"] = _checksum(cuerpo)
+    return cuerpo
+
+
+def _checksum(cuerpo: dict) -> str:
+    sin_checksum = {k: v for k, v in cuerpo.items() if k != "checksum"}
+    canon = json.dumps(sin_checksum, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return "sha256:" + hashlib.sha256(canon.encode("utf-8")).hexdigest()
+
+
+def guardar_artefacto(cuerpo: dict, path: Path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cuerpo, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def ruta_artefacto(nombre: str, models_dir: Path = Path("models")) -> Path:
+    return Path(models_dir) / f"model_{nombre}.json"
+
+
+# --------------------------------------------------
+# Runtime (solo NumPy)
+# --------------------------------------------------
+
+class ModeloLineal:
+    """
+    Evalúa un artefacto exportado. `predict` acepta un DataFrame o un
+    diccionario columna -> valor(es), igual que el pipeline original.
+    Categorías no vistas aportan 0 (como handle_unknown="ignore").
+    """
+
+    def __init__(self, cuerpo: dict):
+        if cuerpo.get("formato") != FORMATO:
+            raise ValueError(f"Formato de artefacto desconocido: {cuerpo.get('formato')!r}")
+        if cuerpo.get("version") != VERSION:
+            raise ValueError(f"Versión de artefacto no soportada: {cuerpo.get('version')!r}")
+        if cuerpo.get("checksum") != _checksum(cuerpo):
+            raise ValueError("Checksum del artefacto incorrecto (fichero dañado o editado)")
+
+        self.nombre = cuerpo["nombre"]
+        self.checksum = cuerpo["checksum"]
+        self.intercepto = float(cuerpo["intercepto"])
+        self.numericas = list(cuerpo["numericas"]["nombres"])
+        self.coef = np.asarray(cuerpo["numericas"]["coef"], dtype=float)
+        self.categoricas = [
+            (c["variable"], {v: i for i, v in enumerate(c["vocabulario"])},
+             np.append(np.asarray(c["pesos"], dtype=float), 0.0))
+            for c in cuerpo["categoricas"]
+        ]
+        self.pendientes = [
+            (p["variable"], p["numerica"], float(p["referencia"]),
+             {v: i for i, v in enumerate(p["vocabulario"])},
+             np.append(np.asarray(p["pesos"], dtype=float), 0.0))
+            for p in cuerpo["pendientes"]
+        ]
+        inc = cuerpo.get("incertidumbre")
+        self.nivel = inc["nivel"] if inc else None
+        if inc:
+            self._critico = float(inc["critico"])
+            self._sigma2 = float(inc["sigma2"])
+            self._factor = np.asarray(inc["factor"], dtype=float)
+
+    @classmethod
+    def cargar(cls, path: Path):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def _indices(vocab: dict, valores) -> np.ndarray:
+        # índice -1 => categoría desconocida => último peso (0.0)
+        return np.array([vocab.get(str(v), -1) for v in valores], dtype=np.intp)
+
+    def _diseno(self, X) -> np.ndarray:
+        """
+        Matriz de diseño en la base del artefacto: 1, numéricas, one-hot
+        de cada vocabulario y pendientes (predict = D @ coeficientes).
+        """
+        col = lambda c: np.atleast_1d(np.asarray(X[c]))
+        bloques = [np.column_stack([col(c).astype(float) for c in self.numericas])]
+        n = len(bloques[0])
+        bloques.insert(0, np.ones((n, 1)))
+        for variable, vocab, _ in self.categoricas:
+            onehot = np.zeros((n, len(vocab) + 1))
+            onehot[np.arange(n), self._indices(vocab, col(variable))] = 1.0
+            bloques.append(onehot[:, :-1])
+        for variable, numerica, ref, vocab, _ in self.pendientes:
+            onehot = np.zeros((n, len(vocab) + 1))
+            onehot[np.arange(n), self._indices(vocab, col(variable))] = 1.0
+            bloques.append(onehot[:, :-1] * (col(numerica).astype(float) - ref)[:, None])
+        return np.hstack(bloques)
+
+    def intervalo(self, X):
+        """
+        Predicción e intervalo analítico al nivel guardado en el artefacto
+        (`self.nivel`), vectorizado sobre todas las filas de X.
+        Devuelve (predicción, inferior, superior).
+        """
+        if self.nivel is None:
+            raise ValueError(f"El artefacto {self.nombre!r} no incluye incertidumbre")
+        pred = self.predict(X)
+        apalancamiento = np.sum((self._diseno(X) @ self._factor) ** 2, axis=1)
+        delta = self._critico * np.sqrt(self._sigma2 * (1 + apalancamiento))
+        return pred, pred - delta, pred + delta
+
+    def forma_lineal(self, categorias) -> dict:
+        """
+        Para cada fila de `categorias` (valores de las variables
+        categóricas, sin numéricas), la predicción como función lineal de
+        las numéricas, pred = constante + coef · x, y, si hay
+        incertidumbre, la matriz Q tal que el apalancamiento es
+        [1, x] · Q · [1, x]ᵀ. Es exacta porque el modelo es lineal en las
+        numéricas; sirve para evaluarlo fuera de Python (export estático).
+        El intervalo es pred ± critico · sqrt(sigma2 · (1 + apalancamiento)).
+        """
+        n = len(np.atleast_1d(np.asarray(categorias[self.categoricas[0][0]]))) if self.categoricas else 1
+        puntos = []
+        for k in range(len(self.numericas) + 1):
+            x = {c: np.full(n, 1.0 if j == k - 1 else 0.0) for j, c in enumerate(self.numericas)}
+            puntos.append({**categorias, **x})
+
+        predicciones = [self.predict(X) for X in puntos]
+        salida = {
+            "constante": predicciones[0],
+            "coef": np.column_stack([p - predicciones[0] for p in predicciones[1:]]),
+        }
+        if self.nivel is not None:
+            disenos = [self._diseno(X) for X in puntos]
+            G = np.stack([disenos[0]] + [d - disenos[0] for d in disenos[1:]], axis=1)  # (n, 1+K, p)
+            GF = G @ self._factor
+            salida.update(Q=GF @ GF.transpose(0, 2, 1), critico=self._critico, sigma2=self._sigma2)
+        return salida
+
+    def predict(self, X) -> np.ndarray:
+        col = lambda c: np.atleast_1d(np.asarray(X[c]))
+        y = np.column_stack([col(c).astype(float) for c in self.numericas]) @ self.coef
+        y = y + self.intercepto
+        for variable, vocab, pesos in self.categoricas:
+            y = y + pesos[self._indices(vocab, col(variable))]
+        for variable, numerica, ref, vocab, pesos in self.pendientes:
+            t = col(numerica).astype(float) - ref
+            y = y + pesos[self._indices(vocab, col(variable))] * t
+        return y
@@ -0,0 +1,200 @@
+"""
+Indicadores de asequibilidad de la vivienda, vectorizados.
+
+Son las cuentas que hace la app para cada provincia (esfuerzo de
+alquiler, años para ahorrar la entrada y esfuerzo de la cuota
+hipotecaria). Todas las funciones aceptan escalares o arrays de NumPy y
+los combinan por broadcasting, así que la misma función sirve para un
+escenario × 52 provincias (mapa, ranking) o para miles de escenarios ×
+provincias × años (evaluación por lotes).
+"""
+import numpy as np
+
+PCT_ENTRADA = 0.20  # 20% de entrada
+ESFUERZO_OBJETIVO = 30  # % de los ingresos que se considera asumible
+RENTABILIDAD_AHORRO = 0.02  # rentabilidad anual de los ahorros (depósito)
+ANIOS_MAX_SIMULACION = 40
+
+INDICADORES = ("esfuerzo_alquiler_pct", "anios_ahorrar_entrada", "esfuerzo_cuota_pct")
+
+
+def factor_anualidad(interes_anual, plazo_anios):
+    """Cuota mensual por euro prestado (interés anual en %, plazo en años)."""
+    r = np.asarray(interes_anual, dtype=float) / 100 / 12
+    n = np.asarray(plazo_anios, dtype=float) * 12
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        return np.where(r == 0, 1 / n, r * (1 + r) ** n / ((1 + r) ** n - 1))
+
+
+def cuota_mensual(principal, interes_anual, plazo_anios):
+    """Cuota de un préstamo francés (interés anual en %, plazo en años)."""
+    return principal * factor_anualidad(interes_anual, plazo_anios)
+
+
+def indicadores(
+    precio_compra_m2,
+    precio_alquiler_m2,
+    renta_mensual_individual,
+    interes_hipoteca,
+    tamano_vivienda_m2,
+    n_salarios,
+    pct_ahorro,
+    plazo_anios,
+    pct_entrada=PCT_ENTRADA,
+):
+    """
+    Indicadores de un hogar frente a unos precios por m².
+
+    Devuelve un diccionario columna -> array (en el orden en que los
+    añade la app): vivienda tipo, esfuerzo de alquiler, entrada y años
+    para ahorrarla, cuota y esfuerzo de la cuota. Con ingresos o ahorro
+    nulos los cocientes salen inf/NaN, igual que con pandas.
+    """
+    ingresos_mensuales_hogar = np.asarray(renta_mensual_individual, dtype=float) * n_salarios
+    ahorro_anual_posible = ingresos_mensuales_hogar * 12 * (np.asarray(pct_ahorro, dtype=float) / 100.0)
+
+    precio_vivienda_tipo = precio_compra_m2 * np.asarray(tamano_vivienda_m2, dtype=float)
+    alquiler_vivienda_tipo_mensual = precio_alquiler_m2 * np.asarray(tamano_vivienda_m2, dtype=float)
+    entrada_necesaria = precio_vivienda_tipo * pct_entrada
+    cuota_hipoteca = cuota_mensual(precio_vivienda_tipo * (1 - pct_entrada), interes_hipoteca, plazo_anios)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "precio_vivienda_tipo": precio_vivienda_tipo,
+            "alquiler_vivienda_tipo_mensual": alquiler_vivienda_tipo_mensual,
+            "esfuerzo_alquiler_pct": alquiler_vivienda_tipo_mensual / ingresos_mensuales_hogar * 100,
+            "entrada_necesaria": entrada_necesaria,
+            "ahorro_anual_posible": ahorro_anual_posible,
+            "anios_ahorrar_entrada": entrada_necesaria / ahorro_anual_posible,
+            "cuota_hipoteca_mensual": cuota_hipoteca,
+            "esfuerzo_cuota_pct": cuota_hipoteca / ingresos_mensuales_hogar * 100,
+        }
+
+
+# --------------------------------------------------
+# Problema inverso: qué hace falta para no pasar de un esfuerzo objetivo
+# --------------------------------------------------
+#
+# El esfuerzo de la cuota es
+#
+#     esfuerzo = precio_m2 · m² · (1 - entrada) · A(r, n) / ingresos
+#
+# con A(r, n) el factor de anualidad. Es lineal en los ingresos y en los
+# m², así que la renta mínima y la superficie máxima salen despejando. El
+# tipo de interés solo aparece dentro de A, que es creciente en r: se
+# resuelve por bisección, vectorizada sobre todas las provincias.
+
+def renta_minima(precio_compra_m2, tamano_vivienda_m2, interes_hipoteca, plazo_anios,
+                 n_salarios, esfuerzo_objetivo=ESFUERZO_OBJETIVO, pct_entrada=PCT_ENTRADA):
+    """Renta mensual por persona a partir de la cual la cuota no supera el objetivo."""
+    principal = precio_compra_m2 * np.asarray(tamano_vivienda_m2, dtype=float) * (1 - pct_entrada)
+    ingresos = cuota_mensual(principal, interes_hipoteca, plazo_anios) / (esfuerzo_objetivo / 100)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return ingresos / np.asarray(n_salarios, dtype=float)
+
+
+def superficie_maxima(precio_compra_m2, renta_mensual_individual, n_salarios, interes_hipoteca,
+                      plazo_anios, esfuerzo_objetivo=ESFUERZO_OBJETIVO, pct_entrada=PCT_ENTRADA):
+    """m² máximos cuya cuota no supera el objetivo con la renta dada."""
+    cuota_max = np.asarray(renta_mensual_individual, dtype=float) * n_salarios * esfuerzo_objetivo / 100
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return cuota_max / (precio_compra_m2 * (1 - pct_entrada) * factor_anualidad(interes_hipoteca, plazo_anios))
+
+
+def interes_maximo(precio_compra_m2, tamano_vivienda_m2, renta_mensual_individual, n_salarios,
+                   plazo_anios, esfuerzo_objetivo=ESFUERZO_OBJETIVO, pct_entrada=PCT_ENTRADA,
+                   iteraciones=60):
+    """
+    Tipo de interés anual (%) máximo con el que la cuota no supera el
+    objetivo. NaN si ni al 0% se llega (el principal / nº de cuotas ya
+    supera la cuota asumible).
+    """
+    principal = precio_compra_m2 * np.asarray(tamano_vivienda_m2, dtype=float) * (1 - pct_entrada)
+    cuota_max = np.asarray(renta_mensual_individual, dtype=float) * n_salarios * esfuerzo_objetivo / 100
+    n = np.asarray(plazo_anios, dtype=float) * 12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        objetivo = cuota_max / principal  # A(r, n) máximo asumible
+    objetivo, n = np.broadcast_arrays(objetivo, n)
+
+    # A(r, n) > r para r > 0, así que la raíz está en [0, objetivo]
+    bajo = np.zeros(objetivo.shape)
+    alto = np.where(np.isfinite(objetivo), np.maximum(objetivo, 0), 0.0)
+    for _ in range(iteraciones):
+        medio = (bajo + alto) / 2
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            a = np.where(medio == 0, 1 / n, medio / (1 - (1 + medio) ** -n))
+        asumible = a <= objetivo
+        bajo = np.where(asumible, medio, bajo)
+        alto = np.where(asumible, alto, medio)
+
+    with np.errstate(invalid="ignore"):
+        alcanzable = objetivo >= 1 / n
+    return np.where(alcanzable, bajo * 12 * 100, np.nan)
+
+
+def inversos(precio_compra_m2, renta_mensual_individual, interes_hipoteca, tamano_vivienda_m2,
+             n_salarios, plazo_anios, esfuerzo_objetivo=ESFUERZO_OBJETIVO, pct_entrada=PCT_ENTRADA):
+    """Las tres soluciones inversas para la cuota, como columnas."""
+    return {
+        "renta_minima_cuota": renta_minima(
+            precio_compra_m2, tamano_vivienda_m2, interes_hipoteca, plazo_anios,
+            n_salarios, esfuerzo_objetivo, pct_entrada,
+        ),
+        "m2_maximos_cuota": superficie_maxima(
+            precio_compra_m2, renta_mensual_individual, n_salarios, interes_hipoteca,
+            plazo_anios, esfuerzo_objetivo, pct_entrada,
+        ),
+        "interes_maximo_cuota": interes_maximo(
+            precio_compra_m2, tamano_vivienda_m2, renta_mensual_individual, n_salarios,
+            plazo_anios, esfuerzo_objetivo, pct_entrada,
+        ),
+    }
+
+
+# --------------------------------------------------
+# Trayectoria de ahorro hasta la entrada
+# --------------------------------------------------
+
+def simular_entrada(precio_vivienda, crec_precio, ingresos_anuales, crec_renta, pct_ahorro,
+                    rentabilidad=RENTABILIDAD_AHORRO, anios_max=ANIOS_MAX_SIMULACION,
+                    pct_entrada=PCT_ENTRADA):
+    """
+    Años hasta reunir la entrada cuando precio e ingresos evolucionan
+    mientras se ahorra (en lugar del cociente estático entrada / ahorro).
+
+    Año a año t = 1..anios_max:
+      - ahorro del año:   ingresos · (1 + crec_renta)^(t-1) · pct_ahorro
+      - saldo:            saldo anterior · (1 + rentabilidad) + ahorro del año
+      - entrada exigida:  precio · (1 + crec_precio)^t · pct_entrada
+
+    Todas las entradas se combinan por broadcasting (p. ej. provincias ×
+    perfiles) y los años van en un eje extra, así que toda la simulación
+    es un único cálculo de arrays. Devuelve los años (con fracción,
+    interpolando dentro del año en que se cruza) o inf si no se llega en
+    `anios_max` años.
+    """
+    t = np.arange(1, anios_max + 1)
+    ingresos = np.asarray(ingresos_anuales, dtype=float)[..., None]
+    ahorro = ingresos * (np.asarray(pct_ahorro, dtype=float)[..., None] / 100.0) \
+        * (1 + np.asarray(crec_renta, dtype=float)[..., None]) ** (t - 1)
+
+    # saldo_t = Σ_k ahorro_k (1+ρ)^(t-k) = (1+ρ)^t · cumsum(ahorro_k (1+ρ)^-k)
+    capitalizacion = (1 + rentabilidad) ** t
+    saldo = capitalizacion * np.cumsum(ahorro / capitalizacion, axis=-1)
+    entrada = np.asarray(precio_vivienda, dtype=float)[..., None] * pct_entrada \
+        * (1 + np.asarray(crec_precio, dtype=float)[..., None]) ** t
+
+    # hueco por cubrir al final de cada año (t = 0: toda la entrada inicial)
+    hueco = entrada - saldo
+    hueco_0 = np.asarray(precio_vivienda, dtype=float)[..., None] * pct_entrada
+    hueco = np.concatenate([np.broadcast_to(hueco_0, hueco.shape[:-1] + (1,)), hueco], axis=-1)
+
+    cubierto = hueco <= 0
+    alcanzado = cubierto.any(axis=-1)
+    i = np.argmax(cubierto, axis=-1)  # primer año con el hueco cubierto
+    antes = np.take_along_axis(hueco, np.maximum(i - 1, 0)[..., None], axis=-1)[..., 0]
+    despues = np.take_along_axis(hueco, i[..., None], axis=-1)[..., 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraccion = np.where(antes > despues, antes / (antes - despues), 1.0)
+    anios = np.where(i > 0, i - 1 + fraccion, 0.0)
+    return np.where(alcanzado, anios, np.inf)
@@ -0,0 +1,493 @@
+"""
+Pruebas de carga de la app: simula muchos usuarios a la vez usando el
+dashboard como lo haría el navegador, a través de los endpoints internos
+de Dash (`/_dash-layout`, `/_dash-dependencies` y
+`/_dash-update-component`).
+
+Cada usuario virtual repite sesiones: carga la página (y con ella los
+callbacks iniciales), elige CCAA y provincia, mueve sliders y cambia de
+pestaña, con pausas entre pasos. Cada cambio dispara los callbacks que
+dependen de él y, en cadena, los que dependen de sus salidas, igual que
+el cliente de Dash. Las sesiones son sintéticas (generadas a partir del
+layout) o grabadas en un fichero JSON lines (`--trazas`), un objeto
+{"pasos": [...]} por línea; cada paso es
+
+    {"id": "renta-slider", "property": "value", "valor": 1800, "pausa": 1.5}
+
+o, para elegir entre las opciones actuales de un desplegable,
+{"id": "provincia-dropdown", "property": "value", "opcion": 2}.
+
+Con `--configs` arranca la app con gunicorn para cada configuración
+workers × hilos, lanza la carga y compara: peticiones por segundo,
+latencia p50/p95/p99 por callback, tasa de errores y memoria (RSS) de
+los workers. Con `--url` ataca a una instancia ya arrancada.
+
+    python -m src.carga --usuarios 20 --duracion 60 --configs 1x4 2x2 2x4
+    python -m src.carga --url http://127.0.0.1:8050 --usuarios 10
+    python -m src.carga --grabar sesiones.jsonl --sesiones 100
+
+El generador de carga usa hilos: en una máquina con pocos núcleos
+compite por la CPU con gunicorn, así que para dimensionar conviene
+lanzarlo desde otra máquina o fijarse en las diferencias entre
+configuraciones más que en los valores absolutos.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from src.memoria import rss_mb
+
+PASOS_POR_SESION = (6, 15)
+PAUSA_SEGUNDOS = (0.5, 3.0)  # tiempo de "pensar" del usuario entre pasos
+MAX_CADENA = 10  # niveles máximos de callbacks encadenados
+TIMEOUT_PETICION = 60
+ARRANQUE_MAX_SEGUNDOS = 180
+
+
+# --------------------------------------------------
+# Layout y dependencias de Dash
+# --------------------------------------------------
+
+def componentes_layout(nodo, salida=None) -> dict:
+    """id -> props (sin children) de todos los componentes con id del layout."""
+    salida = {} if salida is None else salida
+    if isinstance(nodo, list):
+        for hijo in nodo:
+            componentes_layout(hijo, salida)
+    elif isinstance(nodo, dict) and "props" in nodo:
+        props = nodo["props"]
+        if isinstance(props.get("id"), str):
+            salida[props["id"]] = {"type": nodo.get("type"), **{k: v for k, v in props.items() if k != "children"}}
+        componentes_layout(props.get("children"), salida)
+    return salida
+
+
+class Callback:
+    """Un callback del servidor tal como lo describe /_dash-dependencies."""
+
+    def __init__(self, dep: dict):
+        self.output = dep["output"]
+        if self.output.startswith(".."):
+            partes = self.output.strip(".").split("...")
+            self.multi = True
+        else:
+            partes = [self.output]
+            self.multi = False
+        self.salidas = [tuple(p.rsplit(".", 1)) for p in partes]
+        self.entradas = [(i["id"], i["property"]) for i in dep["inputs"]]
+        self.estados = [(i["id"], i["property"]) for i in dep.get("state", [])]
+        self.inicial = not dep.get("prevent_initial_call", False)
+        self.nombre = ".".join(self.salidas[0]) + (f" (+{len(self.salidas) - 1})" if self.multi else "")
+
+    def cuerpo(self, estado: dict, cambiados) -> dict:
+        salidas = [{"id": i, "property": p} for i, p in self.salidas]
+        return {
+            "output": self.output,
+            "outputs": salidas if self.multi else salidas[0],
+            "inputs": [{"id": i, "property": p, "value": estado.get((i, p))} for i, p in self.entradas],
+            "state": [{"id": i, "property": p, "value": estado.get((i, p))} for i, p in self.estados],
+            "changedPropIds": [f"{i}.{p}" for i, p in self.entradas if (i, p) in cambiados],
+        }
+
+
+def orden_inicial(callbacks):
+    """Callbacks iniciales en orden: primero los que no esperan a otros."""
+    pendientes = [c for c in callbacks if c.inicial]
+    orden = []
+    while pendientes:
+        producidas = {s for c in pendientes for s in c.salidas}
+        listos = [c for c in pendientes if not producidas.intersection(c.entradas)] or pendientes[:1]
+        orden += listos
+        pendientes = [c for c in pendientes if c not in listos]
+    return orden
+
+
+# --------------------------------------------------
+# Sesiones sintéticas
+# --------------------------------------------------
+
+def valores_slider(props, rng, n):
+    paso = props.get("step") or 1
+    valores = np.arange(props["min"], props["max"] + paso / 2, paso)
+    return [round(float(v), 4) for v in rng.choice(valores, size=n)]
+
+
+def sesion_sintetica(componentes: dict, rng: random.Random) -> dict:
+    """
+    Una sesión: CCAA y provincia al principio, después una mezcla de
+    sliders (arrastres de 1 a 3 valores), cambios de pestaña, de
+    provincia y de desplegables.
+    """
+    nrng = np.random.default_rng(rng.randrange(2**32))
+    pausa = lambda: round(rng.uniform(*PAUSA_SEGUNDOS), 2)
+    sliders = [i for i, p in componentes.items() if p["type"] in ("Slider", "RangeSlider") and "min" in p]
+    desplegables = [
+        i for i, p in componentes.items()
+        if p["type"] in ("Dropdown", "RadioItems") and p.get("options") and i not in ("ccaa-dropdown", "provincia-dropdown")
+    ]
+    pestanas = [i for i, p in componentes.items() if p["type"] == "Tabs"]
+
+    pasos = []
+    if "ccaa-dropdown" in componentes:
+        pasos.append({"id": "ccaa-dropdown", "property": "value",
+                      "opcion": rng.randrange(len(componentes["ccaa-dropdown"]["options"])), "pausa": pausa()})
+    if "provincia-dropdown" in componentes:
+        pasos.append({"id": "provincia-dropdown", "property": "value", "opcion": rng.randrange(10), "pausa": pausa()})
+
+    for _ in range(rng.randint(*PASOS_POR_SESION)):
+        tipo = rng.choices(["slider", "pestana", "provincia", "desplegable"], weights=[6, 2, 1, 1])[0]
+        if tipo == "slider" and sliders:
+            i = rng.choice(sliders)
+            for valor in valores_slider(componentes[i], nrng, rng.randint(1, 3)):
+                pasos.append({"id": i, "property": "value", "valor": valor, "pausa": round(rng.uniform(0.1, 0.4), 2)})
+            pasos[-1]["pausa"] = pausa()
+        elif tipo == "pestana" and pestanas:
+            i = rng.choice(pestanas)
+            tabs = [c["props"]["value"] for c in componentes[i].get("_tabs", [])] or [componentes[i].get("value")]
+            pasos.append({"id": i, "property": "value", "valor": rng.choice(tabs), "pausa": pausa()})
+        elif tipo == "provincia" and "provincia-dropdown" in componentes:
+            pasos.append({"id": "provincia-dropdown", "property": "value", "opcion": rng.randrange(10), "pausa": pausa()})
+        elif desplegables:
+            i = rng.choice(desplegables)
+            pasos.append({"id": i, "property": "value", "opcion": rng.randrange(len(componentes[i]["options"])),
+                          "pausa": pausa()})
+    return {"pasos": pasos}
+
+
+def pestanas_layout(nodo, componentes):
+    """Guarda en cada dcc.Tabs la lista de sus dcc.Tab (para elegir una)."""
+    if isinstance(nodo, list):
+        for hijo in nodo:
+            pestanas_layout(hijo, componentes)
+    elif isinstance(nodo, dict) and "props" in nodo:
+        props = nodo["props"]
+        if nodo.get("type") == "Tabs" and props.get("id") in componentes:
+            hijos = props.get("children") or []
+            componentes[props["id"]]["_tabs"] = hijos if isinstance(hijos, list) else [hijos]
+        pestanas_layout(props.get("children"), componentes)
+
+
+# --------------------------------------------------
+# Usuario virtual
+# --------------------------------------------------
+
+class Medidas:
+    """Latencias y errores de todas las peticiones (compartido entre hilos)."""
+
+    def __init__(self):
+        self._filas = []
+        self._cerrojo = threading.Lock()
+
+    def anotar(self, nombre, segundos, ok):
+        with self._cerrojo:
+            self._filas.append((nombre, segundos, ok, time.time()))
+
+    def tabla(self) -> pd.DataFrame:
+        with self._cerrojo:
+            return pd.DataFrame(self._filas, columns=["callback", "segundos", "ok", "fin"])
+
+
+class UsuarioDash:
+    def __init__(self, url: str, medidas: Medidas):
+        partes = urlsplit(url)
+        self._conexion = lambda: http.client.HTTPConnection(partes.hostname, partes.port or 80,
+                                                            timeout=TIMEOUT_PETICION)
+        self._http = self._conexion()
+        self.medidas = medidas
+        self.estado = {}
+        self.callbacks = []
+
+    def _peticion(self, nombre, metodo, ruta, cuerpo=None, es_json=True):
+        datos = None if cuerpo is None else json.dumps(cuerpo).encode()
+        cabeceras = {"Content-Type": "application/json"} if datos else {}
+        t0 = time.perf_counter()
+        try:
+            self._http.request(metodo, ruta, body=datos, headers=cabeceras)
+            respuesta = self._http.getresponse()
+            contenido = respuesta.read()
+            ok = respuesta.status in (200, 204)
+        except (OSError, http.client.HTTPException):
+            self._http.close()
+            self._http = self._conexion()
+            respuesta, contenido, ok = None, b"", False
+        self.medidas.anotar(nombre, time.perf_counter() - t0, ok)
+        if ok and es_json and respuesta.status == 200 and contenido:
+            return json.loads(contenido)
+        return None
+
+    def cargar_pagina(self):
+        self._peticion("GET /", "GET", "/", es_json=False)
+        layout = self._peticion("GET /_dash-layout", "GET", "/_dash-layout")
+        dependencias = self._peticion("GET /_dash-dependencies", "GET", "/_dash-dependencies")
+        if layout is None or dependencias is None:
+            return None
+        componentes = componentes_layout(layout)
+        pestanas_layout(layout, componentes)
+        self.estado = {(i, p): v for i, props in componentes.items() for p, v in props.items() if not p.startswith("_")}
+        self.callbacks = [Callback(d) for d in dependencias if not d.get("clientside_function")]
+        for cb in orden_inicial(self.callbacks):
+            self._ejecutar(cb, cambiados=set())
+        return componentes
+
+    def _ejecutar(self, cb: Callback, cambiados) -> set:
+        """Lanza un callback y aplica su respuesta; devuelve las props que cambian."""
+        respuesta = self._peticion(cb.nombre, "POST", "/_dash-update-component", cb.cuerpo(self.estado, cambiados))
+        nuevos = set()
+        for id_, props in ((respuesta or {}).get("response") or {}).items():
+            for prop, valor in props.items():
+                if self.estado.get((id_, prop)) != valor:
+                    self.estado[(id_, prop)] = valor
+                    nuevos.add((id_, prop))
+        return nuevos
+
+    def cambiar(self, id_, prop, valor):
+        """Cambia una prop (como el navegador) y propaga los callbacks en cadena."""
+        if self.estado.get((id_, prop)) == valor:
+            return
+        self.estado[(id_, prop)] = valor
+        cambiados = {(id_, prop)}
+        for _ in range(MAX_CADENA):
+            disparados = [cb for cb in self.callbacks if cambiados.intersection(cb.entradas)]
+            if not disparados:
+                break
+            siguientes = set()
+            for cb in disparados:
+                siguientes |= self._ejecutar(cb, cambiados)
+            cambiados = siguientes
+
+    def ejecutar_paso(self, paso, escala_pausas=1.0):
+        id_, prop = paso["id"], paso.get("property", "value")
+        if "opcion" in paso:
+            opciones = self.estado.get((id_, "options")) or []
+            if not opciones:
+                return
+            opcion = opciones[paso["opcion"] % len(opciones)]
+            valor = opcion["value"] if isinstance(opcion, dict) else opcion
+        else:
+            valor = paso["valor"]
+        self.cambiar(id_, prop, valor)
+        time.sleep(paso.get("pausa", 0) * escala_pausas)
+
+
+def bucle_usuario(url, medidas, fin, trazas, semilla, escala_pausas):
+    rng = random.Random(semilla)
+    usuario = UsuarioDash(url, medidas)
+    sesiones = 0
+    while time.time() < fin:
+        componentes = usuario.cargar_pagina()
+        if componentes is None:
+            time.sleep(1)
+            continue
+        sesion = rng.choice(trazas) if trazas else sesion_sintetica(componentes, rng)
+        for paso in sesion["pasos"]:
+            if time.time() >= fin:
+                break
+            usuario.ejecutar_paso(paso, escala_pausas)
+        sesiones += 1
+    return sesiones
+
+
+# --------------------------------------------------
+# Gunicorn y memoria de los workers
+# --------------------------------------------------
+
+def hijos(pid) -> list:
+    """PIDs de los procesos hijos (workers de gunicorn). Solo Linux (/proc)."""
+    resultado = []
+    for entrada in Path("/proc").iterdir():
+        if not entrada.name.isdigit():
+            continue
+        try:
+            stat = (entrada / "stat").read_text()
+        except OSError:
+            continue
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+            resultado.append(int(entrada.name))
+    return resultado
+
+
+class MuestreoRSS(threading.Thread):
+    """Máximo de RSS de cada worker mientras dura la prueba."""
+
+    def __init__(self, pid_maestro, intervalo=1.0):
+        super().__init__(daemon=True)
+        self.pid_maestro, self.intervalo = pid_maestro, intervalo
+        self.maximos = {}
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.is_set():
+            for pid in hijos(self.pid_maestro):
+                self.maximos[pid] = max(self.maximos.get(pid, 0.0), rss_mb(pid))
+            self._parar.wait(self.intervalo)
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+
+def lanzar_gunicorn(workers, hilos, puerto):
+    comando = [
+        sys.executable, "-m", "gunicorn", "app:server",
+        "--workers", str(workers), "--threads", str(hilos),
+        "--bind", f"127.0.0.1:{puerto}", "--timeout", "120", "--log-level", "warning",
+    ]
+    proceso = subprocess.Popen(comando, env={**os.environ, "PYTHONUNBUFFERED": "1"},
+                               stdout=subprocess.DEVNULL)
+    limite = time.time() + ARRANQUE_MAX_SEGUNDOS
+    while time.time() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"gunicorn ha terminado al arrancar (código {proceso.returncode})")
+        try:
+            conexion = http.client.HTTPConnection("127.0.0.1", puerto, timeout=5)
+            conexion.request("GET", "/")
+            if conexion.getresponse().status == 200:
+                return proceso
+        except OSError:
+            time.sleep(0.5)
+    proceso.kill()
+    raise RuntimeError("gunicorn no responde")
+
+
+def parar_gunicorn(proceso):
+    proceso.send_signal(signal.SIGTERM)
+    try:
+        proceso.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proceso.kill()
+
+
+# --------------------------------------------------
+# Prueba e informe
+# --------------------------------------------------
+
+def lanzar_carga(url, usuarios, duracion, trazas=None, semilla=0, escala_pausas=1.0) -> tuple:
+    medidas = Medidas()
+    fin = time.time() + duracion
+    with ThreadPoolExecutor(max_workers=usuarios) as pool:
+        sesiones = sum(pool.map(
+            lambda u: bucle_usuario(url, medidas, fin, trazas, semilla * 1000 + u, escala_pausas),
+            range(usuarios),
+        ))
+    return medidas.tabla(), sesiones
+
+
+def resumen_callbacks(tabla: pd.DataFrame) -> pd.DataFrame:
+    """n, errores y p50/p95/p99 (ms) por callback."""
+    ms = tabla.assign(ms=tabla["segundos"] * 1000).groupby("callback")
+    return pd.DataFrame({
+        "n": ms.size(),
+        "errores": ms["ok"].apply(lambda s: int((~s).sum())),
+        "p50_ms": ms["ms"].quantile(0.50),
+        "p95_ms": ms["ms"].quantile(0.95),
+        "p99_ms": ms["ms"].quantile(0.99),
+    }).sort_values("p95_ms", ascending=False)
+
+
+def resumen_global(tabla, sesiones, duracion, rss=None) -> dict:
+    fila = {
+        "peticiones": len(tabla),
+        "peticiones_s": len(tabla) / duracion,
+        "sesiones": sesiones,
+        "errores_pct": 100 * (1 - tabla["ok"].mean()) if len(tabla) else float("nan"),
+        "p50_ms": tabla["segundos"].quantile(0.50) * 1000,
+        "p95_ms": tabla["segundos"].quantile(0.95) * 1000,
+        "p99_ms": tabla["segundos"].quantile(0.99) * 1000,
+    }
+    if rss:
+        fila.update(rss_worker_max_mb=max(rss.values()), rss_total_mb=sum(rss.values()))
+    return fila
+
+
+def leer_trazas(path) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.carga")
+    parser.add_argument("--url", help="instancia ya arrancada (si no, se lanza gunicorn por cada --configs)")
+    parser.add_argument("--configs", nargs="+", default=["1x4"], help="workers x hilos, p. ej. 2x4")
+    parser.add_argument("--usuarios", type=int, default=10)
+    parser.add_argument("--duracion", type=float, default=60, help="segundos de carga por configuración")
+    parser.add_argument("--trazas", help="sesiones grabadas (JSON lines)")
+    parser.add_argument("--sin-pausas", action="store_true", help="sin tiempo de pensar entre pasos")
+    parser.add_argument("--puerto", type=int, default=8060)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="guardar el informe en JSON")
+    parser.add_argument("--grabar", help="solo generar sesiones sintéticas en este fichero y salir")
+    parser.add_argument("--sesiones", type=int, default=50, help="nº de sesiones con --grabar")
+    args = parser.parse_args(argv)
+
+    trazas = leer_trazas(args.trazas) if args.trazas else None
+    escala_pausas = 0.0 if args.sin_pausas else 1.0
+
+    if args.grabar:
+        url = args.url or f"http://127.0.0.1:{args.puerto}"
+        proceso = None if args.url else lanzar_gunicorn(1, 1, args.puerto)
+        try:
+            componentes = UsuarioDash(url, Medidas()).cargar_pagina()
+        finally:
+            if proceso:
+                parar_gunicorn(proceso)
+        rng = random.Random(args.semilla)
+        with open(args.grabar, "w", encoding="utf-8") as f:
+            for _ in range(args.sesiones):
+                f.write(json.dumps(sesion_sintetica(componentes, rng), ensure_ascii=False) + "\n")
+        print(f"{args.sesiones} sesiones guardadas en {args.grabar}")
+        return
+
+    globales, por_callback = {}, {}
+    configuraciones = ["externa"] if args.url else args.configs
+    for config in configuraciones:
+        proceso, muestreo = None, None
+        url = args.url
+        if not args.url:
+            workers, hilos = (int(x) for x in config.lower().split("x"))
+            print(f"Arrancando gunicorn {workers} workers × {hilos} hilos…")
+            proceso = lanzar_gunicorn(workers, hilos, args.puerto)
+            url = f"http://127.0.0.1:{args.puerto}"
+            muestreo = MuestreoRSS(proceso.pid)
+            muestreo.start()
+        try:
+            print(f"  {args.usuarios} usuarios durante {args.duracion:.0f} s…")
+            tabla, sesiones = lanzar_carga(url, args.usuarios, args.duracion, trazas, args.semilla, escala_pausas)
+        finally:
+            if muestreo:
+                muestreo.parar()
+            if proceso:
+                parar_gunicorn(proceso)
+        globales[config] = resumen_global(tabla, sesiones, args.duracion, muestreo.maximos if muestreo else None)
+        por_callback[config] = resumen_callbacks(tabla)
+
+    pd.set_option("display.width", 160)
+    for config, tabla in por_callback.items():
+        print(f"\n=== {config}: latencia por callback ===")
+        print(tabla.round(1).to_string())
+    print("\n=== Comparación de configuraciones ===")
+    print(pd.DataFrame(globales).T.round(1).to_string())
+
+    if args.salida:
+        informe = {
+            "global": globales,
+            "callbacks": {c: t.reset_index().to_dict(orient="records") for c, t in por_callback.items()},
+            "parametros": {"usuarios": args.usuarios, "duracion": args.duracion, "sin_pausas": args.sin_pausas},
+        }
+        Path(args.salida).write_text(json.dumps(informe, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Evaluación por lotes de escenarios de hogar.
+
+Cada escenario (renta, nº de salarios, % de ahorro, tamaño de vivienda,
+plazo y tipo de interés) se cruza con todas las filas provincia × año
+del dataset y se calculan los tres indicadores de la app (los de
+`calcular_indicadores_provincias`) más los precios por m² que predicen
+los modelos para esa renta y ese tipo.
+
+Los escenarios se procesan en bloques: cada bloque es un cálculo
+vectorizado escenarios × filas, y los resultados se van entregando
+bloque a bloque (generador), sin construir nunca la tabla completa. Con
+muchos escenarios los bloques se reparten entre procesos (joblib).
+
+Lo usan el endpoint `/api/escenarios` de la app y la línea de comandos:
+
+    python -m src.escenarios escenarios.csv -o resultados.csv [--anios 2024 2025]
+"""
+import argparse
+import io
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.asequibilidad import INDICADORES, indicadores
+
+DATA_CSV = Path("data/housing_final.csv")
+
+# columnas obligatorias de cada escenario (mismos nombres que en la app)
+PARAMETROS = (
+    "renta_mensual_individual",
+    "interes_hipoteca",
+    "tamano_vivienda_m2",
+    "n_salarios",
+    "pct_ahorro",
+    "plazo_anios",
+)
+
+COLUMNAS_BASE = ["cod_ine", "ccaa", "provincia", "anio", "precio_compra_m2", "precio_alquiler_m2"]
+
+TAM_BLOQUE = 100  # escenarios por bloque (× ~300 filas provincia-año)
+MIN_ESCENARIOS_PARALELO = 2000  # por debajo no compensa lanzar procesos
+
+FORMATOS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+# --------------------------------------------------
+# Entrada
+# --------------------------------------------------
+
+def cargar_base(path: Path = DATA_CSV) -> pd.DataFrame:
+    """Filas provincia × año contra las que se evalúan los escenarios."""
+    return pd.read_csv(path, sep=";")[COLUMNAS_BASE]
+
+
+def leer_escenarios(origen, formato: str = None, sep: str = ",") -> pd.DataFrame:
+    """
+    Lee escenarios de un CSV o de un JSON (lista de objetos o
+    {"escenarios": [...]}). `origen` puede ser una ruta, bytes o un
+    fichero abierto; si no se indica `formato` se deduce de la extensión.
+
+    Añade la columna `escenario` (identificador) si no viene y valida que
+    estén todos los PARAMETROS y sean números finitos (ValueError si no,
+    nombrando el escenario).
+    """
+    if isinstance(origen, bytes):
+        origen = io.BytesIO(origen)
+    if formato is None:
+        formato = "json" if str(getattr(origen, "name", origen)).lower().endswith(".json") else "csv"
+
+    if formato == "json":
+        datos = json.load(origen) if hasattr(origen, "read") else json.loads(Path(origen).read_text(encoding="utf-8"))
+        if isinstance(datos, dict):
+            datos = datos.get("escenarios", [])
+        escenarios = pd.DataFrame(datos)
+    elif formato == "csv":
+        escenarios = pd.read_csv(origen, sep=sep)
+    else:
+        raise ValueError(f"Formato de escenarios desconocido: {formato!r}")
+
+    faltan = [c for c in PARAMETROS if c not in escenarios]
+    if faltan:
+        raise ValueError(f"Faltan columnas en los escenarios: {', '.join(faltan)}")
+    if "escenario" not in escenarios:
+        escenarios.insert(0, "escenario", np.arange(len(escenarios)))
+
+    for c in PARAMETROS:
+        try:
+            escenarios[c] = pd.to_numeric(escenarios[c]).astype(float)
+        except (ValueError, TypeError):
+            raise ValueError(f"La columna {c!r} debe ser numérica") from None
+    finitos = np.isfinite(escenarios[list(PARAMETROS)].to_numpy())
+    if not finitos.all():
+        i = int(np.flatnonzero(~finitos.all(axis=1))[0])
+        columnas = [c for c, ok in zip(PARAMETROS, finitos[i]) if not ok]
+        raise ValueError(
+            f"Escenario {escenarios['escenario'].iloc[i]!r} (fila {i + 1}): "
+            f"valor vacío o no finito en {', '.join(columnas)}"
+        )
+    return escenarios[["escenario", *PARAMETROS]].reset_index(drop=True)
+
+
+# --------------------------------------------------
+# Cálculo
+# --------------------------------------------------
+
+def evaluar_bloque(base: pd.DataFrame, escenarios: pd.DataFrame, modelos: dict) -> pd.DataFrame:
+    """
+    Evalúa un bloque de escenarios contra todas las filas de `base` en un
+    único cálculo vectorizado (escenarios × filas). `modelos` es
+    {"compra": modelo, "alquiler": modelo} con `predict(DataFrame)`.
+    """
+    n_esc, n_base = len(escenarios), len(base)
+    p = {c: escenarios[c].to_numpy()[:, None] for c in PARAMETROS}
+
+    res = indicadores(
+        base["precio_compra_m2"].to_numpy()[None, :],
+        base["precio_alquiler_m2"].to_numpy()[None, :],
+        **p,
+    )
+
+    salida = pd.DataFrame({
+        "escenario": np.repeat(escenarios["escenario"].to_numpy(), n_base),
+        **{c: np.tile(base[c].to_numpy(), n_esc) for c in COLUMNAS_BASE},
+    })
+
+    X = pd.DataFrame({
+        "anio": salida["anio"],
+        "renta_mensual_neta": np.repeat(escenarios["renta_mensual_individual"].to_numpy(), n_base),
+        "tipo_interes_hipoteca": np.repeat(escenarios["interes_hipoteca"].to_numpy(), n_base),
+        "ccaa": salida["ccaa"],
+        "provincia": salida["provincia"],
+    })
+    for nombre, modelo in modelos.items():
+        salida[f"pred_{nombre}_m2"] = modelo.predict(X)
+
+    for c in INDICADORES:
+        salida[c] = np.broadcast_to(res[c], (n_esc, n_base)).ravel()
+    return salida
+
+
+def serializar_bloque(bloque: pd.DataFrame, formato: str = "csv", cabecera: bool = True) -> str:
+    """Texto CSV o NDJSON de un bloque (redondeado a 4 decimales)."""
+    bloque = bloque.round(4)
+    if formato == "csv":
+        return bloque.to_csv(index=False, header=cabecera)
+    if formato == "ndjson":
+        return bloque.to_json(orient="records", lines=True, force_ascii=False) + "\n"
+    raise ValueError(f"Formato de salida desconocido: {formato!r}")
+
+
+def _tarea(base, bloque, modelos, formato, cabecera):
+    resultado = evaluar_bloque(base, bloque, modelos)
+    return resultado if formato is None else serializar_bloque(resultado, formato, cabecera)
+
+
+def iterar_resultados(base, escenarios, modelos, anios=None, formato=None,
+                      tam_bloque=TAM_BLOQUE, n_jobs=1):
+    """
+    Genera los resultados bloque a bloque, en el orden de los escenarios:
+    DataFrames o, con `formato` ("csv" | "ndjson"), trozos de texto listos
+    para escribir (la cabecera del CSV solo en el primero).
+
+    Con `n_jobs` != 1 y al menos MIN_ESCENARIOS_PARALELO escenarios, los
+    bloques se calculan y serializan en procesos (la serialización es la
+    parte más cara) y se van entregando en orden según terminan.
+    """
+    if anios is not None:
+        base = base[base["anio"].isin(anios)]
+    base = base.reset_index(drop=True)
+
+    tareas = [
+        (base, escenarios.iloc[i:i + tam_bloque], modelos, formato, i == 0)
+        for i in range(0, len(escenarios), tam_bloque)
+    ]
+    from joblib import Parallel, delayed, effective_n_jobs
+
+    if effective_n_jobs(n_jobs) == 1 or len(escenarios) < MIN_ESCENARIOS_PARALELO:
+        for tarea in tareas:
+            yield _tarea(*tarea)
+        return
+
+    yield from Parallel(n_jobs=n_jobs, return_as="generator")(
+        delayed(_tarea)(*tarea) for tarea in tareas
+    )
+
+
+# --------------------------------------------------
+# Línea de comandos
+# --------------------------------------------------
+
+def main(argv=None):
+    from src.artefacto import ModeloLineal, ruta_artefacto
+
+    parser = argparse.ArgumentParser(prog="python -m src.escenarios")
+    parser.add_argument("entrada", help="CSV o JSON de escenarios")
+    parser.add_argument("-o", "--salida", help="fichero de salida (por defecto, la salida estándar)")
+    parser.add_argument("--formato", choices=sorted(FORMATOS), default=None,
+                        help="csv o ndjson (por defecto, según la extensión de --salida)")
+    parser.add_argument("--sep", default=",", help="separador del CSV de entrada")
+    parser.add_argument("--anios", type=int, nargs="+", default=None, help="limitar a estos años")
+    parser.add_argument("--n-jobs", type=int, default=-1,
+                        help="procesos con MIN_ESCENARIOS_PARALELO escenarios o más (-1: todos los núcleos)")
+    args = parser.parse_args(argv)
+
+    formato = args.formato or ("ndjson" if str(args.salida).endswith((".ndjson", ".jsonl")) else "csv")
+    escenarios = leer_escenarios(args.entrada, sep=args.sep)
+    modelos = {nombre: ModeloLineal.cargar(ruta_artefacto(nombre)) for nombre in ("compra", "alquiler")}
+
+    trozos = iterar_resultados(
+        cargar_base(), escenarios, modelos, anios=args.anios, formato=formato, n_jobs=args.n_jobs
+    )
+    salida = open(args.salida, "w", encoding="utf-8", newline="") if args.salida else sys.stdout
+    try:
+        for trozo in trozos:
+            salida.write(trozo)
+    finally:
+        if args.salida:
+            salida.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Export estático del dashboard para servirlo desde un CDN o cualquier
+servidor de ficheros, sin Python.
+
+Los datos por provincia y año son pocos y casi todo lo que enseña el
+dashboard sale de ellos con cuentas sencillas, así que se precalcula lo
+que depende solo de los datos y el navegador hace el resto:
+
+- `datos/anios/<anio>.json.gz`: precios por m² de todas las provincias
+  en el año (mapa y ranking). Los indicadores del hogar los calcula
+  `app.js` con las mismas fórmulas que src/asequibilidad.py.
+- `datos/evolucion/<cod_ine>.json.gz`: histórico y proyección CAGR con su
+  banda hasta HORIZONTE_MAX, en cada resolución; el horizonte del slider
+  es un prefijo de la proyección máxima.
+- `datos/modelos.json.gz`: cada modelo como función lineal de las
+  numéricas por provincia (`ModeloLineal.forma_lineal`), con lo
+  necesario para el intervalo de predicción.
+- `datos/provincias.geojson.gz` y `datos/manifiesto.json` (versión,
+  rangos de los sliders, CCAA y provincias, variables del mapa).
+
+Los JSON van comprimidos con gzip y `app.js` los descomprime con
+DecompressionStream, así que no hace falta configurar el servidor. La
+sensibilidad, alquilar o comprar, la evaluación por lotes, las
+descargas y los indicadores que simulan año a año siguen solo en la app
+(`--url-app` añade un enlace a ella).
+
+    python -m src.estatico --salida estatico
+    python -m http.server -d estatico 8000
+"""
+import argparse
+import gzip
+import json
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+PLANTILLA = Path(__file__).with_name("plantilla_estatica")
+CSS = Path("assets/custom.css")
+DECIMALES = 4
+
+# Variables del mapa con fórmula cerrada (las calcula app.js)
+VARIABLES_ESTATICAS = (
+    "esfuerzo_alquiler_pct",
+    "esfuerzo_cuota_pct",
+    "anios_ahorrar_entrada",
+    "renta_minima_cuota",
+    "m2_maximos_cuota",
+    "interes_maximo_cuota",
+)
+
+# id del control en la app -> (clave en app.js, etiqueta)
+CONTROLES = {
+    "anio-slider": ("anio", "Año"),
+    "renta-slider": ("renta", "Renta mensual neta (€)"),
+    "interes-slider": ("interes", "Tipo interés hipoteca (%)"),
+    "house-size-slider": ("tamano", "Tamaño de la vivienda (m²)"),
+    "n-salarios-slider": ("n_salarios", "Nº salarios en el hogar"),
+    "savings-rate-slider": ("ahorro", "Porcentaje del ingreso que podéis ahorrar (%)"),
+    "mortgage-years-slider": ("plazo", "Plazo de la hipoteca (años)"),
+    "esfuerzo-objetivo-slider": ("objetivo", "Esfuerzo objetivo de la hipoteca (% de los ingresos)"),
+    "horizonte-slider": ("horizonte", "Horizonte de predicción (años)"),
+}
+
+
+def lista(valores, decimales=DECIMALES) -> list:
+    """Array -> lista JSON redondeada, con null en lugar de NaN/inf."""
+    a = np.asarray(valores)
+    if a.dtype.kind == "f":
+        a = np.round(a, decimales)
+        return [v if np.isfinite(v) else None for v in a.tolist()]
+    return a.tolist()
+
+
+def escribir(path: Path, objeto, comprimir=True) -> int:
+    """Escribe `objeto` como JSON compacto (gzip si `comprimir`); devuelve los bytes."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    datos = json.dumps(objeto, ensure_ascii=False, separators=(",", ":"), allow_nan=False).encode()
+    if comprimir:
+        datos = gzip.compress(datos, 9, mtime=0)
+    path.write_bytes(datos)
+    return len(datos)
+
+
+# --------------------------------------------------
+# Fragmentos
+# --------------------------------------------------
+
+def fragmentos_anios(datos):
+    """(anio, cuerpo) con los precios de todas las provincias en cada año."""
+    df = datos.df.sort_values(["anio", "provincia"])
+    geo = datos.provincias["Texto"]
+    for anio, dff in df.groupby("anio"):
+        yield int(anio), {
+            "anio": int(anio),
+            "cod_ine": lista(dff["cod_ine"]),
+            "ccaa": dff["ccaa"].astype(str).tolist(),
+            "provincia": dff["provincia"].astype(str).tolist(),
+            "geo": geo.reindex(dff["cod_ine"]).astype(str).tolist(),
+            "precio_compra_m2": lista(dff["precio_compra_m2"].to_numpy(dtype=float)),
+            "precio_alquiler_m2": lista(dff["precio_alquiler_m2"].to_numpy(dtype=float)),
+        }
+
+
+def fragmentos_evolucion(app, datos, resoluciones):
+    """(cod_ine, cuerpo) con histórico y proyección máxima por resolución y variable."""
+    cuerpos = {}
+    for resolucion in resoluciones:
+        cod_ines = datos.df["cod_ine"].unique()
+        for bloque in app.bloques_proyeccion(datos, cod_ines, app.HORIZONTE_MAX, resolucion):
+            for (cod, variable), serie in bloque.groupby(["cod_ine", "variable"], sort=False):
+                cuerpo = cuerpos.setdefault(int(cod), {
+                    "cod_ine": int(cod), "provincia": serie["provincia"].iloc[0], "series": {},
+                })
+                hist, pred = serie[serie["tipo"] == "Histórico"], serie[serie["tipo"] == "Predicción"]
+                cuerpo["series"].setdefault(resolucion, {})[variable] = {
+                    "x_hist": hist["periodo"].tolist(),
+                    "y_hist": lista(hist["valor"]),
+                    "x_pred": pred["periodo"].tolist(),
+                    "y_pred": lista(pred["valor"]),
+                    "inferior": lista(pred["inferior"]),
+                    "superior": lista(pred["superior"]),
+                }
+    yield from cuerpos.items()
+
+
+def cuerpo_modelos(modelos, datos):
+    """
+    Cada modelo, por provincia, como pred = constante + coef · x sobre
+    sus numéricas (y la matriz Q del intervalo). None si algún modelo
+    no es un artefacto portable (fallback de scikit-learn).
+    """
+    if not all(hasattr(m, "forma_lineal") for m in modelos.values()):
+        return None
+    pares = datos.df[["ccaa", "provincia"]].drop_duplicates().astype(str)
+    categorias = {"ccaa": pares["ccaa"].to_numpy(), "provincia": pares["provincia"].to_numpy()}
+    salida = {}
+    for nombre, modelo in modelos.items():
+        forma = modelo.forma_lineal(categorias)
+        cuerpo = {"numericas": modelo.numericas, "nivel": modelo.nivel, "provincias": {}}
+        if "Q" in forma:
+            cuerpo.update(critico=forma["critico"], sigma2=forma["sigma2"])
+        for i, provincia in enumerate(categorias["provincia"]):
+            fila = {"constante": float(forma["constante"][i]), "coef": forma["coef"][i].tolist()}
+            if "Q" in forma:
+                fila["Q"] = forma["Q"][i].tolist()
+            cuerpo["provincias"][provincia] = fila
+        salida[nombre] = cuerpo
+    return salida
+
+
+def controles(app) -> list:
+    """Rango y valor inicial de cada slider, leídos del layout de la app."""
+    from plotly.utils import PlotlyJSONEncoder
+
+    from src.carga import componentes_layout
+
+    layout = componentes_layout(json.loads(json.dumps(app.construir_layout(), cls=PlotlyJSONEncoder)))
+    return [
+        {"clave": clave, "etiqueta": etiqueta,
+         **{k: layout[id_][k] for k in ("min", "max", "step", "value")}}
+        for id_, (clave, etiqueta) in CONTROLES.items()
+    ]
+
+
+# --------------------------------------------------
+# Export
+# --------------------------------------------------
+
+def exportar_estatico(salida: Path, url_app: str = None) -> dict:
+    """Escribe el sitio estático completo en `salida`; devuelve {fichero: bytes}."""
+    import app
+    import plotly.express as px
+    from plotly.offline import get_plotlyjs_version
+
+    version = app.registro.actual()
+    datos = version["datos"]
+    resoluciones = ["anual"] + (["trimestral", "mensual"] if datos.series is not None else [])
+    salida = Path(salida)
+    escritos = {}
+
+    def guardar(relativa, objeto, comprimir=True):
+        escritos[relativa] = escribir(salida / relativa, objeto, comprimir)
+
+    for anio, cuerpo in fragmentos_anios(datos):
+        guardar(f"datos/anios/{anio}.json.gz", cuerpo)
+    for cod, cuerpo in fragmentos_evolucion(app, datos, resoluciones):
+        guardar(f"datos/evolucion/{cod}.json.gz", cuerpo)
+    modelos = cuerpo_modelos(version["modelos"], datos)
+    if modelos is not None:
+        guardar("datos/modelos.json.gz", modelos)
+    (salida / "datos/provincias.geojson.gz").write_bytes(app.GEOJSON_GZ)
+    escritos["datos/provincias.geojson.gz"] = len(app.GEOJSON_GZ)
+
+    provincias = (
+        datos.df[["ccaa", "provincia", "cod_ine"]].drop_duplicates().astype({"ccaa": str, "provincia": str})
+        .sort_values(["ccaa", "provincia"])
+    )
+    guardar("datos/manifiesto.json", {
+        "version": version.version,
+        "generado": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "url_app": url_app,
+        "anios": list(range(datos.anio_min, datos.anio_max + 1)),
+        "resoluciones": resoluciones,
+        "controles": controles(app),
+        "ccaa": {c: g["provincia"].tolist() for c, g in provincias.groupby("ccaa", sort=True)},
+        "cod_ine": {p: int(c) for p, c in zip(provincias["provincia"], provincias["cod_ine"])},
+        "variables": {v: list(app.VARIABLES_MAPA[v]) for v in VARIABLES_ESTATICAS},
+        "constantes": {
+            "pct_entrada": app.PCT_ENTRADA,
+            "nivel_bandas": app.NIVEL_BANDAS,
+            "periodos_por_anio": app.PERIODOS_POR_ANIO,
+        },
+        "escala_color": px.colors.diverging.RdYlGn,
+        "modelos": modelos is not None,
+    }, comprimir=False)
+
+    html = (PLANTILLA / "index.html").read_text(encoding="utf-8")
+    (salida / "index.html").write_text(html.replace("{{PLOTLY_VERSION}}", get_plotlyjs_version()), encoding="utf-8")
+    shutil.copy(PLANTILLA / "app.js", salida / "app.js")
+    if CSS.exists():
+        shutil.copy(CSS, salida / CSS.name)
+    for nombre in ("index.html", "app.js", CSS.name):
+        if (salida / nombre).exists():
+            escritos[nombre] = (salida / nombre).stat().st_size
+    return escritos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.estatico")
+    parser.add_argument("--salida", default="estatico", help="carpeta de destino")
+    parser.add_argument("--url-app", help="URL de la app completa (enlace para las funciones avanzadas)")
+    args = parser.parse_args(argv)
+
+    escritos = exportar_estatico(Path(args.salida), args.url_app)
+    total = sum(escritos.values())
+    print(f"{len(escritos)} ficheros, {total / 2**20:.2f} MB en {args.salida}/")
+
+
+if __name__ == "__main__":
+    main()
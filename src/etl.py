@@ -0,0 +1,253 @@
+"""
+Utilidades compartidas por los scripts de `dataset/` y por la app.
+
+Geografía
+---------
+La tabla de dimensión de provincias (`data/provincias.csv`) se construye
+una única vez en el ETL a partir del GeoJSON y de una lista de alias
+conocidos. Todos los datasets se unen después por el código INE de la
+provincia (`cod_ine`, entero), así que la normalización de nombres
+(tildes, mayúsculas, guiones...) solo se hace aquí, sobre los nombres
+únicos, y nunca fila a fila ni al arrancar la app.
+
+Lectura de CSV
+--------------
+Los ficheros de entrada (exportaciones del INE, intermedios) vienen con
+`;` o `,`, con o sin BOM y con coma o punto decimal. `detectar_formato`
+lo deduce de una muestra pequeña del principio del fichero y `leer_csv`
+lee después con el motor C (o pyarrow, si está instalado) y tipos
+explícitos, en lugar de `sep=None, engine="python"`, que usa el parser
+en Python puro. Con `chunksize` devuelve un iterador de bloques para
+ficheros grandes con memoria acotada.
+"""
+import codecs
+import csv
+import json
+import re
+import unicodedata
+from pathlib import Path
+
+import pandas as pd
+
+GEOJSON_PROVINCIAS = Path("data/spain_provinces.geojson")
+PROVINCIAS_CSV = Path("data/provincias.csv")
+
+SEP_ALIAS = "|"
+
+# Nombres que aparecen en nuestras fuentes (Idealista, INE) y que no
+# coinciden con `Texto` ni con `Texto_Alt` del GeoJSON.
+# cod_ine -> alias extra
+ALIAS_PROVINCIAS = {
+    1: ["Araba/Álava", "Araba - Álava"],
+    3: ["Alicante/Alacant"],
+    7: ["Baleares", "Balears, Illes"],
+    12: ["Castellón/Castelló"],
+    15: ["Coruña, A"],
+    20: ["Gipuzkoa"],
+    26: ["Rioja, La"],
+    35: ["Palmas, Las"],
+    38: ["Tenerife"],
+    46: ["Valencia/València"],
+    48: ["Bizkaia"],
+}
+
+
+def normalize(s) -> str:
+    """
+    Clave de comparación de nombres: sin tildes, en minúsculas y solo
+    con caracteres alfanuméricos ('A Coruña' -> 'acoruna').
+    """
+    if s is None:
+        return ""
+    s = unicodedata.normalize("NFKD", str(s))
+    s = "".join(c for c in s if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9]", "", s.lower())
+
+
+def construir_tabla_provincias(geojson_path: Path = GEOJSON_PROVINCIAS) -> pd.DataFrame:
+    """
+    Devuelve la tabla de dimensión de provincias, una fila por provincia:
+      - cod_ine   (int, 1..52)
+      - Codigo, Texto, Texto_Alt, Cod_CCAA, CCAA  (tal cual el GeoJSON)
+      - alias     (claves normalizadas separadas por '|')
+    """
+    with open(geojson_path, encoding="utf-8-sig") as f:
+        geojson = json.load(f)
+
+    filas = []
+    for feat in geojson["features"]:
+        props = feat["properties"]
+        cod_ine = int(props["Codigo"])
+
+        nombres = [props["Texto"], props["Texto_Alt"]]
+        nombres += ALIAS_PROVINCIAS.get(cod_ine, [])
+        alias = []
+        for nombre in nombres:
+            # 'Alicante/Alacant' también vale como 'Alicante' y 'Alacant'
+            for parte in [nombre] + str(nombre).split("/"):
+                key = normalize(parte)
+                if key and key not in alias:
+                    alias.append(key)
+
+        filas.append({
+            "cod_ine": cod_ine,
+            "Codigo": props["Codigo"],
+            "Texto": props["Texto"],
+            "Texto_Alt": props["Texto_Alt"],
+            "Cod_CCAA": props["Cod_CCAA"],
+            "CCAA": props["CCAA"],
+            "alias": SEP_ALIAS.join(alias),
+        })
+
+    tabla = pd.DataFrame(filas).sort_values("cod_ine").reset_index(drop=True)
+
+    # Un alias no puede apuntar a dos provincias distintas
+    todos = tabla["alias"].str.split(SEP_ALIAS).explode()
+    repetidos = todos[todos.duplicated()].unique()
+    if len(repetidos):
+        raise ValueError(f"Alias de provincia ambiguos: {list(repetidos)}")
+
+    return tabla
+
+
+def cargar_provincias(path: Path = PROVINCIAS_CSV) -> pd.DataFrame:
+    """Lee la tabla de dimensión generada por dataset/build_provincias.py."""
+    return pd.read_csv(
+        path,
+        sep=";",
+        encoding="utf-8-sig",
+        dtype={"cod_ine": int, "Codigo": str, "Cod_CCAA": str},
+    )
+
+
+def mapa_alias(provincias: pd.DataFrame) -> dict:
+    """Diccionario alias normalizado -> cod_ine."""
+    alias = provincias[["cod_ine", "alias"]].copy()
+    alias["alias"] = alias["alias"].str.split(SEP_ALIAS)
+    alias = alias.explode("alias")
+    return dict(zip(alias["alias"], alias["cod_ine"]))
+
+
+def anadir_cod_ine(df: pd.DataFrame, provincias: pd.DataFrame,
+                   col_provincia: str = "provincia") -> pd.DataFrame:
+    """
+    Añade la columna entera `cod_ine` a partir del nombre de provincia.
+
+    La normalización se aplica solo a los nombres únicos, no fila a fila.
+    Si algún nombre no casa con ningún alias se lanza ValueError para que
+    se añada a ALIAS_PROVINCIAS en lugar de perder filas en silencio.
+    """
+    alias = mapa_alias(provincias)
+    nombres = pd.Series(df[col_provincia].unique())
+    codigos = nombres.map(lambda n: alias.get(normalize(n)))
+
+    sin_match = nombres[codigos.isna()].tolist()
+    if sin_match:
+        raise ValueError(f"Provincias sin código INE: {sin_match}")
+
+    lookup = dict(zip(nombres, codigos.astype(int)))
+    df = df.copy()
+    df["cod_ine"] = df[col_provincia].map(lookup).astype(int)
+    return df
+
+
+# --------------------------------------------------
+# Lectura de CSV
+# --------------------------------------------------
+
+BYTES_MUESTRA = 64 * 1024
+BYTES_MIN_PYARROW = 8 * 2**20  # por debajo, arrancar pyarrow cuesta más que leer con C
+SEPARADORES = ";,\t|"
+
+_NUMERO = re.compile(r"^[-+]?\d[\d.,]*$")
+
+
+def _convencion_numerica(campos, sep: str):
+    """
+    (decimal, miles) a partir de los campos numéricos de la muestra.
+
+    - Con punto y coma en el mismo número ('1.234,5'), el último es el
+      decimal y el otro el de miles.
+    - Con un solo signo, si algún número no tiene grupos de 3 cifras
+      detrás ('3,16'), es el decimal; si siempre los tiene ('11,543') es
+      ambiguo y se toma como miles salvo que sea el decimal.
+    """
+    decimal, ambiguo = None, None
+    for campo in campos:
+        campo = campo.strip().strip('"')
+        if not _NUMERO.match(campo):
+            continue
+        signos = [c for c in ".," if c in campo and c != sep]
+        if len(signos) == 2:
+            decimal = max(signos, key=campo.rindex)
+            break
+        if len(signos) == 1:
+            c = signos[0]
+            grupos = campo.split(c)
+            if len(grupos) > 2 or all(len(g) == 3 for g in grupos[1:]):
+                ambiguo = ambiguo or c
+            else:
+                decimal = c
+    decimal = decimal or "."
+    miles = ambiguo if ambiguo and ambiguo != decimal else None
+    return decimal, miles
+
+
+def detectar_formato(path, bytes_muestra: int = BYTES_MUESTRA) -> dict:
+    """
+    Separador, codificación (BOM), decimal y separador de miles de un CSV
+    mirando solo sus primeros `bytes_muestra` bytes. Devuelve argumentos
+    para `pd.read_csv`.
+    """
+    with open(path, "rb") as f:
+        crudo = f.read(bytes_muestra)
+
+    encoding = "utf-8-sig" if crudo.startswith(codecs.BOM_UTF8) else "utf-8"
+    try:
+        texto = crudo.decode(encoding)
+    except UnicodeDecodeError as e:
+        if e.start < len(crudo) - 4:  # no es solo un carácter cortado al final
+            encoding = "latin-1"
+        texto = crudo.decode(encoding, errors="ignore")
+
+    lineas = texto.splitlines()
+    if len(crudo) == bytes_muestra and len(lineas) > 1:
+        lineas = lineas[:-1]  # la última puede estar cortada
+    try:
+        sep = csv.Sniffer().sniff("\n".join(lineas[:50]), delimiters=SEPARADORES).delimiter
+    except csv.Error:
+        sep = ","
+
+    campos = [c for linea in lineas[1:] for c in linea.split(sep)]
+    decimal, miles = _convencion_numerica(campos, sep)
+    return {"sep": sep, "encoding": encoding, "decimal": decimal, "thousands": miles}
+
+
+def pyarrow_disponible() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def leer_csv(path, dtype=None, usecols=None, chunksize=None, engine=None, formato=None, **kwargs):
+    """
+    Lee un CSV con el formato detectado (o el que se pase en `formato`).
+
+    - `dtype`: tipos explícitos por columna (evita la inferencia).
+    - `chunksize`: devuelve un iterador de DataFrames de ese nº de filas.
+    - `engine`: por defecto pyarrow para ficheros grandes si está
+      instalado y el formato lo admite (sin separador de miles ni
+      bloques); si no, el motor C.
+    """
+    opciones = {**(formato or detectar_formato(path)), **kwargs}
+    if engine is None:
+        usar_pyarrow = (
+            chunksize is None
+            and opciones.get("thousands") is None
+            and Path(path).stat().st_size >= BYTES_MIN_PYARROW
+            and pyarrow_disponible()
+        )
+        engine = "pyarrow" if usar_pyarrow else "c"
+    return pd.read_csv(path, dtype=dtype, usecols=usecols, chunksize=chunksize, engine=engine, **opciones)
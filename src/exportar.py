@@ -0,0 +1,120 @@
+"""
+Exportación en streaming de tablas de la app (CSV o Parquet, con gzip
+opcional).
+
+Las funciones reciben un iterable de DataFrames (bloques) y devuelven un
+generador de bytes: cada bloque se codifica y se entrega en cuanto está
+listo, así que el fichero completo no llega a existir en memoria. En
+Parquet cada bloque es un row group.
+
+Si no llega ningún bloque se escribe `vacio` (un DataFrame sin filas con
+las columnas y tipos esperados): un CSV con solo la cabecera o un Parquet
+válido con el esquema, en lugar de un fichero de 0 bytes.
+
+Parquet necesita `pyarrow`, que es opcional: si no está instalado,
+`exportar` lanza ValueError y la app responde con un error claro.
+"""
+import zlib
+
+FORMATOS_EXPORTACION = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def parquet_disponible() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def bytes_csv(bloques, vacio=None):
+    """CSV UTF-8, cabecera solo en el primer bloque."""
+    cabecera = True
+    for bloque in bloques:
+        yield bloque.to_csv(index=False, header=cabecera).encode("utf-8")
+        cabecera = False
+    if cabecera and vacio is not None:
+        yield vacio.to_csv(index=False).encode("utf-8")
+
+
+class _Sumidero:
+    """Fichero en memoria que se vacía cada vez que se leen sus bytes."""
+
+    def __init__(self):
+        self._trozos = []
+        self._posicion = 0
+        self.closed = False
+
+    def write(self, datos):
+        self._trozos.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def vaciar(self) -> bytes:
+        datos = b"".join(self._trozos)
+        self._trozos = []
+        return datos
+
+
+def bytes_parquet(bloques, vacio=None):
+    """Parquet con un row group por bloque (requiere pyarrow)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sumidero = _Sumidero()
+    writer = None
+    for bloque in bloques:
+        tabla = pa.Table.from_pandas(bloque, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(sumidero, tabla.schema)
+        writer.write_table(tabla.cast(writer.schema))
+        datos = sumidero.vaciar()
+        if datos:
+            yield datos
+    if writer is None and vacio is not None:
+        tabla = pa.Table.from_pandas(vacio, preserve_index=False)
+        writer = pq.ParquetWriter(sumidero, tabla.schema)
+        writer.write_table(tabla)
+    if writer is not None:
+        writer.close()
+    yield sumidero.vaciar()
+
+
+def comprimir_gzip(trozos, nivel: int = 6):
+    """Comprime un flujo de bytes en formato gzip sobre la marcha."""
+    z = zlib.compressobj(nivel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for trozo in trozos:
+        comprimido = z.compress(trozo)
+        if comprimido:
+            yield comprimido
+    yield z.flush()
+
+
+def exportar(bloques, formato: str = "csv", gzip: bool = False, vacio=None):
+    """
+    Generador de bytes del fichero exportado. Valida el formato antes de
+    empezar, para poder responder con error en lugar de cortar la descarga.
+    """
+    if formato not in FORMATOS_EXPORTACION:
+        raise ValueError(f"Formato de exportación desconocido: {formato!r}")
+    if formato == "parquet" and not parquet_disponible():
+        raise ValueError("La exportación a Parquet necesita pyarrow (pip install pyarrow)")
+
+    trozos = bytes_csv(bloques, vacio) if formato == "csv" else bytes_parquet(bloques, vacio)
+    return comprimir_gzip(trozos) if gzip else trozos
+
+
+def nombre_fichero(base: str, formato: str, gzip: bool = False) -> str:
+    return f"{base}.{formato}" + (".gz" if gzip else "")
@@ -0,0 +1,84 @@
+"""
+Representación compacta de las tablas de la app y diagnóstico de
+memoria por estructura.
+
+Cada worker de gunicorn carga su propia copia de los datos, así que lo
+que ocupan se multiplica por el número de workers:
+
+- `compactar` guarda los textos repetidos (CCAA, provincia) como
+  categóricas (un código por fila + una tabla de valores) y las medidas
+  en float32. Los cálculos siguen haciéndose en float64: quien opera
+  con las columnas las convierte con `.to_numpy(dtype=float)`.
+- `tamano` estima los bytes de un objeto (DataFrame, array, bytes,
+  contenedores y objetos con atributos) y `informe` devuelve una tabla
+  con lo que ocupa cada estructura, para ver dónde está la memoria.
+- `rss_mb` lee la memoria residente de un proceso de /proc (Linux).
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+
+def compactar(df: pd.DataFrame, categoricas=(), flotantes=()) -> pd.DataFrame:
+    """Copia de `df` con `categoricas` como category y `flotantes` en float32."""
+    tipos = {c: "category" for c in categoricas}
+    tipos.update({c: np.float32 for c in flotantes})
+    return df.astype(tipos)
+
+
+def tamano(objeto, _vistos=None) -> int:
+    """Bytes aproximados de `objeto` y de todo lo que cuelga de él."""
+    vistos = set() if _vistos is None else _vistos
+    if id(objeto) in vistos:
+        return 0
+    vistos.add(id(objeto))
+
+    if isinstance(objeto, (pd.DataFrame, pd.Series)):
+        uso = objeto.memory_usage(deep=True)
+        return int(uso.sum() if isinstance(objeto, pd.DataFrame) else uso)
+    if isinstance(objeto, pd.Index):
+        return int(objeto.memory_usage(deep=True))
+    if isinstance(objeto, np.ndarray):
+        return int(objeto.nbytes)
+    if isinstance(objeto, (bytes, bytearray, str, int, float, bool, type(None))):
+        return sys.getsizeof(objeto)
+    total = sys.getsizeof(objeto)
+    if isinstance(objeto, dict):
+        total += sum(tamano(k, vistos) + tamano(v, vistos) for k, v in objeto.items())
+    elif isinstance(objeto, (list, tuple, set, frozenset)):
+        total += sum(tamano(v, vistos) for v in objeto)
+    elif hasattr(objeto, "__dict__"):
+        total += tamano(vars(objeto), vistos)
+    return total
+
+
+def informe(estructuras: dict) -> pd.DataFrame:
+    """Una fila por estructura (nombre -> objeto) con sus bytes y MB, de mayor a menor."""
+    filas = [{"estructura": nombre, "bytes": tamano(objeto)} for nombre, objeto in estructuras.items()]
+    tabla = pd.DataFrame(filas, columns=["estructura", "bytes"]).sort_values("bytes", ascending=False)
+    return tabla.assign(mb=tabla["bytes"] / 2**20).reset_index(drop=True)
+
+
+def rss_mb(pid="self") -> float:
+    """Memoria residente (VmRSS) del proceso en MB; NaN si no hay /proc."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def resumen_proceso(estructuras: dict) -> dict:
+    """PID, RSS del proceso y bytes de cada estructura (para servir como JSON)."""
+    tabla = informe(estructuras)
+    return {
+        "pid": os.getpid(),
+        "rss_mb": rss_mb(),
+        "estructuras_mb": round(float(tabla["mb"].sum()), 3),
+        "estructuras": tabla.round({"mb": 3}).to_dict(orient="records"),
+    }
@@ -0,0 +1,116 @@
+"""
+Piezas comunes para entrenar los modelos de precio (compra y alquiler).
+
+Los dos modelos comparten datos, variables y preprocesado; solo cambia
+la variable objetivo. Aquí viven esas definiciones para que el script de
+entrenamiento (`models/train_models.py`) y la app usen exactamente lo
+mismo.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import Ridge
+from sklearn.preprocessing import OneHotEncoder
+
+DATA_CSV = Path("data/housing_final.csv")
+MODELS_DIR = Path("models")
+
+NUMERIC_FEATURES = ["anio", "renta_mensual_neta", "tipo_interes_hipoteca"]
+CATEGORICAL_FEATURES = ["ccaa", "provincia"]
+FEATURES = NUMERIC_FEATURES + CATEGORICAL_FEATURES
+
+# nombre del modelo -> columna objetivo
+TARGETS = {
+    "compra": "precio_compra_m2",
+    "alquiler": "precio_alquiler_m2",
+}
+
+
+def cargar_datos(path: Path = DATA_CSV) -> pd.DataFrame:
+    """Dataset de entrenamiento (mismas columnas que usa la app)."""
+    df = pd.read_csv(path, sep=";")
+    return df.drop(columns=["renta_es_proyeccion", "renta_neta_anual"])
+
+
+def construir_preprocesador(denso: bool = False) -> ColumnTransformer:
+    """
+    Numéricas tal cual + one-hot de CCAA y provincia.
+    `denso=True` fuerza salida densa (la necesitan los árboles de sklearn).
+    """
+    return ColumnTransformer(
+        transformers=[
+            ("num", "passthrough", NUMERIC_FEATURES),
+            ("cat", OneHotEncoder(drop="first", handle_unknown="ignore"), CATEGORICAL_FEATURES),
+        ],
+        sparse_threshold=0.0 if denso else 0.3,
+    )
+
+
+def ruta_modelo(nombre: str, models_dir: Path = MODELS_DIR) -> Path:
+    return models_dir / f"model_{nombre}.pkl"
+
+
+# --------------------------------------------------
+# Estimadores propios (trabajan directamente sobre el DataFrame de FEATURES)
+# --------------------------------------------------
+
+class EfectosAleatoriosProvincia(BaseEstimator, RegressorMixin):
+    """
+    Regresión lineal en las variables numéricas + intercepto por provincia
+    "encogido" hacia 0, al estilo de un modelo de efectos aleatorios:
+
+        u_p = sum(residuos_p) / (n_p + lam)
+
+    Con lam grande se parece al modelo sin provincia; con lam = 0, a un
+    efecto fijo. Provincias no vistas en el ajuste reciben u_p = 0.
+    """
+
+    def __init__(self, lam: float = 5.0):
+        self.lam = lam
+
+    def fit(self, X, y):
+        X_num = np.column_stack([np.ones(len(X)), X[NUMERIC_FEATURES].to_numpy(dtype=float)])
+        y = np.asarray(y, dtype=float)
+        self.coef_, *_ = np.linalg.lstsq(X_num, y, rcond=None)
+
+        resid = pd.Series(y - X_num @ self.coef_, index=X["provincia"].to_numpy())
+        grupos = resid.groupby(level=0)
+        self.efectos_ = (grupos.sum() / (grupos.size() + self.lam)).to_dict()
+        return self
+
+    def predict(self, X):
+        X_num = np.column_stack([np.ones(len(X)), X[NUMERIC_FEATURES].to_numpy(dtype=float)])
+        u = X["provincia"].map(self.efectos_).fillna(0.0).to_numpy(dtype=float)
+        return X_num @ self.coef_ + u
+
+
+class TendenciaProvincia(BaseEstimator, RegressorMixin):
+    """
+    Modelo con componente temporal: Ridge sobre las numéricas, el one-hot
+    de provincia y una pendiente propia de cada provincia en el año
+    (one-hot × (anio - anio_ref)). Captura que unas provincias se
+    encarecen más deprisa que otras.
+    """
+
+    def __init__(self, alpha: float = 1.0):
+        self.alpha = alpha
+
+    def _disenar(self, X):
+        prov = pd.Categorical(X["provincia"], categories=self.provincias_)
+        dummies = np.zeros((len(X), len(self.provincias_)))
+        conocidas = prov.codes >= 0
+        dummies[np.flatnonzero(conocidas), prov.codes[conocidas]] = 1.0
+        t = X["anio"].to_numpy(dtype=float) - self.anio_ref_
+        return np.column_stack([X[NUMERIC_FEATURES].to_numpy(dtype=float), dummies, dummies * t[:, None]])
+
+    def fit(self, X, y):
+        self.provincias_ = np.sort(X["provincia"].unique())
+        self.anio_ref_ = float(X["anio"].mean())
+        self.ridge_ = Ridge(alpha=self.alpha).fit(self._disenar(X), y)
+        return self
+
+    def predict(self, X):
+        return self.ridge_.predict(self._disenar(X))
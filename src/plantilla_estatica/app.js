@@ -0,0 +1,325 @@
+// Dashboard estático (generado con `python -m src.estatico`).
+//
+// Lee los fragmentos JSON precalculados de datos/ y calcula en el
+// navegador los indicadores del hogar con las mismas fórmulas que
+// src/asequibilidad.py. No necesita servidor de aplicación.
+"use strict";
+
+const cache = new Map();
+let manifiesto = null;
+
+// --------------------------------------------------
+// Carga de fragmentos (gzip, descomprimidos aquí)
+// --------------------------------------------------
+
+async function leerJSON(respuesta, comprimido) {
+  const bytes = new Uint8Array(await respuesta.arrayBuffer());
+  // Si el servidor ya lo ha descomprimido (Content-Encoding: gzip), no empieza por 1f 8b
+  if (!comprimido || bytes[0] !== 0x1f || bytes[1] !== 0x8b) {
+    return JSON.parse(new TextDecoder().decode(bytes));
+  }
+  const flujo = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("gzip"));
+  return new Response(flujo).json();
+}
+
+function cargar(ruta) {
+  if (!cache.has(ruta)) {
+    cache.set(ruta, fetch(`${ruta}?v=${manifiesto.version}`).then((r) => {
+      if (!r.ok) throw new Error(`${ruta}: HTTP ${r.status}`);
+      return leerJSON(r, ruta.endsWith(".gz"));
+    }));
+  }
+  return cache.get(ruta);
+}
+
+// --------------------------------------------------
+// Asequibilidad (src/asequibilidad.py)
+// --------------------------------------------------
+
+function factorAnualidad(interesAnual, plazoAnios) {
+  const r = interesAnual / 100 / 12;
+  const n = plazoAnios * 12;
+  return r === 0 ? 1 / n : (r * (1 + r) ** n) / ((1 + r) ** n - 1);
+}
+
+function interesMaximo(principal, cuotaMax, plazoAnios, iteraciones = 60) {
+  const n = plazoAnios * 12;
+  const objetivo = cuotaMax / principal;
+  let bajo = 0;
+  let alto = Number.isFinite(objetivo) ? Math.max(objetivo, 0) : 0;
+  for (let i = 0; i < iteraciones; i++) {
+    const medio = (bajo + alto) / 2;
+    const a = medio === 0 ? 1 / n : medio / (1 - (1 + medio) ** -n);
+    if (a <= objetivo) bajo = medio;
+    else alto = medio;
+  }
+  return objetivo >= 1 / n ? bajo * 12 * 100 : NaN;
+}
+
+function indicadores(precioCompraM2, precioAlquilerM2, p) {
+  const entrada = manifiesto.constantes.pct_entrada;
+  const ingresos = p.renta * p.n_salarios;
+  const ahorroAnual = ingresos * 12 * (p.ahorro / 100);
+  const precioVivienda = precioCompraM2 * p.tamano;
+  const alquiler = precioAlquilerM2 * p.tamano;
+  const anualidad = factorAnualidad(p.interes, p.plazo);
+  const cuota = precioVivienda * (1 - entrada) * anualidad;
+  const cuotaMax = (p.renta * p.n_salarios * p.objetivo) / 100;
+  return {
+    precio_vivienda: precioVivienda,
+    alquiler_mensual: alquiler,
+    cuota: cuota,
+    esfuerzo_alquiler_pct: (alquiler / ingresos) * 100,
+    anios_ahorrar_entrada: (precioVivienda * entrada) / ahorroAnual,
+    esfuerzo_cuota_pct: (cuota / ingresos) * 100,
+    renta_minima_cuota: (cuota / (p.objetivo / 100)) / p.n_salarios,
+    m2_maximos_cuota: cuotaMax / (precioCompraM2 * (1 - entrada) * anualidad),
+    interes_maximo_cuota: interesMaximo(precioVivienda * (1 - entrada), cuotaMax, p.plazo),
+  };
+}
+
+// --------------------------------------------------
+// Modelos: pred = constante + coef · x, intervalo con Q
+// (ModeloLineal.forma_lineal en src/artefacto.py)
+// --------------------------------------------------
+
+function predecir(modelo, provincia, valores) {
+  const forma = modelo.provincias[provincia];
+  if (!forma) return null;
+  const x = [1, ...modelo.numericas.map((c) => valores[c])];
+  let pred = forma.constante;
+  forma.coef.forEach((c, k) => { pred += c * x[k + 1]; });
+  if (!forma.Q) return { pred };
+  let apalancamiento = 0;
+  forma.Q.forEach((fila, i) => fila.forEach((q, j) => { apalancamiento += x[i] * q * x[j]; }));
+  const delta = modelo.critico * Math.sqrt(modelo.sigma2 * (1 + apalancamiento));
+  return { pred, inferior: pred - delta, superior: pred + delta, nivel: modelo.nivel };
+}
+
+// --------------------------------------------------
+// Controles
+// --------------------------------------------------
+
+const fmt = (v, d = 0) => (Number.isFinite(v)
+  ? v.toLocaleString("es-ES", { minimumFractionDigits: d, maximumFractionDigits: d })
+  : "—");
+
+function parametros() {
+  const p = {};
+  for (const c of manifiesto.controles) p[c.clave] = Number(document.getElementById(c.clave).value);
+  p.ccaa = document.getElementById("ccaa").value;
+  p.provincia = document.getElementById("provincia").value;
+  p.variable = document.getElementById("variable").value;
+  p.resolucion = document.querySelector("input[name=resolucion]:checked").value;
+  return p;
+}
+
+function opciones(select, valores, etiquetas = valores) {
+  select.innerHTML = "";
+  valores.forEach((v, i) => select.add(new Option(etiquetas[i], v)));
+}
+
+function construirControles() {
+  const contenedor = document.getElementById("controles");
+  for (const c of manifiesto.controles) {
+    const div = document.createElement("div");
+    div.className = "control";
+    div.innerHTML = `<label for="${c.clave}">${c.etiqueta}</label>
+      <input type="range" id="${c.clave}" min="${c.min}" max="${c.max}" step="${c.step}" value="${c.value}">
+      <span class="valor" id="${c.clave}-valor"></span>`;
+    contenedor.appendChild(div);
+    const entrada = div.querySelector("input");
+    const etiqueta = div.querySelector(".valor");
+    const mostrar = () => { etiqueta.textContent = entrada.value; };
+    entrada.addEventListener("input", () => { mostrar(); programar(); });
+    mostrar();
+  }
+
+  const ccaa = document.getElementById("ccaa");
+  opciones(ccaa, Object.keys(manifiesto.ccaa));
+  ccaa.addEventListener("change", () => { actualizarProvincias(); programar(); });
+  actualizarProvincias();
+  document.getElementById("provincia").addEventListener("change", programar);
+
+  const variables = Object.keys(manifiesto.variables);
+  opciones(document.getElementById("variable"), variables, variables.map((v) => manifiesto.variables[v][0]));
+  document.getElementById("variable").value = variables.includes("esfuerzo_cuota_pct") ? "esfuerzo_cuota_pct" : variables[0];
+  document.getElementById("variable").addEventListener("change", programar);
+
+  document.querySelectorAll("input[name=resolucion]").forEach((r) => {
+    r.disabled = !manifiesto.resoluciones.includes(r.value);
+    r.addEventListener("change", programar);
+  });
+
+  document.querySelectorAll(".pestanas button").forEach((b) => b.addEventListener("click", () => {
+    document.querySelectorAll(".pestanas button, .pestana").forEach((e) => e.classList.remove("activa"));
+    b.classList.add("activa");
+    document.getElementById(`pestana-${b.dataset.pestana}`).classList.add("activa");
+    window.dispatchEvent(new Event("resize"));  // Plotly recalcula el tamaño al hacerse visible
+  }));
+}
+
+function actualizarProvincias() {
+  opciones(document.getElementById("provincia"), manifiesto.ccaa[document.getElementById("ccaa").value]);
+}
+
+// Un solo repintado por frame aunque se muevan varios controles
+let pendiente = false;
+function programar() {
+  if (pendiente) return;
+  pendiente = true;
+  requestAnimationFrame(() => { pendiente = false; actualizar().catch(mostrarError); });
+}
+
+function mostrarError(e) {
+  document.getElementById("aviso").textContent = `Error: ${e.message}`;
+  console.error(e);
+}
+
+// --------------------------------------------------
+// Vistas
+// --------------------------------------------------
+
+async function actualizarPredicciones(p, fila) {
+  const div = document.getElementById("predicciones");
+  if (!manifiesto.modelos) {
+    div.innerHTML = "<p>Predicciones solo disponibles en la app completa.</p>";
+    return;
+  }
+  const modelos = await cargar("datos/modelos.json.gz");
+  const valores = { anio: p.anio, renta_mensual_neta: p.renta, tipo_interes_hipoteca: p.interes };
+  const compra = predecir(modelos.compra, p.provincia, valores);
+  const alquiler = predecir(modelos.alquiler, p.provincia, valores);
+  if (!compra || !alquiler) {
+    div.innerHTML = "<p>Sin modelo para esta provincia.</p>";
+    return;
+  }
+  const intervalo = (r, d) => (r.nivel
+    ? ` (intervalo ${Math.round(r.nivel * 100)}%: ${fmt(Math.max(r.inferior, 0), d)} – ${fmt(r.superior, d)})`
+    : "");
+  const ind = indicadores(compra.pred, alquiler.pred, p);
+  const principal = ind.precio_vivienda * (1 - manifiesto.constantes.pct_entrada);
+  const intereses = ind.cuota * Math.round(p.plazo * 12) - principal;
+  div.innerHTML = `
+    <p>Precio de compra estimado: ${fmt(compra.pred)} €/m²${intervalo(compra, 0)}</p>
+    <p>Precio de alquiler estimado: ${fmt(alquiler.pred, 2)} €/m²${intervalo(alquiler, 2)}</p>
+    <hr>
+    <p class="card-subtitle">Para una vivienda de ${fmt(p.tamano)} m² y un hogar con ${fmt(p.n_salarios, 1)} salarios:</p>
+    <ul>
+      <li>Alquiler aproximado: ${fmt(ind.alquiler_mensual)} € / mes</li>
+      <li>Años necesarios para ahorrar la entrada (20%): ${fmt(ind.anios_ahorrar_entrada, 1)} años</li>
+      <li>Cuota hipotecaria estimada (${fmt(p.plazo)} años, ${fmt(p.interes, 2)}%): ${fmt(ind.cuota)} € / mes</li>
+      <li>Intereses totales de la hipoteca: ${fmt(intereses)} € (coste total ${fmt(ind.precio_vivienda + intereses)} €)</li>
+    </ul>
+    ${fila ? `<small>Precio observado en ${fila.anio}: ${fmt(fila.compra)} €/m² (compra), ${fmt(fila.alquiler, 2)} €/m² (alquiler).</small>` : ""}`;
+}
+
+async function actualizarEvolucion(p) {
+  const cod = manifiesto.cod_ine[p.provincia];
+  const cuerpo = await cargar(`datos/evolucion/${cod}.json.gz`);
+  const series = cuerpo.series[p.resolucion] || cuerpo.series.anual;
+  const pasos = p.horizonte * (manifiesto.constantes.periodos_por_anio[p.resolucion] || 1);
+  const nivel = Math.round(manifiesto.constantes.nivel_bandas * 100);
+  const graficos = [
+    ["evolucion-compra", "precio_compra_m2", "Precio de compra (€/m²)"],
+    ["evolucion-alquiler", "precio_alquiler_m2", "Precio de alquiler (€/m²/mes)"],
+  ];
+  for (const [id, variable, titulo] of graficos) {
+    const s = series[variable];
+    if (!s) {
+      // la provincia no tiene serie de esta variable: gráfico vacío
+      Plotly.react(id, [], { title: { text: `${titulo} – ${cuerpo.provincia}: sin datos` } },
+        { displayModeBar: false, responsive: true });
+      continue;
+    }
+    const trazas = [{ x: s.x_hist, y: s.y_hist, mode: "lines+markers", name: "Histórico" }];
+    if (pasos > 0) {
+      const x = s.x_pred.slice(0, pasos);
+      trazas.push(
+        { x, y: s.superior.slice(0, pasos), mode: "lines", line: { width: 0 }, hoverinfo: "skip", showlegend: false },
+        { x, y: s.inferior.slice(0, pasos), mode: "lines", line: { width: 0 }, fill: "tonexty",
+          fillcolor: "rgba(99, 110, 250, 0.18)", name: `Banda ${nivel}%` },
+        { x, y: s.y_pred.slice(0, pasos), mode: "lines+markers", line: { dash: "dash" }, name: "Predicción" },
+      );
+    }
+    Plotly.react(id, trazas, {
+      title: { text: `${titulo} – ${cuerpo.provincia}` },
+      margin: { l: 40, r: 10, t: 60, b: 40 },
+      hovermode: "x unified",
+      legend: { orientation: "h", y: -0.2 },
+    }, { displayModeBar: false, responsive: true });
+  }
+}
+
+function escala(mayorEsMejor) {
+  const colores = manifiesto.escala_color;
+  const orden = mayorEsMejor ? colores : [...colores].reverse();
+  return orden.map((c, i) => [i / (orden.length - 1), c]);
+}
+
+async function actualizarMapaYRanking(p, tabla) {
+  const [etiqueta, rango, mayorEsMejor] = manifiesto.variables[p.variable];
+  const valores = tabla.precio_compra_m2.map((pc, i) => indicadores(pc, tabla.precio_alquiler_m2[i], p)[p.variable]);
+
+  const geojson = await cargar("datos/provincias.geojson.gz");
+  Plotly.react("mapa", [{
+    type: "choropleth",
+    geojson,
+    featureidkey: "properties.Texto",
+    locations: tabla.geo,
+    z: valores,
+    text: tabla.provincia,
+    zmin: rango[0],
+    zmax: rango[1],
+    colorscale: escala(mayorEsMejor),
+    colorbar: { title: { text: etiqueta } },
+  }], {
+    geo: { fitbounds: "locations", visible: false },
+    margin: { l: 0, r: 0, t: 0, b: 0 },
+    height: 500,
+  }, { responsive: true });
+
+  const filas = tabla.provincia
+    .map((provincia, i) => ({ provincia, valor: valores[i], ccaa: tabla.ccaa[i] }))
+    .filter((f) => f.ccaa === p.ccaa)
+    .sort((a, b) => {
+      if (!Number.isFinite(a.valor)) return 1;
+      if (!Number.isFinite(b.valor)) return -1;
+      return mayorEsMejor ? a.valor - b.valor : b.valor - a.valor;
+    });
+  Plotly.react("ranking", [{ type: "bar", x: filas.map((f) => f.provincia), y: filas.map((f) => f.valor) }], {
+    title: { text: `${etiqueta} por provincia en ${p.ccaa} – ${tabla.anio}` },
+    xaxis: { tickangle: -45, title: { text: "Provincia" } },
+    yaxis: { title: { text: etiqueta } },
+    height: 500,
+    margin: { l: 40, r: 20, t: 60, b: 80 },
+  }, { responsive: true });
+}
+
+async function actualizar() {
+  const p = parametros();
+  const anio = manifiesto.anios.includes(p.anio) ? p.anio : manifiesto.anios[manifiesto.anios.length - 1];
+  const tabla = await cargar(`datos/anios/${anio}.json.gz`);
+  const i = tabla.provincia.indexOf(p.provincia);
+  const fila = i >= 0
+    ? { anio, compra: tabla.precio_compra_m2[i], alquiler: tabla.precio_alquiler_m2[i] }
+    : null;
+  await Promise.all([
+    actualizarPredicciones(p, fila),
+    actualizarEvolucion(p),
+    actualizarMapaYRanking(p, tabla),
+  ]);
+}
+
+async function iniciar() {
+  const r = await fetch("datos/manifiesto.json", { cache: "no-cache" });
+  manifiesto = await r.json();
+  const enlace = manifiesto.url_app
+    ? ` · <a href="${manifiesto.url_app}">App completa</a> (sensibilidad, alquilar o comprar, descargas)`
+    : "";
+  document.getElementById("aviso").innerHTML = `Versión estática de los datos ${manifiesto.version} (${manifiesto.generado})${enlace}`;
+  construirControles();
+  await actualizar();
+}
+
+iniciar().catch(mostrarError);
@@ -0,0 +1,395 @@
+"""
+Registro versionado de artefactos (datos y modelos) con recarga en
+caliente.
+
+Cada componente (p. ej. "datos" o "modelos") tiene unos ficheros de
+origen y una función que construye, a partir de ellos, todo lo que la
+app necesita en memoria. La versión de un componente es una huella del
+contenido de sus ficheros: no cambia con un despliegue nuevo si los
+ficheros son los mismos.
+
+- `RegistroArtefactos.actual()` devuelve la instantánea publicada: un
+  conjunto inmutable de objetos, uno por componente. Un callback la lee
+  una vez al empezar y trabaja con ella hasta el final, así que termina
+  con la versión con la que empezó aunque mientras tanto se publique
+  otra.
+- `comprobar()` mira si han cambiado los ficheros; si es así, construye
+  solo los componentes afectados (el resto se reutiliza tal cual, con
+  sus cachés) y publica la nueva instantánea con una única asignación.
+- `iniciar(intervalo)` lanza un hilo que llama a `comprobar()`
+  periódicamente: la construcción ocurre en segundo plano y los
+  callbacks siguen atendiéndose con la versión anterior.
+- `suscribir(funcion)` registra funciones que se llaman con cada
+  instantánea recién publicada (p. ej. para precalcular respuestas).
+- `cache_versionada` memoiza funciones cuyo primer argumento es un
+  objeto de un componente (con atributo `version`); al publicar una
+  versión nueva se descartan las entradas de versiones que ya no están
+  en uso. Cuentan cuántas veces se pide cada entrada, y
+  `guardar_caches`/`cargar_caches` vuelcan a disco las más pedidas y
+  las recuperan al arrancar (solo las de las versiones vigentes y del
+  mismo código: un volcado hecho con otro código se descarta entero).
+"""
+import atexit
+import functools
+import hashlib
+import os
+import pickle
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin gunicorn, un solo proceso vuelca
+    fcntl = None
+
+_CACHES = []
+_VIGENTES = None  # versiones publicadas tras la última poda (None: aún no se ha podado)
+_HUELLAS = {}  # ruta -> (tamaño, fecha de modificación, huella del contenido); solo la última
+
+
+def huella_contenido(ruta: Path, st) -> str:
+    """sha1 del contenido; solo se vuelve a leer si cambian tamaño o fecha."""
+    firma = (st.st_size, st.st_mtime_ns)
+    guardada = _HUELLAS.get(str(ruta))
+    if guardada is None or guardada[:2] != firma:
+        guardada = _HUELLAS[str(ruta)] = (*firma, hashlib.sha1(ruta.read_bytes()).hexdigest())
+    return guardada[2]
+
+
+def version_ficheros(rutas) -> str:
+    """Huella corta de (ruta, contenido) de los ficheros."""
+    h = hashlib.sha1()
+    for ruta in rutas:
+        ruta = Path(ruta)
+        try:
+            h.update(f"{ruta}:{huella_contenido(ruta, ruta.stat())};".encode())
+        except FileNotFoundError:
+            h.update(f"{ruta}:-;".encode())
+    return h.hexdigest()[:12]
+
+
+class Componente:
+    """Ficheros de origen y función `construir(version) -> objeto`."""
+
+    def __init__(self, nombre, rutas, construir):
+        self.nombre = nombre
+        self.rutas = [Path(r) for r in rutas]
+        self.construir = construir
+
+    def version(self) -> str:
+        return version_ficheros(self.rutas)
+
+
+class Instantanea:
+    """Objetos de una versión de todos los componentes (no se modifica)."""
+
+    def __init__(self, objetos: dict, versiones: dict):
+        self._objetos = dict(objetos)
+        self.versiones = dict(versiones)
+        self.version = "-".join(self.versiones[n] for n in sorted(self.versiones))
+        self.creada = time.time()
+
+    def __getitem__(self, nombre):
+        return self._objetos[nombre]
+
+
+class RegistroArtefactos:
+    def __init__(self, componentes):
+        self._componentes = {c.nombre: c for c in componentes}
+        self._construyendo = threading.Lock()
+        self._hilo = None
+        self._suscriptores = []
+        versiones = self.versiones_en_disco()
+        self._actual = self._construir(versiones, anterior=None)
+
+    def actual(self) -> Instantanea:
+        return self._actual
+
+    def versiones_vigentes(self) -> set:
+        """Versiones de los componentes publicados (las que valen en las cachés)."""
+        return set(self._actual.versiones.values())
+
+    def versiones_en_disco(self) -> dict:
+        return {n: c.version() for n, c in self._componentes.items()}
+
+    def _construir(self, versiones, anterior):
+        objetos = {}
+        for nombre, componente in self._componentes.items():
+            if anterior is not None and anterior.versiones[nombre] == versiones[nombre]:
+                objetos[nombre] = anterior[nombre]
+            else:
+                objetos[nombre] = componente.construir(versiones[nombre])
+        return Instantanea(objetos, versiones)
+
+    def comprobar(self) -> bool:
+        """
+        Construye y publica una versión nueva si han cambiado los ficheros.
+        Devuelve True si se ha publicado. Si ya hay otra construcción en
+        marcha no hace nada.
+        """
+        if not self._construyendo.acquire(blocking=False):
+            return False
+        try:
+            versiones = self.versiones_en_disco()
+            anterior = self._actual
+            if versiones == anterior.versiones:
+                return False
+            nueva = self._construir(versiones, anterior)
+            self._actual = nueva  # publicación atómica: una sola asignación
+            podar_caches(self.versiones_vigentes())
+            cambios = [n for n in versiones if versiones[n] != anterior.versiones[n]]
+            print(f"Registro: publicada la versión {nueva.version} (cambios en {', '.join(cambios)})")
+            for funcion in self._suscriptores:
+                try:
+                    funcion(nueva)
+                except Exception:
+                    print(f"Registro: error en el suscriptor {getattr(funcion, '__name__', funcion)}")
+                    traceback.print_exc()
+            return True
+        finally:
+            self._construyendo.release()
+
+    def suscribir(self, funcion):
+        """Llama a `funcion(instantanea)` cada vez que se publique una versión."""
+        self._suscriptores.append(funcion)
+        return funcion
+
+    def iniciar(self, intervalo: float):
+        """Comprueba los ficheros cada `intervalo` segundos en un hilo aparte."""
+        if self._hilo is not None:
+            return
+
+        def bucle():
+            while True:
+                time.sleep(intervalo)
+                try:
+                    self.comprobar()
+                except Exception:
+                    # ficheros a medio escribir, etc.: se sigue con la versión
+                    # publicada y se reintenta en la siguiente comprobación
+                    print("Registro: no se ha podido construir la nueva versión")
+                    traceback.print_exc()
+
+        self._hilo = threading.Thread(target=bucle, name="registro-artefactos", daemon=True)
+        self._hilo.start()
+
+    def iniciar_volcado(self, ruta, codigo: str, intervalo: float, max_mb: float):
+        """
+        Vuelca las cachés a `ruta` cada `intervalo` segundos en un hilo
+        aparte y una última vez al salir el proceso.
+        """
+        def volcar():
+            try:
+                guardar_caches(ruta, codigo, self.versiones_vigentes(), max_mb)
+            except Exception:
+                print(f"Registro: no se han podido volcar las cachés a {ruta}")
+                traceback.print_exc()
+
+        def bucle():
+            while True:
+                time.sleep(intervalo)
+                volcar()
+
+        threading.Thread(target=bucle, name="volcado-caches", daemon=True).start()
+        atexit.register(volcar)
+
+
+# --------------------------------------------------
+# Cachés por versión
+# --------------------------------------------------
+
+def cache_versionada(maxsize: int = 128):
+    """
+    Como functools.lru_cache, pero la clave incluye la versión del primer
+    argumento (`objeto.version`) en lugar del objeto, y las entradas de
+    versiones que dejan de estar publicadas se descartan al publicar.
+    Lo que termine de calcular después un callback que empezó con la
+    versión anterior no se guarda.
+
+    `usos` cuenta las veces que se ha pedido cada entrada (para volcar a
+    disco las más pedidas) y `aciertos`/`fallos` las del proceso.
+    """
+    def decorador(funcion):
+        entradas = OrderedDict()
+        usos = {}
+        cerrojo = threading.Lock()
+
+        @functools.wraps(funcion)
+        def envoltura(objeto, *args, **kwargs):
+            clave = (objeto.version, args, tuple(sorted(kwargs.items())))
+            with cerrojo:
+                if clave in entradas:
+                    entradas.move_to_end(clave)
+                    usos[clave] += 1
+                    envoltura.aciertos += 1
+                    return entradas[clave]
+                envoltura.fallos += 1
+            valor = funcion(objeto, *args, **kwargs)
+            with cerrojo:
+                guardar(clave, valor, usos.get(clave, 0) + 1)
+            return valor
+
+        def guardar(clave, valor, n_usos):
+            if _VIGENTES is not None and clave[0] not in _VIGENTES:
+                return
+            entradas[clave] = valor
+            usos[clave] = n_usos
+            while len(entradas) > maxsize:
+                usos.pop(entradas.popitem(last=False)[0], None)
+
+        def restaurar(pares):
+            """Añade entradas (clave, valor, usos) sin pisar las que ya hay."""
+            with cerrojo:
+                for clave, valor, n_usos in pares:
+                    if clave not in entradas:
+                        guardar(clave, valor, n_usos)
+
+        def copia():
+            with cerrojo:
+                return [(clave, valor, usos[clave]) for clave, valor in entradas.items()]
+
+        def podar(versiones_vigentes):
+            with cerrojo:
+                for clave in [c for c in entradas if c[0] not in versiones_vigentes]:
+                    del entradas[clave]
+                    usos.pop(clave, None)
+
+        envoltura.podar = podar
+        envoltura.restaurar = restaurar
+        envoltura.copia = copia
+        envoltura.entradas = entradas
+        envoltura.aciertos = envoltura.fallos = 0
+        _CACHES.append(envoltura)
+        return envoltura
+
+    return decorador
+
+
+def podar_caches(versiones_vigentes):
+    # Primero las vigentes (las lee guardar) y después la poda: una entrada
+    # vieja o se guarda antes de podar su caché o ya no se guarda
+    global _VIGENTES
+    _VIGENTES = frozenset(versiones_vigentes)
+    for cache in _CACHES:
+        cache.podar(versiones_vigentes)
+
+
+def estadisticas_caches() -> dict:
+    """Entradas, aciertos, fallos y tasa de acierto de cada caché en este proceso."""
+    return {
+        cache.__qualname__: {
+            "entradas": len(cache.entradas),
+            "aciertos": cache.aciertos,
+            "fallos": cache.fallos,
+            "tasa_acierto": round(cache.aciertos / max(cache.aciertos + cache.fallos, 1), 4),
+        }
+        for cache in _CACHES
+    }
+
+
+# --------------------------------------------------
+# Cachés en disco (arranque en caliente)
+# --------------------------------------------------
+FORMATO_VOLCADO = 1
+
+
+def leer_volcado(ruta, codigo, versiones_vigentes) -> dict:
+    """
+    {(caché, clave): (usos, valor serializado)} de las versiones vigentes
+    en `ruta`; vacío si el volcado es de otro código (`codigo`).
+    """
+    try:
+        with open(ruta, "rb") as f:
+            volcado = pickle.load(f)
+    except FileNotFoundError:
+        return {}
+    if volcado.get("formato") != FORMATO_VOLCADO or volcado.get("codigo") != codigo:
+        return {}
+    return {
+        (nombre, clave): (n_usos, valor)
+        for nombre, clave, n_usos, valor in volcado["entradas"]
+        if clave[0] in versiones_vigentes
+    }
+
+
+@contextmanager
+def _cerrojo_volcado(ruta: Path):
+    """Cerrojo entre procesos (flock sobre `<ruta>.lock`) para leer, combinar y escribir el volcado."""
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    with open(ruta.with_name(ruta.name + ".lock"), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def guardar_caches(ruta, codigo, versiones_vigentes, max_mb: float = 64) -> int:
+    """
+    Escribe en `ruta` las entradas más pedidas de las cachés (solo de las
+    versiones vigentes) hasta `max_mb`. Se combina con lo que ya hubiera
+    en el fichero (otros workers vuelcan al mismo), quedándose con el
+    mayor número de usos de cada entrada; la lectura, la combinación y la
+    escritura van bajo un cerrojo de fichero, para que dos workers que
+    vuelcan a la vez no se pisen. El volcado lleva `codigo` (la
+    versión del código de la app) y solo se recupera con el mismo.
+    Devuelve las entradas escritas.
+    """
+    ruta = Path(ruta)
+    with _cerrojo_volcado(ruta):
+        candidatas = leer_volcado(ruta, codigo, versiones_vigentes)
+        for cache in _CACHES:
+            for clave, valor, n_usos in cache.copia():
+                if clave[0] not in versiones_vigentes:
+                    continue
+                anterior = candidatas.get((cache.__qualname__, clave))
+                if anterior is None:
+                    try:
+                        valor = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+                    except Exception:
+                        continue
+                    candidatas[(cache.__qualname__, clave)] = (n_usos, valor)
+                elif n_usos > anterior[0]:
+                    candidatas[(cache.__qualname__, clave)] = (n_usos, anterior[1])
+
+        entradas, total = [], 0
+        for (nombre, clave), (n_usos, valor) in sorted(candidatas.items(), key=lambda e: -e[1][0]):
+            if total + len(valor) > max_mb * 2**20:
+                continue
+            entradas.append((nombre, clave, n_usos, valor))
+            total += len(valor)
+
+        # escritura atómica: los workers que arrancan nunca ven un fichero a medias
+        temporal = ruta.with_name(f"{ruta.name}.{os.getpid()}.tmp")
+        with open(temporal, "wb") as f:
+            pickle.dump(
+                {"formato": FORMATO_VOLCADO, "codigo": codigo, "entradas": entradas},
+                f, protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(temporal, ruta)
+    return len(entradas)
+
+
+def cargar_caches(ruta, codigo, versiones_vigentes) -> int:
+    """
+    Rellena las cachés con las entradas de `ruta` de las versiones
+    vigentes (las de otras versiones se descartan). Devuelve cuántas.
+    """
+    por_cache = {cache.__qualname__: cache for cache in _CACHES}
+    pares = {}
+    for (nombre, clave), (n_usos, valor) in leer_volcado(ruta, codigo, versiones_vigentes).items():
+        if nombre in por_cache:
+            pares.setdefault(nombre, []).append((n_usos, clave, valor))
+    n = 0
+    for nombre, lista in pares.items():
+        # de menos a más usada: las más pedidas quedan al final del LRU
+        lista.sort(key=lambda e: e[0])
+        por_cache[nombre].restaurar((clave, pickle.loads(valor), n_usos) for n_usos, clave, valor in lista)
+        n += len(lista)
+    return n
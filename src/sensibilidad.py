@@ -0,0 +1,86 @@
+"""
+Análisis de sensibilidad de los indicadores de asequibilidad.
+
+Para una provincia (unos precios por m²) y un hogar base, se construyen
+todos los escenarios perturbados de una vez y se evalúan con una única
+llamada vectorizada a `indicadores`:
+
+- Tornado: cada parámetro se mueve ±`variacion` (relativa) dejando los
+  demás fijos; diferencias finitas centradas → rango y elasticidad de
+  cada indicador respecto a cada parámetro.
+- Mapa de calor: rejilla sobre dos parámetros (el resto en el valor
+  base), por broadcasting.
+"""
+import numpy as np
+import pandas as pd
+
+from src.asequibilidad import PCT_ENTRADA, indicadores
+from src.escenarios import PARAMETROS
+
+SALIDAS_SENSIBILIDAD = ("esfuerzo_cuota_pct", "anios_ahorrar_entrada")
+VARIACION = 0.10  # ±10% sobre el valor base
+PUNTOS_REJILLA = 25
+
+
+def tornado(precio_compra_m2, precio_alquiler_m2, base: dict, variacion=VARIACION,
+            salidas=SALIDAS_SENSIBILIDAD, pct_entrada=PCT_ENTRADA) -> pd.DataFrame:
+    """
+    Una fila por (salida, parámetro) con el valor del indicador en el
+    escenario base, con el parámetro bajado y subido, el rango y la
+    elasticidad (% de cambio del indicador por % de cambio del
+    parámetro). Ordenado de mayor a menor rango dentro de cada salida.
+
+    El lote tiene 1 + 2·len(PARAMETROS) escenarios: fila 0 la base, y
+    para el parámetro i, fila 1+2i (−) y 2+2i (+).
+    """
+    n = len(PARAMETROS)
+    lote = np.tile(np.array([base[p] for p in PARAMETROS], dtype=float), (1 + 2 * n, 1))
+    for i in range(n):
+        lote[1 + 2 * i, i] *= 1 - variacion
+        lote[2 + 2 * i, i] *= 1 + variacion
+
+    res = indicadores(
+        precio_compra_m2, precio_alquiler_m2,
+        **{p: lote[:, i] for i, p in enumerate(PARAMETROS)}, pct_entrada=pct_entrada,
+    )
+
+    filas = []
+    for salida in salidas:
+        valores = np.broadcast_to(res[salida], (1 + 2 * n,))
+        bajo, alto = valores[1::2], valores[2::2]
+        # Con indicadores infinitos (p. ej. sin ahorro) rango y elasticidad quedan NaN
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rango = np.abs(alto - bajo)
+            elasticidad = (alto - bajo) / (2 * variacion) / valores[0]
+        filas.append(pd.DataFrame({
+            "salida": salida,
+            "parametro": PARAMETROS,
+            "valor_bajo": lote[1::2].diagonal(),
+            "valor_alto": lote[2::2].diagonal(),
+            "base": valores[0],
+            "bajo": bajo,
+            "alto": alto,
+            "rango": rango,
+            "elasticidad": elasticidad,
+        }).sort_values("rango", ascending=False))
+    return pd.concat(filas, ignore_index=True)
+
+
+def rejilla(parametro, base: dict, variacion=0.5, puntos=PUNTOS_REJILLA) -> np.ndarray:
+    """Valores del parámetro entre base·(1 − variacion) y base·(1 + variacion)."""
+    return np.linspace(base[parametro] * (1 - variacion), base[parametro] * (1 + variacion), puntos)
+
+
+def mapa_calor(precio_compra_m2, precio_alquiler_m2, base: dict, parametro_x, valores_x,
+               parametro_y, valores_y, salida="esfuerzo_cuota_pct", pct_entrada=PCT_ENTRADA) -> np.ndarray:
+    """
+    Indicador `salida` sobre la rejilla valores_y × valores_x (filas y,
+    columnas x), con el resto de parámetros en su valor base.
+    """
+    if parametro_x == parametro_y:
+        raise ValueError("Los dos parámetros del mapa de calor deben ser distintos")
+    entradas = {p: np.asarray(base[p], dtype=float) for p in PARAMETROS}
+    entradas[parametro_x] = np.asarray(valores_x, dtype=float)[None, :]
+    entradas[parametro_y] = np.asarray(valores_y, dtype=float)[:, None]
+    res = indicadores(precio_compra_m2, precio_alquiler_m2, **entradas, pct_entrada=pct_entrada)
+    return np.broadcast_to(res[salida], (len(valores_y), len(valores_x)))
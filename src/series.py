@@ -0,0 +1,302 @@
+"""
+Almacén compacto de series temporales mensuales por provincia.
+
+Guarda las observaciones mensuales de Idealista (compra y alquiler) y del
+INE (tipo de interés hipotecario) como matrices float32 provincia × mes,
+con un índice de fechas contiguo (`datetime64[M]`). Cada provincia es una
+fila contigua, así que sacar su serie es un simple slice.
+
+Las agregaciones anual y trimestral se precalculan al construir el
+almacén y se guardan junto a la serie mensual en un único `.npz`.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SERIES_NPZ = Path("data/series_mensuales.npz")
+
+VARIABLES = ("precio_compra_m2", "precio_alquiler_m2")
+
+# resolución -> meses por periodo
+RESOLUCIONES = {"mensual": 1, "trimestral": 3, "anual": 12}
+
+
+def _bloques(fechas: np.ndarray, meses: int):
+    """
+    Relleno necesario para alinear `fechas` con bloques de calendario de
+    `meses` meses (enero, abril, julio...) y fechas de inicio de bloque.
+    """
+    pre = (fechas[0].astype(int) % 12) % meses
+    post = (-(pre + len(fechas))) % meses
+    n_bloques = (pre + len(fechas) + post) // meses
+    inicio = fechas[0] - np.timedelta64(pre, "M")
+    return pre, post, inicio + np.arange(n_bloques) * np.timedelta64(meses, "M")
+
+
+def _agregar(valores: np.ndarray, fechas: np.ndarray, meses: int) -> np.ndarray:
+    """Media por bloques de `meses` meses sobre el último eje (ignora NaN)."""
+    if meses == 1:
+        return valores
+
+    pre, post, _ = _bloques(fechas, meses)
+    ancho = [(0, 0)] * (valores.ndim - 1) + [(pre, post)]
+    relleno = np.pad(valores.astype(float), ancho, constant_values=np.nan)
+    bloques = relleno.reshape(valores.shape[:-1] + (-1, meses))
+
+    n = (~np.isnan(bloques)).sum(axis=-1)
+    suma = np.nansum(bloques, axis=-1)
+    medias = np.where(n > 0, suma / np.maximum(n, 1), np.nan)
+    return medias.astype(np.float32)
+
+
+class AlmacenSeries:
+    """
+    Series mensuales por provincia con agregaciones precalculadas.
+
+    - `cod_ine`: códigos de provincia (una fila por provincia)
+    - `fechas[res]`: índice de fechas de cada resolución
+    - `valores[(variable, res)]`: matriz provincia × periodo (float32)
+    - `tipo_interes[res]`: serie nacional del tipo hipotecario
+    """
+
+    def __init__(self, cod_ine, fechas, valores, tipo_interes):
+        self.cod_ine = np.asarray(cod_ine, dtype=np.int16)
+        self.fechas = fechas
+        self.valores = valores
+        self.tipo_interes = tipo_interes
+        self._fila = {int(c): i for i, c in enumerate(self.cod_ine)}
+
+    # ---------- construcción ----------
+
+    @classmethod
+    def desde_dataframes(cls, df_precios: pd.DataFrame, df_interes: pd.DataFrame):
+        """
+        df_precios: columnas cod_ine, fecha, precio_compra_m2, precio_alquiler_m2
+        df_interes: columnas fecha, tipo_interes_hipoteca
+        """
+        mes_precios = pd.to_datetime(df_precios["fecha"]).values.astype("datetime64[M]")
+        mes_interes = pd.to_datetime(df_interes["fecha"]).values.astype("datetime64[M]")
+
+        inicio = min(mes_precios.min(), mes_interes.min())
+        fin = max(mes_precios.max(), mes_interes.max())
+        fechas_m = np.arange(inicio, fin + 1)
+
+        cod_ine = np.sort(df_precios["cod_ine"].unique())
+        fila = np.searchsorted(cod_ine, df_precios["cod_ine"].to_numpy())
+        col = (mes_precios - inicio).astype(int)
+
+        fechas = {
+            res: _bloques(fechas_m, meses)[2] if meses > 1 else fechas_m
+            for res, meses in RESOLUCIONES.items()
+        }
+
+        valores = {}
+        for var in VARIABLES:
+            m = np.full((len(cod_ine), len(fechas_m)), np.nan, dtype=np.float32)
+            m[fila, col] = df_precios[var].to_numpy(dtype=np.float32)
+            for res, meses in RESOLUCIONES.items():
+                valores[(var, res)] = np.ascontiguousarray(_agregar(m, fechas_m, meses))
+
+        tipo_m = np.full(len(fechas_m), np.nan, dtype=np.float32)
+        tipo_m[(mes_interes - inicio).astype(int)] = df_interes["tipo_interes_hipoteca"].to_numpy()
+        tipo_interes = {
+            res: _agregar(tipo_m, fechas_m, meses)
+            for res, meses in RESOLUCIONES.items()
+        }
+
+        return cls(cod_ine, fechas, valores, tipo_interes)
+
+    # ---------- persistencia ----------
+
+    def guardar(self, path: Path = SERIES_NPZ):
+        arrays = {"cod_ine": self.cod_ine}
+        for res in RESOLUCIONES:
+            arrays[f"fechas__{res}"] = self.fechas[res]
+            arrays[f"tipo_interes__{res}"] = self.tipo_interes[res]
+            for var in VARIABLES:
+                arrays[f"{var}__{res}"] = self.valores[(var, res)]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def cargar(cls, path: Path = SERIES_NPZ):
+        with np.load(path) as z:
+            fechas = {res: z[f"fechas__{res}"] for res in RESOLUCIONES}
+            tipo_interes = {res: z[f"tipo_interes__{res}"] for res in RESOLUCIONES}
+            valores = {
+                (var, res): z[f"{var}__{res}"]
+                for var in VARIABLES for res in RESOLUCIONES
+            }
+            cod_ine = z["cod_ine"]
+        return cls(cod_ine, fechas, valores, tipo_interes)
+
+    # ---------- consulta ----------
+
+    def serie(self, cod_ine: int, variable: str, resolucion: str = "mensual"):
+        """
+        Devuelve (fechas, valores) de una provincia, sin los periodos
+        vacíos de los extremos.
+        """
+        fila = self._fila.get(int(cod_ine))
+        if fila is None:
+            return np.array([], dtype="datetime64[M]"), np.array([], dtype=np.float32)
+
+        fechas = self.fechas[resolucion]
+        valores = self.valores[(variable, resolucion)][fila]
+        con_dato = np.flatnonzero(~np.isnan(valores))
+        if len(con_dato) == 0:
+            return fechas[:0], valores[:0]
+        sl = slice(con_dato[0], con_dato[-1] + 1)
+        return fechas[sl], valores[sl]
+
+
+def reducir_puntos(x: np.ndarray, y: np.ndarray, max_puntos: int):
+    """
+    Reduce una serie a como mucho `max_puntos` puntos promediando bloques
+    consecutivos, para que el tamaño de la figura no crezca con la
+    longitud de la serie. Conserva siempre el último punto.
+    """
+    n = len(y)
+    if n <= max_puntos or max_puntos < 2:
+        return x, y
+
+    tam = int(np.ceil(n / max_puntos))
+    n_bloques = int(np.ceil(n / tam))
+    relleno = np.pad(np.asarray(y, dtype=float), (0, n_bloques * tam - n),
+                     constant_values=np.nan)
+    with np.errstate(invalid="ignore"):
+        y_red = np.nanmean(relleno.reshape(n_bloques, tam), axis=1)
+    x_red = x[::tam].copy()
+    x_red[-1] = x[-1]
+    y_red[-1] = y[-1]
+    return x_red, y_red
+
+
+# --------------------------------------------------
+# Proyección de series (vectorizada sobre filas)
+# --------------------------------------------------
+
+METODOS_PROYECCION = ("cagr", "naive", "lineal")
+
+
+def _ventana_valida(valores: np.ndarray, ventana: int):
+    """
+    Para cada fila: último valor válido, primer valor válido dentro de los
+    últimos `ventana` periodos hasta él, y nº de periodos entre ambos.
+    """
+    valores = np.atleast_2d(np.asarray(valores, dtype=float))
+    n_filas, n_cols = valores.shape
+    valido = ~np.isnan(valores)
+    pos = np.arange(n_cols)
+
+    ultimo = np.where(valido, pos, -1).max(axis=1)
+    desde = np.maximum(ultimo - ventana + 1, 0)
+    en_ventana = valido & (pos >= desde[:, None]) & (pos <= ultimo[:, None])
+    primero = np.where(en_ventana, pos, n_cols).min(axis=1)
+
+    filas = np.arange(n_filas)
+    hay = ultimo >= 0
+    last = np.where(hay, valores[filas, np.maximum(ultimo, 0)], np.nan)
+    first = np.where(hay, valores[filas, np.minimum(primero, n_cols - 1)], np.nan)
+    return valores, en_ventana, first, last, ultimo - primero + 1
+
+
+def tasa_crecimiento(valores, ventana: int = 5) -> np.ndarray:
+    """
+    Crecimiento medio compuesto por periodo (CAGR) de cada fila sobre sus
+    últimos `ventana` periodos con dato; 0 si no se puede calcular.
+    """
+    _, _, first, last, n = _ventana_valida(valores, ventana)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where((n > 1) & (first > 0), (last / first) ** (1 / np.maximum(n - 1, 1)) - 1, 0.0)
+
+
+def proyectar_matriz(valores, horizonte: int, ventana: int = 5, metodo: str = "cagr"):
+    """
+    Proyecta `horizonte` periodos a partir del último dato de cada fila de
+    `valores` (series × periodos, NaN = sin dato), en un único paso:
+
+      - "cagr":   crecimiento medio compuesto entre el primer y el último
+                  valor de los últimos `ventana` periodos
+      - "naive":  se repite el último valor
+      - "lineal": recta de mínimos cuadrados sobre la ventana
+
+    Devuelve una matriz series × horizonte, nunca negativa.
+    """
+    valores, en_ventana, first, last, n = _ventana_valida(valores, ventana)
+    pasos = np.arange(1, horizonte + 1)
+
+    if metodo == "cagr":
+        g = tasa_crecimiento(valores, ventana)
+        futuros = last[:, None] * (1 + g[:, None]) ** pasos[None, :]
+    elif metodo == "naive":
+        futuros = np.repeat(last[:, None], horizonte, axis=1)
+    elif metodo == "lineal":
+        t = np.where(en_ventana, np.arange(valores.shape[1]), np.nan)
+        y = np.where(en_ventana, valores, np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t_med = np.nanmean(t, axis=1)
+            y_med = np.nanmean(y, axis=1)
+            cov = np.nansum((t - t_med[:, None]) * (y - y_med[:, None]), axis=1)
+            var = np.nansum((t - t_med[:, None]) ** 2, axis=1)
+            pendiente = np.where(var > 0, cov / var, 0.0)
+        futuros = last[:, None] + pendiente[:, None] * pasos[None, :]
+    else:
+        raise ValueError(f"Método de proyección desconocido: {metodo!r}")
+
+    return np.maximum(futuros, 0)
+
+
+# --------------------------------------------------
+# Bandas de la proyección (bootstrap de residuos)
+# --------------------------------------------------
+
+def pool_residuos_crecimiento(valores) -> np.ndarray:
+    """
+    Residuos del crecimiento logarítmico periodo a periodo respecto al
+    crecimiento medio de cada serie (lo que la proyección CAGR supone
+    constante), juntando todas las filas de `valores` en un único pool.
+    """
+    valores = np.atleast_2d(np.asarray(valores, dtype=float))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crec = np.diff(np.log(np.where(valores > 0, valores, np.nan)), axis=1)
+        residuos = crec - np.nanmean(crec, axis=1, keepdims=True)
+    return residuos[np.isfinite(residuos)]
+
+
+def factores_bootstrap(pool, horizonte: int, nivel: float = 0.90,
+                       n_caminos: int = 2000, semilla: int = 0) -> np.ndarray:
+    """
+    Factores multiplicativos (inferior, superior) de la banda para cada
+    paso 1..`horizonte`: se remuestrean `n_caminos` trayectorias de
+    residuos del pool y se toman los cuantiles de su efecto acumulado.
+    Se calcula una sola vez; aplicarlo a cualquier proyección es un
+    producto. Devuelve una matriz horizonte × 2.
+    """
+    pool = np.asarray(pool, dtype=float)
+    if horizonte <= 0 or len(pool) == 0:
+        return np.ones((max(horizonte, 0), 2))
+    rng = np.random.default_rng(semilla)
+    caminos = np.cumsum(rng.choice(pool, size=(n_caminos, horizonte)), axis=1)
+    alfa = (1 - nivel) / 2
+    return np.exp(np.quantile(caminos, [alfa, 1 - alfa], axis=0).T)
+
+
+def bandas_proyeccion(futuros, factores, pasos=None):
+    """
+    Aplica los factores de `factores_bootstrap` a una matriz de
+    proyecciones (series × horizonte). `pasos` permite horizontes
+    fraccionarios (p. ej. meses en años): los factores se interpolan en
+    escala logarítmica, con factor 1 en el paso 0.
+    Devuelve (inferior, superior) con la forma de `futuros`.
+    """
+    futuros = np.asarray(futuros, dtype=float)
+    factores = np.asarray(factores, dtype=float)
+    if pasos is None:
+        f = factores[: futuros.shape[-1]]
+    else:
+        h = np.arange(len(factores) + 1)
+        log_f = np.vstack([np.zeros((1, 2)), np.log(factores)])
+        f = np.exp(np.column_stack([np.interp(pasos, h, log_f[:, j]) for j in range(2)]))
+    return futuros * f[:, 0], futuros * f[:, 1]
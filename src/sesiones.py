@@ -0,0 +1,139 @@
+"""
+Estado por sesión en el servidor: las últimas salidas de cada callback.
+
+Quien alterna entre dos provincias o dos valores de un slider vuelve a
+pedir salidas que ya se calcularon para él. `AlmacenSesiones` guarda,
+por sesión y callback, las `por_callback` últimas salidas (LRU) y las
+devuelve sin recalcular:
+
+- La sesión la identifica un `dcc.Store(storage_type="session")` del
+  layout con un id aleatorio; el callback lo recibe como último `State`.
+- La clave incluye la versión publicada de datos y modelos, así que una
+  versión nueva nunca sirve salidas de la anterior.
+- Las salidas se guardan ya serializadas a JSON (como las manda Dash):
+  ocupan poco y lo que se cuenta para el límite es exactamente lo que
+  hay en memoria.
+- Límites: `max_sesiones`, `max_mb` en total y `inactividad` segundos;
+  al guardar se descartan las sesiones inactivas y, si aún se pasa de
+  algún límite, las de uso más antiguo.
+"""
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from plotly.io.json import to_json_plotly
+
+
+def congelar(valor):
+    """Valor de un Input/State como clave hashable (listas -> tuplas, dicts -> pares ordenados)."""
+    if isinstance(valor, (list, tuple)):
+        return tuple(congelar(v) for v in valor)
+    if isinstance(valor, dict):
+        return tuple(sorted((k, congelar(v)) for k, v in valor.items()))
+    return valor
+
+
+class Sesion:
+    """Salidas guardadas de una sesión: callback -> OrderedDict(clave -> JSON)."""
+
+    def __init__(self):
+        self.callbacks = {}
+        self.bytes = 0
+        self.ultimo_uso = time.monotonic()
+
+
+class AlmacenSesiones:
+    def __init__(self, version, por_callback=4, max_sesiones=500, max_mb=64, inactividad=1800):
+        self.version = version  # función -> versión publicada de datos y modelos
+        self.por_callback = por_callback
+        self.max_sesiones = max_sesiones
+        self.max_bytes = max_mb * 2**20
+        self.inactividad = inactividad
+        self._sesiones = OrderedDict()  # de uso más antiguo a más reciente
+        self._cerrojo = threading.Lock()
+        self.bytes = 0
+        self.aciertos = self.fallos = 0
+
+    def obtener(self, sesion, callback, clave):
+        """JSON guardado para (sesión, callback, clave), o None."""
+        with self._cerrojo:
+            estado = self._sesiones.get(sesion)
+            salidas = estado.callbacks.get(callback) if estado else None
+            if salidas is None or clave not in salidas:
+                self.fallos += 1
+                return None
+            self.aciertos += 1
+            estado.ultimo_uso = time.monotonic()
+            self._sesiones.move_to_end(sesion)
+            salidas.move_to_end(clave)
+            return salidas[clave]
+
+    def guardar(self, sesion, callback, clave, texto):
+        with self._cerrojo:
+            estado = self._sesiones.get(sesion)
+            if estado is None:
+                estado = self._sesiones[sesion] = Sesion()
+            estado.ultimo_uso = time.monotonic()
+            self._sesiones.move_to_end(sesion)
+            salidas = estado.callbacks.setdefault(callback, OrderedDict())
+            if clave in salidas:
+                self._restar(estado, len(salidas.pop(clave)))
+            salidas[clave] = texto
+            self._restar(estado, -len(texto))
+            while len(salidas) > self.por_callback:
+                self._restar(estado, len(salidas.popitem(last=False)[1]))
+            self._purgar()
+
+    def _restar(self, estado, n):
+        estado.bytes -= n
+        self.bytes -= n
+
+    def _purgar(self):
+        """Quita las sesiones inactivas y, si hace falta, las de uso más antiguo."""
+        limite = time.monotonic() - self.inactividad
+        while self._sesiones:
+            sesion, estado = next(iter(self._sesiones.items()))
+            inactiva = estado.ultimo_uso < limite
+            if not (inactiva or len(self._sesiones) > self.max_sesiones or self.bytes > self.max_bytes):
+                break
+            del self._sesiones[sesion]
+            self.bytes -= estado.bytes
+
+    def purgar(self):
+        with self._cerrojo:
+            self._purgar()
+
+    def memoizar(self, funcion):
+        """
+        Decorador para callbacks cuyo último argumento es el id de sesión.
+        Sin id (p. ej. llamadas directas) se calcula siempre.
+        """
+        nombre = funcion.__qualname__
+
+        @functools.wraps(funcion)
+        def envoltura(*args):
+            *entradas, sesion = args
+            if not sesion:
+                return funcion(*entradas)
+            clave = (self.version(), congelar(entradas))
+            texto = self.obtener(sesion, nombre, clave)
+            if texto is not None:
+                return json.loads(texto)
+            salida = funcion(*entradas)
+            self.guardar(sesion, nombre, clave, to_json_plotly(salida))
+            return salida
+
+        return envoltura
+
+    def estadisticas(self) -> dict:
+        with self._cerrojo:
+            self._purgar()
+            return {
+                "sesiones": len(self._sesiones),
+                "mb": round(self.bytes / 2**20, 3),
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_acierto": round(self.aciertos / max(self.aciertos + self.fallos, 1), 4),
+            }
@@ -0,0 +1,25 @@
+"""
+Configuración común de los tests (se ejecutan desde la raíz del repo:
+`python -m pytest`). La app se importa sin hilos en segundo plano.
+"""
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ))
+os.chdir(RAIZ)
+
+os.environ["RECARGA_SEGUNDOS"] = "0"
+os.environ["API_PRECALENTAR"] = "0"
+os.environ["CACHES_FICHERO"] = ""
+
+
+def cargar_script(ruta):
+    """Importa un script de dataset/ o models/ como módulo."""
+    ruta = RAIZ / ruta
+    spec = importlib.util.spec_from_file_location(ruta.stem, ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
@@ -0,0 +1,56 @@
+import pytest
+
+import app
+
+ESCENARIO_CSV = (
+    "renta_mensual_individual,interes_hipoteca,tamano_vivienda_m2,n_salarios,pct_ahorro,plazo_anios\n"
+    "1500,3,80,2,0.2,30\n"
+)
+
+
+@pytest.fixture(scope="module")
+def cliente():
+    return app.server.test_client()
+
+
+# --------------------------------------------------
+# /api/escenarios
+# --------------------------------------------------
+
+@pytest.mark.parametrize("query", ["anio=abc", "anio=2020&anio=x", "anio=inf"])
+def test_escenarios_anio_no_valido(cliente, query):
+    r = cliente.post(f"/api/escenarios?{query}", data=ESCENARIO_CSV, content_type="text/csv")
+    assert r.status_code == 400
+
+
+def test_escenarios_anio_valido(cliente):
+    r = cliente.post("/api/escenarios?anio=2020", data=ESCENARIO_CSV, content_type="text/csv")
+    assert r.status_code == 200
+    filas = r.get_data(as_text=True).splitlines()[1:]
+    assert filas and all(",2020," in f for f in filas)
+
+
+def test_escenarios_parametro_vacio(cliente):
+    cuerpo = ESCENARIO_CSV + "1500,,80,2,0.2,30\n"
+    r = cliente.post("/api/escenarios", data=cuerpo, content_type="text/csv")
+    assert r.status_code == 400
+    assert "fila 2" in r.get_json()["error"]
+
+
+# --------------------------------------------------
+# /api/sensibilidad
+# --------------------------------------------------
+
+@pytest.mark.parametrize("query", ["n_salarios=0", "renta=0", "plazo=0", "renta=-100"])
+def test_sensibilidad_parametro_no_positivo(cliente, query):
+    r = cliente.get(f"/api/sensibilidad?provincia=Madrid&{query}")
+    assert r.status_code == 400
+
+
+def test_sensibilidad_no_finitos_como_null(cliente):
+    # Sin ahorro los años para reunir la entrada son infinitos
+    r = cliente.get("/api/sensibilidad?provincia=Madrid&ahorro=0&salida=anios_ahorrar_entrada")
+    assert r.status_code == 200
+    texto = r.get_data(as_text=True)
+    assert "Infinity" not in texto and "NaN" not in texto
+    assert any(fila["base"] is None for fila in r.get_json()["tornado"])
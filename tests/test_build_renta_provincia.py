@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+from conftest import cargar_script
+
+renta = cargar_script("dataset/build_renta_provincia.py")
+
+
+def test_project_renta_vacio():
+    vacio = pd.DataFrame(columns=["ccaa", "provincia", "anio", "renta_neta_anual"])
+    salida = renta.project_renta(vacio)
+    assert salida.empty
+    assert list(salida.columns) == renta.COLUMNAS_SALIDA
+
+
+def test_project_renta_proyecta_hasta_el_objetivo():
+    df = pd.DataFrame({
+        "ccaa": "Andalucia",
+        "provincia": "Almería",
+        "anio": [2020, 2021, 2022],
+        "renta_neta_anual": [10000.0, 11000.0, 12100.0],
+    })
+    salida = renta.project_renta(df)
+    assert list(salida.columns) == renta.COLUMNAS_SALIDA
+    assert salida["anio"].max() == renta.MAX_YEAR_TARGET
+    proyeccion = salida[salida["is_projection"]]
+    assert np.allclose(proyeccion["renta_neta_anual"].iloc[0], 12100.0 * 1.1)
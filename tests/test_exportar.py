@@ -0,0 +1,27 @@
+import io
+
+import pandas as pd
+import pytest
+
+from src.exportar import exportar
+
+VACIO = pd.DataFrame({"provincia": pd.Series(dtype="str"), "valor": pd.Series(dtype="float64")})
+
+
+def test_csv_sin_bloques_escribe_la_cabecera():
+    assert b"".join(exportar(iter([]), "csv", vacio=VACIO)).decode() == "provincia,valor\n"
+
+
+def test_parquet_sin_bloques_escribe_el_esquema():
+    pq = pytest.importorskip("pyarrow.parquet")
+    tabla = pq.read_table(io.BytesIO(b"".join(exportar(iter([]), "parquet", vacio=VACIO))))
+    assert tabla.num_rows == 0
+    assert tabla.column_names == ["provincia", "valor"]
+    assert str(tabla.schema.field("valor").type) == "double"
+
+
+def test_parquet_por_bloques():
+    pq = pytest.importorskip("pyarrow.parquet")
+    bloques = [pd.DataFrame({"provincia": ["A"], "valor": [1.0]}), pd.DataFrame({"provincia": ["B"], "valor": [2.0]})]
+    tabla = pq.read_table(io.BytesIO(b"".join(exportar(iter(bloques), "parquet", vacio=VACIO))))
+    assert tabla.column("provincia").to_pylist() == ["A", "B"]
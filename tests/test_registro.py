@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import src.registro as registro
+from src.registro import cache_versionada, podar_caches
+
+
+def test_cache_versionada_no_guarda_versiones_podadas(monkeypatch):
+    monkeypatch.setattr(registro, "_CACHES", [])
+    monkeypatch.setattr(registro, "_VIGENTES", None)
+
+    @cache_versionada()
+    def doble(objeto, x):
+        return 2 * x
+
+    vieja, nueva = SimpleNamespace(version="v1"), SimpleNamespace(version="v2")
+    assert doble(vieja, 1) == 2
+    podar_caches({"v2"})
+    assert not doble.entradas
+    # Un callback que empezó con la versión vieja termina después de publicar la nueva
+    assert doble(vieja, 3) == 6
+    assert not doble.entradas
+    doble(nueva, 3)
+    assert list(doble.entradas) == [("v2", (3,), ())]
+
+
+def test_huella_contenido_una_por_ruta(tmp_path, monkeypatch):
+    monkeypatch.setattr(registro, "_HUELLAS", {})
+    ruta = tmp_path / "datos.csv"
+    versiones = set()
+    for i in range(3):
+        ruta.write_text("x" * (i + 1))
+        versiones.add(registro.version_ficheros([ruta]))
+    assert len(versiones) == 3
+    assert list(registro._HUELLAS) == [str(ruta)]
+
+
+def _volcar_worker(ruta, version, n):
+    registro._CACHES.clear()
+
+    @cache_versionada(maxsize=1000)
+    def cuadrado(objeto, x):
+        return x * x
+
+    objeto = SimpleNamespace(version=version)
+    for i in range(n):
+        cuadrado(objeto, i)
+        registro.guardar_caches(ruta, "codigo", {"v1", "v2"})
+
+
+def test_guardar_caches_combina_workers_concurrentes(tmp_path, monkeypatch):
+    import multiprocessing
+
+    monkeypatch.setattr(registro, "_CACHES", [])
+    ruta = tmp_path / "caches.pkl"
+    contexto = multiprocessing.get_context("fork")
+    workers = [contexto.Process(target=_volcar_worker, args=(ruta, v, 30)) for v in ("v1", "v2")]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+        assert w.exitcode == 0
+
+    volcado = registro.leer_volcado(ruta, "codigo", {"v1", "v2"})
+    assert {clave[0] for _, clave in volcado} == {"v1", "v2"}
+    assert len(volcado) == 60